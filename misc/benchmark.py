@@ -0,0 +1,1802 @@
+#!/usr/bin/env python3
+#=============================================================================
+#
+# Bugme Benchmarks
+#
+#=============================================================================
+
+"""
+Bugme Benchmarks
+================
+
+Benchmarks for `bugme.py` that run anywhere (using the in-memory backend in
+place of the Win32 API).  Each benchmark is a sub-command:
+
+    python benchmark.py importtime --budget 40000
+    python benchmark.py notifier --count 10000
+
+The `suite` benchmark compares throughput against the baselines stored in
+`benchmark_baseline.json` (refresh them with `suite --save`).  Correctness
+is checked by the tests (`tests/` at the top of the project), not here.
+"""
+
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+
+# Directory containing the module being benchmarked
+script_dir = os.path.dirname( os.path.realpath( __file__ ) )
+
+
+#=============================================================================
+def report( name, count, elapsed ):
+    """
+    Prints a throughput measurement.
+
+    @param name    The name of the measurement
+    @param count   The number of operations measured
+    @param elapsed The elapsed time in seconds
+    """
+    print( '{:<32} {:>12.1f} ops/s  ({} in {:.3f} s)'.format(
+        name,
+        count / elapsed,
+        count,
+        elapsed
+    ) )
+
+
+#=============================================================================
+def bench_importtime( args ):
+    """
+    Measures the cumulative import time of the `bugme` module.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = within budget)
+    """
+
+    # Pattern for `-X importtime` output lines.
+    pattern = re.compile(
+        r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+bugme\s*$',
+        re.MULTILINE
+    )
+
+    # Import the module in fresh interpreters (after caching its bytecode,
+    # so compiling the source is not measured).
+    environment = dict( os.environ )
+    environment.pop( 'PYTHONDONTWRITEBYTECODE', None )
+    subprocess.run(
+        [ sys.executable, '-c', 'import bugme' ],
+        cwd = script_dir,
+        env = environment
+    )
+    samples = []
+    for _ in range( args.runs ):
+        result = subprocess.run(
+            [ sys.executable, '-X', 'importtime', '-c', 'import bugme' ],
+            cwd    = script_dir,
+            env    = environment,
+            stdout = subprocess.DEVNULL,
+            stderr = subprocess.PIPE,
+            universal_newlines = True
+        )
+        if result.returncode != 0:
+            print( result.stderr, file = sys.stderr )
+            return 2
+        match = pattern.search( result.stderr )
+        samples.append( int( match.group( 2 ) ) )
+
+    # Report and check against the budget.
+    median = statistics.median( samples )
+    print( 'import bugme: median {:.0f} us, best {} us, budget {} us'.format(
+        median,
+        min( samples ),
+        args.budget
+    ) )
+    return 0 if median <= args.budget else 1
+
+
+#=============================================================================
+def bench_notifier( args ):
+    """
+    Compares one-shot `notify()` calls to a persistent `Notifier`.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import bugme
+
+    # One setup and teardown per notification.
+    backend = bugme.MemoryBackend()
+    start   = time.perf_counter()
+    for index in range( args.count ):
+        bugme.notify( 'Message {}'.format( index ), backend = backend )
+    report( 'notify()', args.count, time.perf_counter() - start )
+
+    # One setup and teardown in total.
+    backend = bugme.MemoryBackend()
+    start   = time.perf_counter()
+    with bugme.Notifier( backend ) as notifier:
+        for index in range( args.count ):
+            notifier.notify( 'Message {}'.format( index ) )
+    report( 'Notifier.notify()', args.count, time.perf_counter() - start )
+
+    # One setup and teardown for a batch.
+    backend = bugme.MemoryBackend()
+    records = [ 'Message {}'.format( index ) for index in range( args.count ) ]
+    start   = time.perf_counter()
+    bugme.notify_many( records, backend = backend )
+    report( 'notify_many()', args.count, time.perf_counter() - start )
+
+    return 0
+
+
+#=============================================================================
+def bench_async( args ):
+    """
+    Measures awaitable notifications sharing a single pump thread.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import asyncio
+    import threading
+    import bugme
+
+    # Await every notification at once.
+    async def run( pump ):
+        return await asyncio.gather( *[
+            bugme.notify_async( 'Message {}'.format( index ), pump = pump )
+            for index in range( args.count )
+        ] )
+
+    # Measure with the pump running.
+    with bugme.Pump( bugme.MemoryBackend() ) as pump:
+        threads  = threading.active_count()
+        start    = time.perf_counter()
+        outcomes = asyncio.run( run( pump ) )
+        elapsed  = time.perf_counter() - start
+    report( 'notify_async()', len( outcomes ), elapsed )
+    print( 'threads while awaiting: {}'.format( threads ) )
+    return 0
+
+
+#=============================================================================
+def bench_structures( args ):
+    """
+    Compares building NOTIFYICONDATA structures to reusing a reserved one.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import ctypes
+    import bugme
+
+    message = 'Build 1234 failed on host build-07 (exit status 2).'
+    title   = 'Build Failed'
+
+    # Keyword construction (with intermediate byte strings) for every use.
+    start = time.perf_counter()
+    for _ in range( args.count ):
+        bugme.NOTIFYICONDATA(
+            cbSize      = ctypes.sizeof( bugme.NOTIFYICONDATA ),
+            hWnd        = 0x1000,
+            uFlags      = bugme.NIF_INFO,
+            hIcon       = 0x2000,
+            szInfo      = bytes( message, 'ascii' ),
+            szInfoTitle = bytes( title, 'ascii' ),
+            dwInfoFlags = bugme.NIIF_USER
+        )
+    report( 'NOTIFYICONDATA(...)', args.count, time.perf_counter() - start )
+
+    # A single reserved structure (as used by a tray item).
+    notify_data = bugme.NOTIFYICONDATAW(
+        cbSize = ctypes.sizeof( bugme.NOTIFYICONDATAW ),
+        hWnd   = 0x1000,
+        uFlags = bugme.NIF_INFO,
+        hIcon  = 0x2000
+    )
+    start = time.perf_counter()
+    for _ in range( args.count ):
+        notify_data.dwInfoFlags = bugme.NIIF_USER
+        notify_data.set_text( 'szInfo', message )
+        notify_data.set_text( 'szInfoTitle', title )
+    report( 'reserved set_text()', args.count, time.perf_counter() - start )
+
+    return 0
+
+
+#=============================================================================
+def bench_guid( args ):
+    """
+    Measures GUID conversions (checked against `uuid.UUID` by tests/).
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import uuid
+    import bugme
+
+    values  = [ uuid.uuid4() for _ in range( args.count ) ]
+    strings = [ str( value ).upper() for value in values ]
+
+    # Parsing through the uuid module (the previous implementation).
+    start = time.perf_counter()
+    for string in strings:
+        fields          = uuid.UUID( string ).fields
+        guid            = bugme.GUID()
+        guid.Data1      = fields[ 0 ]
+        guid.Data2      = fields[ 1 ]
+        guid.Data3      = fields[ 2 ]
+        guid.Data4      = bugme.GUID.GUID_DATA4_TYPE()
+        guid.Data4[ 0 ] = fields[ 3 ]
+        guid.Data4[ 1 ] = fields[ 4 ]
+        for dindex, shift in zip( range( 2, 8 ), range( 40, -1, -8 ) ):
+            guid.Data4[ dindex ] = ( fields[ 5 ] >> shift ) & 0xFF
+    report( 'uuid.UUID() into GUID', args.count, time.perf_counter() - start )
+
+    # Direct parsing into the structure.
+    start = time.perf_counter()
+    for string in strings:
+        bugme.GUID( string )
+    report( 'GUID( string )', args.count, time.perf_counter() - start )
+    start = time.perf_counter()
+    for string in strings:
+        bugme.GUID.from_string( string )
+    report( 'GUID.from_string()', args.count, time.perf_counter() - start )
+
+    # Formatting.
+    guids = [ bugme.GUID.from_uuid( value ) for value in values ]
+    start = time.perf_counter()
+    for guid in guids:
+        str( guid )
+    report( 'str( GUID )', args.count, time.perf_counter() - start )
+
+    # Conversions to and from UUIDs.
+    start = time.perf_counter()
+    for value in values:
+        bugme.GUID.from_uuid( value ).to_uuid()
+    report( 'from_uuid().to_uuid()', args.count, time.perf_counter() - start )
+
+    # Batch conversion into an array.
+    start = time.perf_counter()
+    bugme.guid_array( strings )
+    report( 'guid_array()', args.count, time.perf_counter() - start )
+
+    return 0
+
+
+#=============================================================================
+def bench_pump( args ):
+    """
+    Measures one pump thread multiplexing tray items for many producers.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import threading
+    import bugme
+
+    for producers in ( 1, 2, 4, 8 ):
+        with bugme.Pump( bugme.MemoryBackend() ) as pump:
+
+            # One tray item per producer.
+            for uid in range( 1, producers ):
+                pump.add_item( uid )
+
+            # Each producer submits to its own item.
+            count    = args.count // producers
+            done     = threading.Semaphore( 0 )
+            outcomes = []
+            def callback( outcome ):
+                outcomes.append( outcome )
+                if len( outcomes ) == ( count * producers ):
+                    done.release()
+            def produce( uid ):
+                for index in range( count ):
+                    pump.submit(
+                        'Message {}'.format( index ),
+                        callback = callback,
+                        uid      = uid
+                    )
+
+            # Measure until every outcome has been delivered.
+            threads = [
+                threading.Thread( target = produce, args = ( uid, ) )
+                for uid in range( producers )
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            done.acquire()
+            elapsed = time.perf_counter() - start
+        report( 'Pump.submit() x{} items'.format( producers ),
+            len( outcomes ), elapsed )
+
+    return 0
+
+
+#=============================================================================
+def bench_stream( args ):
+    """
+    Measures stream mode on generated text and JSONL input.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import io
+    import json
+    import bugme
+
+    # Generate the input (alternating plain text and JSONL records).
+    lines = []
+    size  = 0
+    index = 0
+    while size < ( args.size * 1024 * 1024 ):
+        if ( index % 2 ) == 0:
+            line = 'Build {} finished on host build-07.\n'.format( index )
+        else:
+            message = 'Build {} failed (exit status 2).'.format( index )
+            line    = json.dumps( {
+                'message'  : message,
+                'title'    : 'Build Failed',
+                'severity' : 'error'
+            } ) + '\n'
+        lines.append( line )
+        size  += len( line )
+        index += 1
+    text = ''.join( lines )
+    del lines
+
+    # Parsing alone.
+    start = time.perf_counter()
+    count = sum( 1 for _ in bugme.read_records( io.StringIO( text ) ) )
+    report( 'read_records()', count, time.perf_counter() - start )
+
+    # Parsing and display through one pump.
+    start    = time.perf_counter()
+    outcomes = bugme.notify_stream(
+        io.StringIO( text ),
+        capacity = args.capacity,
+        backend  = bugme.MemoryBackend()
+    )
+    elapsed  = time.perf_counter() - start
+    report( 'notify_stream()', sum( outcomes.values() ), elapsed )
+    print( '{:.1f} MB/s, outcomes: {}'.format(
+        size / elapsed / ( 1024 * 1024 ),
+        dict( outcomes )
+    ) )
+    return 0
+
+
+#=============================================================================
+def bench_follow( args ):
+    """
+    Measures following a fast-growing synthetic log with many rules.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import random
+    import re
+    import tempfile
+    import bugme
+
+    # Dozens of rules, one of which matches about one line in a thousand.
+    rules = [
+        r'status E{:04d}$'.format( index ) for index in range( args.rules )
+    ]
+    rng   = random.Random( 1 )
+    lines = []
+    for index in range( 10000 ):
+        code = rng.randrange( args.rules * 1000 )
+        lines.append( '2024-01-01 12:00:{:02d} worker-{} request {} '
+            'finished with status E{:04d}\n'.format(
+                index % 60, index % 16, index, code
+            ) )
+    block  = ''.join( lines ).encode( 'utf-8' )
+    blocks = max( 1, ( args.size * 1024 * 1024 ) // len( block ) )
+    total  = blocks * len( block )
+
+    # One combined pattern against one pattern per rule.
+    pattern = bugme.compile_rules( rules )
+    start   = time.perf_counter()
+    for _ in bugme.scan_lines( pattern, block, 0, len( block ) ):
+        pass
+    report( 'combined scan (lines)', len( lines ),
+        time.perf_counter() - start )
+    separate = [ re.compile( rule.encode( 'utf-8' ) ) for rule in rules ]
+    start    = time.perf_counter()
+    for line in block.splitlines():
+        for rule in separate:
+            if rule.search( line ) is not None:
+                break
+    report( 'per-rule scan (lines)', len( lines ),
+        time.perf_counter() - start )
+
+    # Follow the log as it grows, in small and large appends.
+    for name, per_poll, threshold in (
+        ( 'follow (buffered reads)', 1, total + 1 ),
+        ( 'follow (mmap reads)', blocks, 1 )
+    ):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join( directory, 'synthetic.log' )
+            open( path, 'wb' ).close()
+            follower = bugme.LogFollower(
+                [ path ],
+                rules,
+                mmap_threshold = threshold
+            )
+            count = 0
+            start = time.perf_counter()
+            with open( path, 'ab', buffering = 0 ) as log:
+                for index in range( 0, blocks, per_poll ):
+                    for _ in range( min( per_poll, blocks - index ) ):
+                        log.write( block )
+                    count += len( follower.poll() )
+            elapsed = time.perf_counter() - start
+            follower.close()
+        report( name, len( lines ) * blocks, elapsed )
+        print( '{:.1f} MB/s, {} matches'.format(
+            total / elapsed / ( 1024 * 1024 ),
+            count
+        ) )
+
+    return 0
+
+
+#=============================================================================
+def bench_logging( args ):
+    """
+    Measures the latency of logging through a `BugmeHandler`.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import logging
+    import bugme
+
+    handler = bugme.BugmeHandler( backend = bugme.MemoryBackend() )
+    logger  = logging.getLogger( 'bugme.benchmark' )
+    logger.addHandler( handler )
+    logger.propagate = False
+
+    # Time each call from the application's side.
+    samples = []
+    clock   = time.perf_counter_ns
+    start   = time.perf_counter()
+    for index in range( args.count ):
+        before = clock()
+        logger.error( 'Request %d failed.', index )
+        samples.append( clock() - before )
+    elapsed = time.perf_counter() - start
+    handler.close()
+    logger.removeHandler( handler )
+
+    samples.sort()
+    report( 'logger.error()', args.count, elapsed )
+    print( 'p50 {:.1f} us, p99 {:.1f} us, max {:.1f} us'.format(
+        samples[ len( samples ) // 2 ] / 1000,
+        samples[ ( len( samples ) * 99 ) // 100 ] / 1000,
+        samples[ -1 ] / 1000
+    ) )
+    print( 'delivered {}, dropped {}'.format(
+        handler.delivered,
+        handler.dropped
+    ) )
+    return 0
+
+
+#=============================================================================
+def bench_metrics( args ):
+    """
+    Measures the overhead of per-phase instrumentation.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import bugme
+
+    # Metrics disabled (backends are not wrapped).
+    bugme.metrics.enabled = False
+    backend = bugme.instrument( bugme.MemoryBackend() )
+    start   = time.perf_counter()
+    with bugme.Notifier( backend ) as notifier:
+        for index in range( args.count ):
+            notifier.notify( 'Message {}'.format( index ) )
+    report( 'metrics disabled', args.count, time.perf_counter() - start )
+
+    # Metrics enabled.
+    bugme.metrics.enabled = True
+    backend = bugme.instrument( bugme.MemoryBackend() )
+    start   = time.perf_counter()
+    with bugme.Notifier( backend ) as notifier:
+        for index in range( args.count ):
+            notifier.notify( 'Message {}'.format( index ) )
+    report( 'metrics enabled', args.count, time.perf_counter() - start )
+    bugme.metrics.enabled = False
+
+    print( bugme.metrics.format() )
+    return 0
+
+
+#=============================================================================
+def _measure_case( function, count ):
+    """
+    Measures throughput, latency, and memory for one benchmark case.
+
+    @param function Sends one notification (called with its index)
+    @param count    Number of notifications to send
+    @return         A dictionary of measurements
+    """
+    import gc
+    import tracemalloc
+
+    # Time each notification.
+    samples = []
+    clock   = time.perf_counter_ns
+    start   = time.perf_counter()
+    for index in range( count ):
+        before = clock()
+        function( index )
+        samples.append( clock() - before )
+    elapsed = time.perf_counter() - start
+    samples.sort()
+
+    # Trace memory separately (tracing slows everything down).
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[ 0 ]
+    for index in range( count ):
+        function( index )
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'rate'     : count / elapsed,
+        'p50'      : samples[ len( samples ) // 2 ] / 1e6,
+        'p99'      : samples[ ( len( samples ) * 99 ) // 100 ] / 1e6,
+        'retained' : max( 0, current - baseline ) / count,
+        'peak'     : ( peak - baseline ) / 1024
+    }
+
+
+#=============================================================================
+def bench_suite( args ):
+    """
+    Measures the notification paths, and compares them to stored baselines.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = no regressions)
+    """
+    import contextlib
+    import io
+    import json
+    import bugme
+
+    def backend():
+        return bugme.MemoryBackend( latency = args.latency )
+
+    # One-shot notifications.
+    def one_shot( index ):
+        bugme.notify( 'Message {}'.format( index ), backend = shared )
+    shared = backend()
+
+    # The command-line interface (in process).
+    def command_line( index ):
+        with contextlib.redirect_stderr( io.StringIO() ):
+            bugme.main( [ 'bugme', 'Message {}'.format( index ) ] )
+
+    # Collect the measurements.
+    results = {}
+    results[ 'notify' ] = _measure_case( one_shot, args.count )
+    with bugme.Notifier( backend() ) as notifier:
+        results[ 'Notifier.notify' ] = _measure_case(
+            lambda index: notifier.notify( 'Message {}'.format( index ) ),
+            args.count
+        )
+    previous = os.environ.get( 'BUGME_BACKEND' )
+    os.environ[ 'BUGME_BACKEND' ] = 'memory'
+    try:
+        results[ 'main' ] = _measure_case( command_line, args.count )
+    finally:
+        if previous is None:
+            del os.environ[ 'BUGME_BACKEND' ]
+        else:
+            os.environ[ 'BUGME_BACKEND' ] = previous
+
+    # Store the results as the new baselines.
+    if args.save == True:
+        with open( args.baseline, 'w' ) as handle:
+            json.dump( results, handle, indent = 4, sort_keys = True )
+            handle.write( '\n' )
+        print( 'Saved baselines to {}'.format( args.baseline ) )
+
+    # Load the baselines to compare against.
+    baselines = {}
+    if ( args.save == False ) and ( os.path.exists( args.baseline ) ):
+        with open( args.baseline ) as handle:
+            baselines = json.load( handle )
+
+    # Report, and check for regressions.
+    print( '{:<18} {:>12} {:>9} {:>9} {:>11} {:>9}  {}'.format(
+        'case', 'notify/s', 'p50 ms', 'p99 ms', 'retained B', 'peak KiB',
+        'vs. baseline'
+    ) )
+    regressions = 0
+    for name, result in results.items():
+        verdict  = ''
+        baseline = baselines.get( name )
+        if baseline is not None:
+            ratio   = result[ 'rate' ] / baseline[ 'rate' ]
+            verdict = '{:+.0%} throughput'.format( ratio - 1 )
+            if ratio < ( 1 - args.tolerance ):
+                verdict     += ' REGRESSION'
+                regressions += 1
+        print( '{:<18} {:>12.1f} {:>9.3f} {:>9.3f} {:>11.1f} {:>9.1f}  {}'
+            .format(
+                name,
+                result[ 'rate' ],
+                result[ 'p50' ],
+                result[ 'p99' ],
+                result[ 'retained' ],
+                result[ 'peak' ],
+                verdict
+            ) )
+    return 0 if regressions == 0 else 1
+
+
+#=============================================================================
+def bench_spool( args ):
+    """
+    Measures the notification spool (torn writes are fuzzed by tests/).
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import tempfile
+    import bugme
+
+    records = [
+        ( 'Build {} failed (exit status 2).'.format( index ), 'Build Failed',
+            bugme.NIIF_ERROR )
+        for index in range( args.count )
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join( directory, 'bench.spool' )
+
+        # Appends synced one at a time, and in batches.
+        for name, sync_every in (
+            ( 'append (fsync each)', 1 ),
+            ( 'append (batched fsync)', 256 )
+        ):
+            count = min( args.count, 2000 ) if sync_every == 1 else \
+                args.count
+            with bugme.Spool( path, sync_every = sync_every,
+                sync_interval = 1.0 ) as spool:
+                start = time.perf_counter()
+                for record in records[ : count ]:
+                    spool.append( *record )
+                spool.flush()
+                report( name, count, time.perf_counter() - start )
+            os.remove( path )
+
+        # Reading through the memory map.
+        with bugme.Spool( path, sync_every = 1024 ) as spool:
+            for record in records:
+                spool.append( *record )
+            spool.flush()
+            start = time.perf_counter()
+            count = len( spool.read() )
+            report( 'read (mmap)', count, time.perf_counter() - start )
+
+            # Delivery with checkpoints and compaction.
+            spool.compact_threshold = spool.size // 4
+            start    = time.perf_counter()
+            outcomes = spool.deliver( backend = bugme.MemoryBackend() )
+            report( 'deliver', sum( outcomes.values() ),
+                time.perf_counter() - start )
+            print( 'compactions: {}, syncs: {}'.format(
+                spool.compactions,
+                spool.syncs
+            ) )
+
+    return 0
+
+
+#=============================================================================
+def _ring_producer( name, producer, count ):
+    """
+    Producer process for the ring benchmark.
+
+    @param name     The ring's name
+    @param producer The producer's number
+    @param count    Number of notifications to put
+    """
+    import bugme
+    with bugme.SharedRing( name ) as ring:
+        for index in range( count ):
+            ring.put( '{} {}'.format( producer, index ), 'Producer' )
+
+
+#=============================================================================
+def bench_ring( args ):
+    """
+    Stress-tests the shared-memory ring with many producer processes.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import multiprocessing
+    import bugme
+
+    name    = 'bugme-bench-{}'.format( os.getpid() )
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        'fork' if 'fork' in methods else 'spawn'
+    )
+
+    for producers in ( 1, 2, 4, 8 ):
+        count = args.count // producers
+        total = count * producers
+        with bugme.SharedRing( name, args.slots, create = True ) as ring:
+            processes = [
+                context.Process(
+                    target = _ring_producer,
+                    args   = ( name, producer, count )
+                )
+                for producer in range( producers )
+            ]
+            for process in processes:
+                process.start()
+
+            # Drain the ring, checking each producer's order.
+            expected = [ 0 ] * producers
+            start    = time.perf_counter()
+            for record in ring.records( interval = 0.001 ):
+                producer, index = map( int, record[ 0 ].split() )
+                if index != expected[ producer ]:
+                    print( 'Producer {} out of order.'.format( producer ) )
+                    return 1
+                expected[ producer ] += 1
+                total -= 1
+                if total == 0:
+                    break
+            elapsed = time.perf_counter() - start
+            for process in processes:
+                process.join()
+        report( 'ring x{} producers'.format( producers ), count * producers,
+            elapsed )
+
+    # Drained into one tray icon.
+    with bugme.SharedRing( name, args.slots, create = True ) as ring:
+        process = context.Process(
+            target = _ring_producer,
+            args   = ( name, 0, args.count )
+        )
+        process.start()
+        def records():
+            for index, record in enumerate( ring.records() ):
+                yield record
+                if index == ( args.count - 1 ):
+                    break
+        start    = time.perf_counter()
+        outcomes = bugme.notify_records(
+            records(),
+            backend = bugme.MemoryBackend()
+        )
+        elapsed  = time.perf_counter() - start
+        process.join()
+    report( 'ring to notify_records()', sum( outcomes.values() ), elapsed )
+    return 0
+
+
+#=============================================================================
+def bench_scheduler( args ):
+    """
+    Measures priority scheduling as the queue grows.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import random
+    import bugme
+
+    rng        = random.Random( 1 )
+    severities = [
+        bugme.NIIF_INFO,
+        bugme.NIIF_WARNING,
+        bugme.NIIF_ERROR,
+        bugme.NIIF_INFO | bugme.NIIF_NOSOUND
+    ]
+
+    # Push and pop with the queue held at increasing sizes.
+    size = 1000
+    while size <= args.count:
+        now       = 0.0
+        scheduler = bugme.Scheduler( clock = lambda: now )
+        for index in range( size ):
+            flags    = rng.choice( severities )
+            deadline = rng.choice( ( None, rng.uniform( 1.0, 100.0 ) ) )
+            scheduler.push( scheduler.entry( index, flags, deadline ) )
+        start = time.perf_counter()
+        for index in range( 10000 ):
+            flags = rng.choice( severities )
+            scheduler.push( scheduler.entry( index, flags ) )
+            scheduler.pop()
+        report( 'push+pop at {} queued'.format( size ), 10000,
+            time.perf_counter() - start )
+        size *= 10
+
+    # Drain with half of the deadlines expired.
+    now   = 50.0
+    start = time.perf_counter()
+    count = 0
+    while scheduler.pop() is not None:
+        count += 1
+    report( 'drain ({} expired)'.format( len( scheduler.expired ) ), count,
+        time.perf_counter() - start )
+
+    return 0
+
+
+# Syslog message sent by the ingestion server benchmark
+_SERVE_MESSAGE = \
+    '<11>1 2024-01-01T12:00:00Z build-07 make 42 - - Build {} failed'
+
+
+#=============================================================================
+def _send_datagrams( address, count ):
+    """
+    Sender process for the ingestion server benchmark (UDP).
+
+    @param address The server's address
+    @param count   Number of datagrams to send
+    """
+    import socket
+    sender = socket.socket( socket.AF_INET, socket.SOCK_DGRAM )
+    for index in range( count ):
+        sender.sendto( _SERVE_MESSAGE.format( index ).encode(), address )
+        if ( index % 256 ) == 255:
+            time.sleep( 0.001 )
+    sender.close()
+
+
+#=============================================================================
+def _send_lines( address, count ):
+    """
+    Sender process for the ingestion server benchmark (TCP).
+
+    @param address The server's address
+    @param count   Number of lines to send
+    """
+    import socket
+    lines = '\n'.join(
+        _SERVE_MESSAGE.format( index ) for index in range( count )
+    ) + '\n'
+    with socket.create_connection( address ) as sender:
+        sender.sendall( lines.encode() )
+
+
+#=============================================================================
+def bench_serve( args ):
+    """
+    Measures the ingestion server on loopback.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import asyncio
+    import multiprocessing
+    import bugme
+
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        'fork' if 'fork' in methods else 'spawn'
+    )
+
+    async def measure( name, send, key, rate, burst ):
+        server = bugme.IngestServer(
+            port     = 0,
+            rate     = rate,
+            burst    = burst,
+            capacity = args.count,
+            backend  = bugme.MemoryBackend()
+        )
+        await server.start()
+        sender = context.Process(
+            target = send,
+            args   = ( server.addresses[ key ][ : 2 ], args.count )
+        )
+        start = time.perf_counter()
+        sender.start()
+
+        # Wait until the messages stop arriving.
+        last    = -1
+        elapsed = 0.0
+        while ( server.received < args.count ) and \
+            ( server.received != last ):
+            last    = server.received
+            elapsed = time.perf_counter() - start
+            await asyncio.sleep( 0.2 )
+        if server.received == args.count:
+            elapsed = time.perf_counter() - start
+        sender.join()
+        while server.completed < server.accepted:
+            await asyncio.sleep( 0.01 )
+        await server.stop()
+        report( name, server.received, elapsed )
+        print( '    sent {}, {}'.format( args.count, server.stats() ) )
+        return server
+
+    async def run():
+        unlimited = float( 'inf' )
+        await measure( 'udp datagrams', _send_datagrams, 'udp', unlimited,
+            unlimited )
+        server = await measure( 'tcp lines', _send_lines, 'tcp', unlimited,
+            unlimited )
+        if server.accepted != args.count:
+            return 1
+        server = await measure( 'udp, rate capped', _send_datagrams, 'udp',
+            1.0, 10 )
+        return 0 if server.accepted <= 11 else 1
+
+    return asyncio.run( run() )
+
+
+#=============================================================================
+def bench_unicode( args ):
+    """
+    Compares filling ANSI and wide structures (with repeated and unique
+    text).  The wide layout and truncation are checked by tests/.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import bugme
+
+    # Fill ANSI and wide structures with repeated (template) text, then
+    # wide structures with text that is never repeated.
+    message = 'Build 1234 failed on host build-07 (exit status 2).'
+    title   = 'Build Failed'
+    cases   = (
+        ( 'NOTIFYICONDATA set_text()', bugme.NOTIFYICONDATA, False ),
+        ( 'NOTIFYICONDATAW set_text()', bugme.NOTIFYICONDATAW, False ),
+        ( 'NOTIFYICONDATAW unique text', bugme.NOTIFYICONDATAW, True )
+    )
+    for name, structure, unique in cases:
+        notify_data = structure()
+        if unique == True:
+            messages = [ '{} #{}'.format( message, index )
+                for index in range( args.count ) ]
+        else:
+            messages = [ message ] * args.count
+        start = time.perf_counter()
+        for text in messages:
+            notify_data.set_text( 'szInfo', text )
+            notify_data.set_text( 'szInfoTitle', title )
+        report( name, args.count, time.perf_counter() - start )
+    print( bugme.encode_wide.cache_info() )
+
+    return 0
+
+
+#=============================================================================
+def bench_templates( args ):
+    """
+    Compares formatting and encoding every alert to rendering alerts from
+    cached template payloads, on a skewed (Zipf-like) workload.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import random
+    import bugme
+
+    # A few dozen templates.
+    generator = random.Random( args.seed )
+    registry  = bugme.TemplateRegistry( args.capacity )
+    names     = []
+    for index in range( args.templates ):
+        name = 'template-{}'.format( index )
+        registry.register(
+            name,
+            'Build {job} failed on {host} (step ' + str( index ) + ').',
+            'Build Failed: {host}',
+            bugme.NIIF_ERROR
+        )
+        names.append( name )
+    # Distinct alerts (template, job, and host), then a workload in which
+    # a few of them are much more frequent than the rest.
+    distinct = [
+        (
+            generator.choice( names ),
+            generator.randrange( 10000 ),
+            'build-{:02}'.format( generator.randrange( 100 ) )
+        )
+        for _ in range( args.distinct )
+    ]
+    weights = [
+        1.0 / ( rank ** args.skew ) for rank in range( 1, args.distinct + 1 )
+    ]
+    alerts  = generator.choices( distinct, weights, k = args.count )
+
+    # Format and encode every alert (without any caching).
+    compiled    = { name : registry._names[ name ] for name in names }
+    notify_data = bugme.NOTIFYICONDATAW()
+    encode      = bugme.encode_wide.__wrapped__
+    info_size   = bugme.NOTIFYICONDATAW.INFO_SIZE
+    title_size  = bugme.NOTIFYICONDATAW.TITLE_SIZE
+    start       = time.perf_counter()
+    for name, job, host in alerts:
+        template = compiled[ name ]
+        notify_data.set_data( 'szInfo', encode( template.message.format(
+            job = job, host = host ), info_size ) )
+        notify_data.set_data( 'szInfoTitle', encode( template.title.format(
+            job = job, host = host ), title_size ) )
+    report( 'format + encode', args.count, time.perf_counter() - start )
+
+    # Format every alert (reusing recently encoded text).
+    bugme.encode_wide.cache_clear()
+    start = time.perf_counter()
+    for name, job, host in alerts:
+        template = compiled[ name ]
+        notify_data.set_text( 'szInfo', template.message.format(
+            job = job, host = host ) )
+        notify_data.set_text( 'szInfoTitle', template.title.format(
+            job = job, host = host ) )
+    report( 'format + set_text()', args.count, time.perf_counter() - start )
+
+    # Render from the registry, and copy the pre-encoded payloads.
+    start = time.perf_counter()
+    for name, job, host in alerts:
+        payload = registry.render( name, job, host )
+        notify_data.set_data( 'szInfo', payload.info )
+        notify_data.set_data( 'szInfoTitle', payload.info_title )
+    report( 'render + set_data()', args.count, time.perf_counter() - start )
+
+    stats = registry.stats()
+    print( 'hit rate {:.1%} ({} hits, {} misses, {} evictions)'.format(
+        stats[ 'hit_rate' ],
+        stats[ 'hits' ],
+        stats[ 'misses' ],
+        stats[ 'evictions' ]
+    ) )
+    return 0
+
+
+#=============================================================================
+def bench_history( args ):
+    """
+    Measures recording and querying the notification history, and checks
+    that its memory stays flat once the ring is full.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import random
+    import tracemalloc
+    import bugme
+
+    generator = random.Random( args.seed )
+    titles    = [ 'Build {} Failed'.format( index ) for index in range( 50 ) ]
+    severity  = ( bugme.NIIF_INFO, bugme.NIIF_WARNING, bugme.NIIF_ERROR )
+    outcomes  = (
+        bugme.OUTCOME_CLICKED,
+        bugme.OUTCOME_TIMEOUT,
+        bugme.OUTCOME_TIMEOUT,
+        bugme.OUTCOME_HIDDEN
+    )
+    entries   = [
+        (
+            generator.choice( titles ),
+            generator.choice( severity ),
+            generator.choice( outcomes )
+        )
+        for _ in range( 4096 )
+    ]
+
+    # Record (and complete) twice the ring's capacity.
+    history = bugme.History( args.count )
+    when    = time.time() - args.count
+    start   = time.perf_counter()
+    for index in range( 2 * args.count ):
+        title, flags, outcome = entries[ index & 4095 ]
+        sequence = history.record( title, flags, None, when + index / 2 )
+        history.complete( sequence, outcome )
+    report( 'record() + complete()', 2 * args.count,
+        time.perf_counter() - start )
+
+    # Record it again, sampling the memory as the ring fills (and after it
+    # wraps).
+    tracemalloc.start()
+    history = bugme.History( args.count )
+    base    = tracemalloc.get_traced_memory()[ 0 ]
+    samples = []
+    step    = args.count // 4
+    for index in range( 2 * args.count ):
+        title, flags, outcome = entries[ index & 4095 ]
+        sequence = history.record( title, flags, None, when + index / 2 )
+        history.complete( sequence, outcome )
+        if ( index + 1 ) % step == 0:
+            samples.append( ( index + 1,
+                tracemalloc.get_traced_memory()[ 0 ] - base ) )
+    tracemalloc.stop()
+    for recorded, size in samples:
+        print( '{:>9} recorded, {:>9} retained: {:>8.1f} KiB '
+            '({:.1f} B/entry)'.format(
+                recorded,
+                min( recorded, args.count ),
+                size / 1024,
+                size / min( recorded, args.count )
+            ) )
+
+    # Queries over the full ring.
+    now   = when + args.count
+    start = time.perf_counter()
+    found = history.unacknowledged( 3600.0, now = now )
+    print( 'unacknowledged errors (last hour): {} in {:.2f} ms'.format(
+        len( found ), ( time.perf_counter() - start ) * 1000 ) )
+    start = time.perf_counter()
+    rates = history.click_through()
+    print( 'click-through ({} titles, {} entries): {:.2f} ms'.format(
+        len( rates ), len( history ),
+        ( time.perf_counter() - start ) * 1000 ) )
+
+    # Memory must not grow once the ring has wrapped.
+    full, final = samples[ 3 ][ 1 ], samples[ -1 ][ 1 ]
+    if final > full * 1.05:
+        print( 'History memory grew after wrapping ({} > {} bytes).'.format(
+            final, full ) )
+        return 1
+    return 0
+
+
+#=============================================================================
+def bench_actions( args ):
+    """
+    Clicks balloons (with the in-memory backend) that carry slow actions,
+    and measures how long the message pump and the actions take.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import bugme
+
+    # Every balloon is clicked; each click runs a slow callable.
+    backend = bugme.MemoryBackend( outcome = bugme.NIN_BALLOONUSERCLICK )
+    pool    = bugme.ActionPool( args.workers, args.count )
+    action  = bugme.Action( lambda: time.sleep( args.delay ) or 'ok' )
+    with bugme.Notifier( backend, actions = pool ) as notifier:
+        start = time.perf_counter()
+        for _ in range( args.count ):
+            notifier.notify( 'Build failed.', action = action )
+        elapsed = time.perf_counter() - start
+    report( 'clicked notify()', args.count, elapsed )
+    start = time.perf_counter()
+    pool.shutdown()
+    print( 'actions finished {:.3f} s later ({} workers, {:.3f} s each)'
+        .format( time.perf_counter() - start, args.workers, args.delay ) )
+    return 0
+
+
+#=============================================================================
+def bench_digest( args ):
+    """
+    Measures the windowed digest, and checks that its memory stays flat as
+    the number of distinct titles grows.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import collections
+    import random
+    import tracemalloc
+    import bugme
+
+    # A burst of distinct sources, with a few heavy hitters among them.
+    generator = random.Random( args.seed )
+    heavy     = [ 'db-{:02}'.format( index ) for index in range( args.top ) ]
+    def titles():
+        for index in range( args.count ):
+            yield 'host-{}'.format( index )
+            if generator.random() < 0.25:
+                yield generator.choice( heavy )
+
+    # Adding records.
+    generator.seed( args.seed )
+    digest = bugme.Digest( top = args.top )
+    added  = 0
+    start  = time.perf_counter()
+    for title in titles():
+        digest.add( 'Disk full.', title, bugme.NIIF_WARNING )
+        added += 1
+    report( 'add()', added, time.perf_counter() - start )
+    start = time.perf_counter()
+    message, title, flags = digest.flush()
+    print( 'flush(): {:.2f} ms, {} chars'.format(
+        ( time.perf_counter() - start ) * 1000, len( message ) ) )
+    print( '\n'.join( '    ' + line for line in message.splitlines() ) )
+
+    # Add them again, sampling the memory as the distinct titles grow.
+    generator.seed( args.seed )
+    tracemalloc.start()
+    base    = tracemalloc.get_traced_memory()[ 0 ]
+    digest  = bugme.Digest( top = args.top )
+    samples = []
+    step    = 10
+    for title in titles():
+        digest.add( 'Disk full.', title, bugme.NIIF_WARNING )
+        if title.startswith( 'host-' ) == False:
+            continue
+        distinct = int( title[ 5 : ] ) + 1
+        if distinct == step:
+            samples.append( (
+                distinct, tracemalloc.get_traced_memory()[ 0 ] - base
+            ) )
+            step *= 10
+    tracemalloc.stop()
+    for distinct, size in samples:
+        print( '{:>9} distinct: {:>8.1f} KiB'.format( distinct, size / 1024 ) )
+
+    # The same titles counted exactly, for comparison.
+    generator.seed( args.seed )
+    tracemalloc.start()
+    base  = tracemalloc.get_traced_memory()[ 0 ]
+    exact = collections.Counter( titles() )
+    size  = tracemalloc.get_traced_memory()[ 0 ] - base
+    tracemalloc.stop()
+    print( '{:>9} distinct: {:>8.1f} KiB (exact Counter)'.format(
+        len( exact ), size / 1024 ) )
+
+    # Accuracy of the heavy hitters.
+    stats  = digest.stats()
+    found  = set( digest._counts ) & set( heavy )
+    error  = max(
+        digest.sketch.estimate( key ) - exact[ key ] for key in heavy
+    )
+    print( 'top {}: {} of {} heavy hitters, max overestimate {} '
+        '({:.3%} of {} messages)'.format(
+            args.top, len( found ), len( heavy ), error,
+            error / len( digest ), len( digest )
+        ) )
+    print( 'distinct: {} estimated, {} exact ({:+.1%})'.format(
+        stats[ 'distinct' ], len( exact ),
+        ( stats[ 'distinct' ] / len( exact ) ) - 1 ) )
+    return 0 if ( len( found ) == len( heavy ) ) \
+        and ( len( message ) < bugme.NOTIFYICONDATAW.INFO_SIZE ) else 1
+
+
+#=============================================================================
+def bench_wheel( args ):
+    """
+    Measures the timer wheel as the number of pending timers grows, and as
+    it is advanced under a fake clock.
+
+    @param args Parsed command-line arguments
+    @return     Shell exit code (0 = success)
+    """
+    import random
+    import bugme
+
+    rng        = random.Random( args.seed )
+    resolution = 0.01
+    now        = 1000.0
+    clock      = lambda: now
+    spans      = ( 1.0, 60.0, 3600.0, 86400.0 )
+
+    # Schedule and cancel with the wheel held at increasing sizes.
+    size = 1000
+    while size <= args.count:
+        wheel = bugme.TimerWheel( resolution, clock = clock )
+        for index in range( size ):
+            wheel.schedule( now + rng.uniform( 0, rng.choice( spans ) ),
+                None )
+        deadlines = [
+            now + rng.uniform( 0, rng.choice( spans ) )
+            for _ in range( 10000 )
+        ]
+        start = time.perf_counter()
+        for deadline in deadlines:
+            wheel.cancel( wheel.schedule( deadline, None ) )
+        report( 'schedule+cancel at {} pending'.format( size ), 10000,
+            time.perf_counter() - start )
+        size *= 10
+
+    # Schedule timers over a day, cancel a third, and advance the clock in
+    # uneven steps (with the occasional long stall).
+    # (Firing on time is checked by tests/test_wheel.py.)
+    wheel  = bugme.TimerWheel( resolution, clock = clock )
+    timers = [
+        wheel.schedule( now + rng.uniform( 0, rng.choice( spans ) ),
+            lambda: None )
+        for _ in range( args.count )
+    ]
+    for timer in rng.sample( timers, args.count // 3 ):
+        wheel.cancel( timer )
+    advances = 0
+    start    = time.perf_counter()
+    while len( wheel ) > 0:
+        if rng.random() < 0.001:
+            now += rng.uniform( 1.0, 600.0 )
+        else:
+            now += rng.uniform( 0.001, 0.05 )
+        wheel.advance()
+        advances += 1
+    report( 'advance ({} fired)'.format( wheel.fired ), advances,
+        time.perf_counter() - start )
+    return 0
+
+
+#=============================================================================
+def main( argv ):
+    """
+    Script execution entry point
+
+    @param argv List of arguments passed to the script
+    @return     Shell exit code (0 = success)
+    """
+
+    # imports when using this as a script
+    import argparse
+
+    # make the benchmarked module importable
+    sys.path.insert( 0, script_dir )
+
+    # create and configure an argument parser
+    parser = argparse.ArgumentParser(
+        description = 'Bugme Benchmarks'
+    )
+    commands = parser.add_subparsers( dest = 'command' )
+    commands.required = True
+
+    # import time benchmark
+    command = commands.add_parser(
+        'importtime',
+        help = 'Measure module import time against a budget.'
+    )
+    command.add_argument(
+        '-b',
+        '--budget',
+        default = 50000,
+        type    = int,
+        help    = 'Maximum median cumulative import time (microseconds).'
+    )
+    command.add_argument(
+        '-r',
+        '--runs',
+        default = 9,
+        type    = int,
+        help    = 'Number of fresh interpreters to sample.'
+    )
+    command.set_defaults( function = bench_importtime )
+
+    # notifier setup/reuse benchmark
+    command = commands.add_parser(
+        'notifier',
+        help = 'Compare one-shot notify() to persistent and batch paths.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 10000,
+        type    = int,
+        help    = 'Number of notifications to send.'
+    )
+    command.set_defaults( function = bench_notifier )
+
+    # asynchronous notification benchmark
+    command = commands.add_parser(
+        'async',
+        help = 'Measure many in-flight notify_async() awaits.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 10000,
+        type    = int,
+        help    = 'Number of concurrent notifications.'
+    )
+    command.set_defaults( function = bench_async )
+
+    # notification data structure benchmark
+    command = commands.add_parser(
+        'structures',
+        help = 'Measure NOTIFYICONDATA structures prepared per second.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 100000,
+        type    = int,
+        help    = 'Number of structures to prepare.'
+    )
+    command.set_defaults( function = bench_structures )
+
+    # GUID conversion benchmark
+    command = commands.add_parser(
+        'guid',
+        help = 'Check and measure GUID conversions.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 100000,
+        type    = int,
+        help    = 'Number of GUIDs to convert.'
+    )
+    command.add_argument(
+        '-s',
+        '--seed',
+        default = None,
+        type    = int,
+        help    = 'Seed for the conversion self-test.'
+    )
+    command.set_defaults( function = bench_guid )
+
+    # multiplexed pump benchmark
+    command = commands.add_parser(
+        'pump',
+        help = 'Measure producer threads sharing one pump thread.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 40000,
+        type    = int,
+        help    = 'Number of notifications to submit.'
+    )
+    command.set_defaults( function = bench_pump )
+
+    # stream mode benchmark
+    command = commands.add_parser(
+        'stream',
+        help = 'Measure stream mode on multi-megabyte input.'
+    )
+    command.add_argument(
+        '-s',
+        '--size',
+        default = 8,
+        type    = int,
+        help    = 'Size of the generated input (megabytes).'
+    )
+    command.add_argument(
+        '-c',
+        '--capacity',
+        default = 64,
+        type    = int,
+        help    = 'Maximum number of records in flight.'
+    )
+    command.set_defaults( function = bench_stream )
+
+    # log following benchmark
+    command = commands.add_parser(
+        'follow',
+        help = 'Measure following a synthetic log with many rules.'
+    )
+    command.add_argument(
+        '-s',
+        '--size',
+        default = 64,
+        type    = int,
+        help    = 'Size of the synthetic log (megabytes).'
+    )
+    command.add_argument(
+        '-r',
+        '--rules',
+        default = 40,
+        type    = int,
+        help    = 'Number of rules.'
+    )
+    command.set_defaults( function = bench_follow )
+
+    # logging handler benchmark
+    command = commands.add_parser(
+        'logging',
+        help = 'Measure logging latency through BugmeHandler.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 100000,
+        type    = int,
+        help    = 'Number of records to log.'
+    )
+    command.set_defaults( function = bench_logging )
+
+    # instrumentation overhead benchmark
+    command = commands.add_parser(
+        'metrics',
+        help = 'Measure the overhead of per-phase instrumentation.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 10000,
+        type    = int,
+        help    = 'Number of notifications to send.'
+    )
+    command.set_defaults( function = bench_metrics )
+
+    # benchmark suite with stored baselines
+    command = commands.add_parser(
+        'suite',
+        help = 'Measure notify(), Notifier and main() against baselines.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 2000,
+        type    = int,
+        help    = 'Number of notifications per case.'
+    )
+    command.add_argument(
+        '-l',
+        '--latency',
+        default = 0.0,
+        type    = float,
+        help    = 'Simulated balloon display time (seconds).'
+    )
+    command.add_argument(
+        '-b',
+        '--baseline',
+        default = os.path.join( script_dir, 'benchmark_baseline.json' ),
+        help    = 'Path of the stored baselines.'
+    )
+    command.add_argument(
+        '-t',
+        '--tolerance',
+        default = 0.5,
+        type    = float,
+        help    = 'Allowed fractional throughput loss against baselines.'
+    )
+    command.add_argument(
+        '-s',
+        '--save',
+        default = False,
+        help    = 'Store the results as the new baselines.',
+        action  = 'store_true'
+    )
+    command.set_defaults( function = bench_suite )
+
+    # notification spool benchmark
+    command = commands.add_parser(
+        'spool',
+        help = 'Measure the notification spool.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 20000,
+        type    = int,
+        help    = 'Number of records to spool.'
+    )
+    command.set_defaults( function = bench_spool )
+
+    # shared-memory ring benchmark
+    command = commands.add_parser(
+        'ring',
+        help = 'Stress the shared-memory ring with producer processes.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 80000,
+        type    = int,
+        help    = 'Number of notifications to put.'
+    )
+    command.add_argument(
+        '-s',
+        '--slots',
+        default = 256,
+        type    = int,
+        help    = 'Number of slots in each ring lane.'
+    )
+    command.set_defaults( function = bench_ring )
+
+    # priority scheduler benchmark
+    command = commands.add_parser(
+        'scheduler',
+        help = 'Measure priority scheduling with many queued balloons.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 100000,
+        type    = int,
+        help    = 'Largest number of queued notifications.'
+    )
+    command.set_defaults( function = bench_scheduler )
+
+    # ingestion server benchmark
+    command = commands.add_parser(
+        'serve',
+        help = 'Measure the UDP/TCP ingestion server on loopback.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 50000,
+        type    = int,
+        help    = 'Number of messages to send.'
+    )
+    command.set_defaults( function = bench_serve )
+
+    # wide (UTF-16) structures benchmark
+    command = commands.add_parser(
+        'unicode',
+        help = 'Measure the wide NOTIFYICONDATAW structures.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 100000,
+        type    = int,
+        help    = 'Number of structures to fill.'
+    )
+    command.set_defaults( function = bench_unicode )
+
+    # message templates benchmark
+    command = commands.add_parser(
+        'templates',
+        help = 'Measure cached template payloads on a skewed workload.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 200000,
+        type    = int,
+        help    = 'Number of alerts.'
+    )
+    command.add_argument(
+        '-t',
+        '--templates',
+        default = 40,
+        type    = int,
+        help    = 'Number of templates.'
+    )
+    command.add_argument(
+        '-d',
+        '--distinct',
+        default = 20000,
+        type    = int,
+        help    = 'Number of distinct alerts.'
+    )
+    command.add_argument(
+        '-k',
+        '--skew',
+        default = 1.1,
+        type    = float,
+        help    = 'Zipf exponent of the alerts\' popularity.'
+    )
+    command.add_argument(
+        '--capacity',
+        default = 4096,
+        type    = int,
+        help    = 'Number of payloads cached.'
+    )
+    command.add_argument(
+        '-s',
+        '--seed',
+        default = 0,
+        type    = int,
+        help    = 'Seed for the workload.'
+    )
+    command.set_defaults( function = bench_templates )
+
+    # notification history benchmark
+    command = commands.add_parser(
+        'history',
+        help = 'Measure the notification history (and its memory).'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 1000000,
+        type    = int,
+        help    = 'Number of entries retained.'
+    )
+    command.add_argument(
+        '-s',
+        '--seed',
+        default = 0,
+        type    = int,
+        help    = 'Seed for the recorded entries.'
+    )
+    command.set_defaults( function = bench_history )
+
+    # click actions benchmark
+    command = commands.add_parser(
+        'actions',
+        help = 'Measure click actions run off the message pump.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 40,
+        type    = int,
+        help    = 'Number of clicked balloons.'
+    )
+    command.add_argument(
+        '-w',
+        '--workers',
+        default = 4,
+        type    = int,
+        help    = 'Number of action worker threads.'
+    )
+    command.add_argument(
+        '-d',
+        '--delay',
+        default = 0.05,
+        type    = float,
+        help    = 'Seconds each action takes.'
+    )
+    command.set_defaults( function = bench_actions )
+
+    # digest benchmark
+    command = commands.add_parser(
+        'digest',
+        help = 'Measure the windowed digest (and its memory).'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 1000000,
+        type    = int,
+        help    = 'Number of distinct titles.'
+    )
+    command.add_argument(
+        '-t',
+        '--top',
+        default = 8,
+        type    = int,
+        help    = 'Number of heavy hitters (and titles listed).'
+    )
+    command.add_argument(
+        '-s',
+        '--seed',
+        default = 0,
+        type    = int,
+        help    = 'Seed for the heavy hitters.'
+    )
+    command.set_defaults( function = bench_digest )
+
+    # timer wheel benchmark
+    command = commands.add_parser(
+        'wheel',
+        help = 'Measure the timer wheel with many pending timers.'
+    )
+    command.add_argument(
+        '-c',
+        '--count',
+        default = 100000,
+        type    = int,
+        help    = 'Number of pending timers.'
+    )
+    command.add_argument(
+        '-s',
+        '--seed',
+        default = 0,
+        type    = int,
+        help    = 'Seed for the deadlines and clock steps.'
+    )
+    command.set_defaults( function = bench_wheel )
+
+    # parse the arguments
+    args = parser.parse_args( argv[ 1 : ] )
+
+    # run the selected benchmark
+    return args.function( args )
+
+
+#=============================================================================
+if __name__ == "__main__":
+    sys.exit( main( sys.argv ) )
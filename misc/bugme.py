@@ -11,39 +11,61 @@ Example Win32 Notification API Usage
 """
 
 
+import array
+import bisect
+import collections
 import ctypes
 import ctypes.wintypes
+import functools
+import heapq
+import itertools
 import logging
+import math
+import mmap
 import os
+import re
+import string
+import struct
 import sys
+import threading
 import time
-import uuid
+import zlib
 
 
 __version__ = '0.0.0'
 
 
-# Set logging level.
-logging.basicConfig( level = logging.WARN )
-
-
 #-----------------------------------------------------------------------------
 # Define additional types needed for the Win32 API.
 #-----------------------------------------------------------------------------
 
-ctypes.wintypes.HCURSOR = ctypes.wintypes.HANDLE
-ctypes.wintypes.TCHAR   = ctypes.c_char
-ctypes.wintypes.LPCTSTR = ctypes.c_char_p
-ctypes.wintypes.LPTSTR  = ctypes.wintypes.LPCTSTR
-ctypes.wintypes.LRESULT = ctypes.c_long
-ctypes.wintypes.va_list = ctypes.c_char_p
+# DWORD is 32 bits everywhere (`ctypes.wintypes.DWORD` is a C long, which is
+# 64 bits on LP64 platforms and would break structure layouts there).
+DWORD   = ctypes.c_uint32
+HCURSOR = ctypes.wintypes.HANDLE
+TCHAR   = ctypes.c_char
+LPCTSTR = ctypes.c_char_p
+LPTSTR  = LPCTSTR
+LRESULT = ctypes.c_long
+va_list = ctypes.c_char_p
+
+# WCHAR is a UTF-16 code unit.  Where `wchar_t` is 32 bits (e.g. Linux),
+# 16-bit integers stand in so the wide structures keep their Win32 layout.
+if ctypes.sizeof( ctypes.c_wchar ) == 2:
+    WCHAR = ctypes.c_wchar
+else:
+    WCHAR = ctypes.c_uint16
+LPCWSTR = ctypes.c_wchar_p
 
 
 #-----------------------------------------------------------------------------
 # Callback function type needed for certain structures.
+#
+# Off Windows, the C calling convention stands in for `WINFUNCTYPE` so that
+# the structures can still be declared (and used with in-memory backends).
 #-----------------------------------------------------------------------------
 
-WNDPROC = ctypes.WINFUNCTYPE(
+WNDPROC = getattr( ctypes, 'WINFUNCTYPE', ctypes.CFUNCTYPE )(
     ctypes.c_int,
     ctypes.wintypes.HWND,
     ctypes.c_uint,
@@ -87,7 +109,7 @@ class GUID( ctypes.Structure ):
 
     # Structure layout
     _fields_ = [
-        ( 'Data1', ctypes.wintypes.DWORD ),
+        ( 'Data1', DWORD                 ),
         ( 'Data2', ctypes.wintypes.WORD  ),
         ( 'Data3', ctypes.wintypes.WORD  ),
         ( 'Data4', GUID_DATA4_TYPE       )
@@ -99,14 +121,16 @@ class GUID( ctypes.Structure ):
         """
         GUID structure initializer.
 
-        @param string Optionally specify initial data as a UUID string.
+        @param string Optionally specify initial data as a UUID string (or
+                      the Data1 field value).
         """
-        if type( string ) is str:
+        if isinstance( string, str ):
             super().__init__( *args, **kwargs )
             self.load_from_string( string )
-        else:
-            my_args = args.insert( 0, string )
+        elif string is None:
             super().__init__( *args, **kwargs )
+        else:
+            super().__init__( string, *args, **kwargs )
 
 
     #=========================================================================
@@ -116,20 +140,48 @@ class GUID( ctypes.Structure ):
 
         @return The dashed string representation of the GUID.
         """
-        node = 0
-        for dindex, shift in zip( range( 2, 8 ), range( 40, -1, -8 ) ):
-            node |= ( self.Data4[ dindex ] & 0xFF ) << shift
-        repr_id = uuid.UUID(
-            fields = (
-                self.Data1,
-                self.Data2,
-                self.Data3,
-                self.Data4[ 0 ] & 0xFF,
-                self.Data4[ 1 ] & 0xFF,
-                node
-            )
-        )
-        return repr_id.urn.split( ':' )[ 2 ].upper()
+        digits = self.to_bytes().hex().upper()
+        return '-'.join( (
+            digits[  0 :  8 ],
+            digits[  8 : 12 ],
+            digits[ 12 : 16 ],
+            digits[ 16 : 20 ],
+            digits[ 20 : 32 ]
+        ) )
+
+
+    #=========================================================================
+    @staticmethod
+    def parse( string ):
+        """
+        Parses a UUID string into the GUID's in-memory (little-endian) form.
+
+        Accepts the same forms as `uuid.UUID()`: optional braces, an optional
+        "urn:uuid:" prefix, and optional dashes.
+
+        @param string The string representing the UUID
+        @return       The 16 bytes of the GUID structure
+        """
+        if len( string ) == 36:
+            digits = string.replace( '-', '' )
+        else:
+            digits = string.replace( 'urn:', '' ).replace( 'uuid:', '' )
+            digits = digits.strip( '{}' ).replace( '-', '' )
+        if len( digits ) != 32:
+            raise ValueError( 'badly formed hexadecimal UUID string' )
+        return _swap_guid_bytes( bytes.fromhex( digits ) )
+
+
+    #=========================================================================
+    @classmethod
+    def from_string( cls, string ):
+        """
+        Creates a GUID from a UUID string.
+
+        @param string The string representing the UUID
+        @return       A new GUID
+        """
+        return cls.from_buffer_copy( cls.parse( string ) )
 
 
     #=========================================================================
@@ -139,42 +191,104 @@ class GUID( ctypes.Structure ):
 
         @param string URN string representing the UUID
         """
+        ctypes.memmove( ctypes.addressof( self ), self.parse( string ), 16 )
+
 
-        # Use uuid module to parse string, and load into integers.
-        load_id    = uuid.UUID( string )
+    #=========================================================================
+    @classmethod
+    def from_bytes_le( cls, data ):
+        """
+        Creates a GUID from its in-memory (little-endian) form.
 
-        # Place integer fields into structure members.
-        self.Data1 = load_id.fields[ 0 ]
-        self.Data2 = load_id.fields[ 1 ]
-        self.Data3 = load_id.fields[ 2 ]
+        This is the same form as `uuid.UUID.bytes_le`.
 
-        # The `Data4` field is composed of the last three UUID fields.
-        self.Data4 = self.GUID_DATA4_TYPE()
+        @param data The 16 bytes of the GUID structure
+        @return     A new GUID
+        """
+        return cls.from_buffer_copy( data )
 
-        # Use the clock_seq_hi_variant for the first `Data4` byte.
-        self.Data4[ 0 ] = load_id.fields[ 3 ]
 
-        # Use the clock_seq_low for the second `Data4` byte.
-        self.Data4[ 1 ] = load_id.fields[ 4 ]
+    #=========================================================================
+    @classmethod
+    def from_uuid( cls, value ):
+        """
+        Creates a GUID from a `uuid.UUID`.
 
-        # Use the node field for the remaining six `Data4` bytes.
-        node = load_id.fields[ 5 ]
-        for dindex, shift in zip( range( 2, 8 ), range( 40, -1, -8 ) ):
-            self.Data4[ dindex ] = ( node >> shift ) & 0xFF
+        @param value The UUID to convert
+        @return      A new GUID
+        """
+        return cls.from_buffer_copy( value.bytes_le )
 
 
     #=========================================================================
-    def _self_test( self ):
+    def to_bytes_le( self ):
         """
-        Self-test sanity check.
+        Converts the GUID to its in-memory (little-endian) form.
+
+        @return The 16 bytes of the GUID structure
         """
-        generated = uuid.uuid4()
-        expected  = str( generated ).upper()
-        self.load_from_string( expected )
-        actual = str( self )
-        if expected != actual:
-            return False
-        return True
+        return bytes( self )
+
+
+    #=========================================================================
+    def to_bytes( self ):
+        """
+        Converts the GUID to its big-endian (string order) form.
+
+        This is the same form as `uuid.UUID.bytes`.
+
+        @return The 16 bytes of the GUID in string order
+        """
+        return _swap_guid_bytes( bytes( self ) )
+
+
+    #=========================================================================
+    def to_uuid( self ):
+        """
+        Converts the GUID to a `uuid.UUID`.
+
+        @return The equivalent UUID
+        """
+        import uuid
+        return uuid.UUID( bytes_le = bytes( self ) )
+
+
+#=============================================================================
+def _swap_guid_bytes( data ):
+    """
+    Swaps GUID bytes between string order and in-memory order.
+
+    The Data1, Data2, and Data3 fields are stored little-endian; the Data4
+    bytes are stored in string order.  The swap is its own inverse.
+
+    @param data The 16 bytes of a GUID in either order
+    @return     The 16 bytes of the GUID in the other order
+    """
+    return data[ 3 :: -1 ] + data[ 5 : 3 : -1 ] + data[ 7 : 5 : -1 ] \
+        + data[ 8 : ]
+
+
+#=============================================================================
+def guid_array( strings, array = None ):
+    """
+    Converts many UUID strings into a ctypes array of GUIDs.
+
+    The strings are parsed into a single buffer that is copied into the
+    array with one move.
+
+    @param strings An iterable of UUID strings
+    @param array   Optional existing `GUID * n` array to fill (must be large
+                   enough)
+    @return        The filled array
+    """
+    data  = b''.join( [ GUID.parse( string ) for string in strings ] )
+    count = len( data ) // ctypes.sizeof( GUID )
+    if array is None:
+        array = ( GUID * count )()
+    elif len( array ) < count:
+        raise ValueError( 'GUID array is too small.' )
+    ctypes.memmove( array, data, len( data ) )
+    return array
 
 
 #=============================================================================
@@ -186,7 +300,81 @@ class NID_ANON_UNION( ctypes.Union ):
 
 
 #=============================================================================
-class NOTIFYICONDATA( ctypes.Structure ):
+class _NotifyIconData( ctypes.Structure ):
+    """
+    Operations shared by the ANSI and wide NOTIFYICONDATA structures.
+    """
+
+
+    #=========================================================================
+    def view( self ):
+        """
+        Provides a (cached) byte view of the structure's memory.
+
+        @return A writable memoryview of the structure's bytes
+        """
+        try:
+            return self._view
+        except AttributeError:
+            self._view = memoryview( self ).cast( 'B' )
+            return self._view
+
+
+    #=========================================================================
+    def set_text( self, field, text, encoding = None ):
+        """
+        Encodes text straight into one of the structure's character fields.
+
+        The encoded text is copied into the field with a single bounded move,
+        and terminated.  Text that does not fit is truncated on a character
+        boundary.
+
+        @param field    The name of the field (e.g. 'szInfo')
+        @param text     The text to store in the field
+        @param encoding The text encoding (defaults to ANSI_ENCODING)
+        """
+        offset, size         = self._text_fields[ field ]
+        data                 = encode_text( text, size, encoding )
+        end                  = offset + len( data )
+        view                 = self.view()
+        view[ offset : end ] = data
+        view[ end ]          = 0
+
+
+    #=========================================================================
+    def get_text( self, field, encoding = None ):
+        """
+        Decodes the text stored in one of the structure's character fields.
+
+        @param field    The name of the field (e.g. 'szInfo')
+        @param encoding The text encoding (defaults to ANSI_ENCODING)
+        @return         The field's text (up to its terminator)
+        """
+        offset, size = self._text_fields[ field ]
+        data         = bytes( self.view()[ offset : offset + size ] )
+        return data.split( b'\0', 1 )[ 0 ].decode(
+            ANSI_ENCODING if encoding is None else encoding,
+            'replace'
+        )
+
+
+    #=========================================================================
+    def set_data( self, field, data ):
+        """
+        Copies pre-encoded text into one of the structure's character fields.
+
+        @param field The name of the field (e.g. 'szInfo')
+        @param data  The encoded text, including its terminator (which must
+                     fit the field)
+        """
+        offset               = self._text_fields[ field ][ 0 ]
+        end                  = offset + len( data )
+        view                 = self.view()
+        view[ offset : end ] = data
+
+
+#=============================================================================
+class NOTIFYICONDATA( _NotifyIconData ):
     """
     Win32 NOTIFYICONDATA ctype Structure
 
@@ -225,23 +413,110 @@ class NOTIFYICONDATA( ctypes.Structure ):
 
     # Structure layout
     _fields_ = [
-        ( 'cbSize',           ctypes.wintypes.DWORD              ),
+        ( 'cbSize',           DWORD                              ),
+        ( 'hWnd',             ctypes.wintypes.HWND               ),
+        ( 'uID',              ctypes.wintypes.UINT               ),
+        ( 'uFlags',           ctypes.wintypes.UINT               ),
+        ( 'uCallbackMessage', ctypes.wintypes.UINT               ),
+        ( 'hIcon',            ctypes.wintypes.HICON              ),
+        ( 'szTip',            TCHAR * TIP_SIZE                   ),
+        ( 'dwState',          DWORD                              ),
+        ( 'dwStateMask',      DWORD                              ),
+        ( 'szInfo',           TCHAR * INFO_SIZE                  ),
+        ( '_anon_union',      NID_ANON_UNION                     ),
+        ( 'szInfoTitle',      TCHAR * TITLE_SIZE                 ),
+        ( 'dwInfoFlags',      DWORD                              ),
+        ( 'guidItem',         GUID                               ),
+        ( 'hBalloonIcon',     ctypes.wintypes.HICON              )
+    ]
+
+
+#=============================================================================
+class NOTIFYICONDATAW( _NotifyIconData ):
+    """
+    Win32 NOTIFYICONDATAW ctype Structure
+
+    The wide (UTF-16) variant of NOTIFYICONDATA used with Shell_NotifyIconW().
+    Its array sizes count WCHARs, so (unlike the ANSI structure) text that
+    does not fit the system code page is displayed as-is.
+    """
+
+    # Array sizes
+    TIP_SIZE   = 128
+    INFO_SIZE  = 256
+    TITLE_SIZE = 64
+
+    # Unnamed members
+    _anonymous_ = ( '_anon_union', )
+
+    # Structure layout
+    _fields_ = [
+        ( 'cbSize',           DWORD                              ),
         ( 'hWnd',             ctypes.wintypes.HWND               ),
         ( 'uID',              ctypes.wintypes.UINT               ),
         ( 'uFlags',           ctypes.wintypes.UINT               ),
         ( 'uCallbackMessage', ctypes.wintypes.UINT               ),
         ( 'hIcon',            ctypes.wintypes.HICON              ),
-        ( 'szTip',            ctypes.wintypes.TCHAR * TIP_SIZE   ),
-        ( 'dwState',          ctypes.wintypes.DWORD              ),
-        ( 'dwStateMask',      ctypes.wintypes.DWORD              ),
-        ( 'szInfo',           ctypes.wintypes.TCHAR * INFO_SIZE  ),
+        ( 'szTip',            WCHAR * TIP_SIZE                   ),
+        ( 'dwState',          DWORD                              ),
+        ( 'dwStateMask',      DWORD                              ),
+        ( 'szInfo',           WCHAR * INFO_SIZE                  ),
         ( '_anon_union',      NID_ANON_UNION                     ),
-        ( 'szInfoTitle',      ctypes.wintypes.TCHAR * TITLE_SIZE ),
-        ( 'dwInfoFlags',      ctypes.wintypes.DWORD              ),
-        ( 'guidItem',         GUID                               )
+        ( 'szInfoTitle',      WCHAR * TITLE_SIZE                 ),
+        ( 'dwInfoFlags',      DWORD                              ),
+        ( 'guidItem',         GUID                               ),
+        ( 'hBalloonIcon',     ctypes.wintypes.HICON              )
     ]
 
 
+    #=========================================================================
+    def set_text( self, field, text, encoding = None ):
+        """
+        Encodes text straight into one of the structure's character fields.
+
+        The text is encoded to UTF-16 (reusing the encoding of recently seen
+        text) and copied into the field, terminator included, with a single
+        bounded move.  Text that does not fit is truncated without splitting
+        a surrogate pair.
+
+        @param field    The name of the field (e.g. 'szInfo')
+        @param text     The text to store in the field
+        @param encoding Ignored (wide fields are always UTF-16)
+        """
+        offset, size         = self._text_fields[ field ]
+        data                 = encode_wide( text, size // 2 )
+        end                  = offset + len( data )
+        view                 = self.view()
+        view[ offset : end ] = data
+
+
+    #=========================================================================
+    def get_text( self, field, encoding = None ):
+        """
+        Decodes the text stored in one of the structure's character fields.
+
+        @param field    The name of the field (e.g. 'szInfo')
+        @param encoding Ignored (wide fields are always UTF-16)
+        @return         The field's text (up to its terminator)
+        """
+        offset, size = self._text_fields[ field ]
+        data         = bytes( self.view()[ offset : offset + size ] )
+        end          = 0
+        while ( end < size ) and ( data[ end : end + 2 ] != b'\0\0' ):
+            end += 2
+        return data[ : end ].decode( 'utf-16-le', 'replace' )
+
+
+# Character field offsets and sizes (in bytes)
+for _structure in ( NOTIFYICONDATA, NOTIFYICONDATAW ):
+    _structure._text_fields = {
+        name : ( getattr( _structure, name ).offset,
+            getattr( _structure, name ).size )
+        for name in ( 'szTip', 'szInfo', 'szInfoTitle' )
+    }
+del _structure
+
+
 #=============================================================================
 class WINDCLASS( ctypes.Structure ):
     """
@@ -265,7 +540,7 @@ class WINDCLASS( ctypes.Structure ):
         ( 'cbWndExtra',    ctypes.c_int ),
         ( 'hInstance',     ctypes.wintypes.HINSTANCE ),
         ( 'hIcon',         ctypes.wintypes.HICON ),
-        ( 'hCursor',       ctypes.wintypes.HCURSOR ),
+        ( 'hCursor',       HCURSOR ),
         ( 'hbrBackground', ctypes.wintypes.HBRUSH ),
         ( 'lpszMenuName',  ctypes.wintypes.LPCSTR ),
         ( 'lpszClassName', ctypes.wintypes.LPCSTR )
@@ -298,7 +573,7 @@ class WNDCLASSEX( ctypes.Structure ):
         ( 'cbWndExtra',    ctypes.c_int ),
         ( 'hInstance',     ctypes.wintypes.HINSTANCE ),
         ( 'hIcon',         ctypes.wintypes.HICON ),
-        ( 'hCursor',       ctypes.wintypes.HCURSOR ),
+        ( 'hCursor',       HCURSOR ),
         ( 'hbrBackground', ctypes.wintypes.HBRUSH ),
         ( 'lpszMenuName',  ctypes.wintypes.LPCSTR ),
         ( 'lpszClassName', ctypes.wintypes.LPCSTR ),
@@ -306,6 +581,27 @@ class WNDCLASSEX( ctypes.Structure ):
     ]
 
 
+#=============================================================================
+class WNDCLASSEXW( ctypes.Structure ):
+    """
+    The wide variant of WNDCLASSEX used with RegisterClassExW().
+    """
+    _fields_ = [
+        ( 'cbSize',        ctypes.wintypes.UINT ),
+        ( 'style',         ctypes.wintypes.UINT ),
+        ( 'lpfnWndProc',   WNDPROC ),
+        ( 'cbClsExtra',    ctypes.c_int ),
+        ( 'cbWndExtra',    ctypes.c_int ),
+        ( 'hInstance',     ctypes.wintypes.HINSTANCE ),
+        ( 'hIcon',         ctypes.wintypes.HICON ),
+        ( 'hCursor',       HCURSOR ),
+        ( 'hbrBackground', ctypes.wintypes.HBRUSH ),
+        ( 'lpszMenuName',  LPCWSTR ),
+        ( 'lpszClassName', LPCWSTR ),
+        ( 'hIconSm',       ctypes.wintypes.HICON )
+    ]
+
+
 #-----------------------------------------------------------------------------
 # Win32 API Constants
 #-----------------------------------------------------------------------------
@@ -313,6 +609,14 @@ class WNDCLASSEX( ctypes.Structure ):
 # CreateWindow default code
 CW_USEDEFAULT = 0x80000000
 
+# Error codes (GetLastError())
+ERROR_TIMEOUT = 1460
+
+# FormatMessage() flags
+FORMAT_MESSAGE_ALLOCATE_BUFFER = 0x00000100
+FORMAT_MESSAGE_IGNORE_INSERTS  = 0x00000200
+FORMAT_MESSAGE_FROM_SYSTEM     = 0x00001000
+
 # DWORD dwMessage
 NIM_ADD        = 0
 NIM_MODIFY     = 1
@@ -336,6 +640,7 @@ NIIF_INFO               = 0x00000001
 NIIF_WARNING            = 0x00000002
 NIIF_ERROR              = 0x00000003
 NIIF_USER               = 0x00000004
+NIIF_ICON_MASK          = 0x0000000F
 NIIF_NOSOUND            = 0x00000010
 NIIF_LARGE_ICON         = 0x00000020
 NIIF_RESPECT_QUIET_TIME = 0x00000080
@@ -347,7 +652,17 @@ NIS_SHAREDICON = 0x00000002
 # UINT uVersion
 NOTIFYICON_VERSION_4 = 4
 
+# LoadImage() types and flags
+IMAGE_ICON      = 1
+LR_LOADFROMFILE = 0x00000010
+LR_DEFAULTSIZE  = 0x00000040
+
+# Stock icons
+IDI_INFORMATION = 32516
+
 WM_DESTROY = 0x00000002
+WM_QUIT    = 0x00000012
+WM_TIMER   = 0x00000113
 WM_USER    = 0x00000400
 
 # Notification balloon events IDs
@@ -361,420 +676,7538 @@ NIN_BALLOONUSERCLICK = WM_USER + 5
 # Win32 API Function Prototypes
 #-----------------------------------------------------------------------------
 
-#=============================================================================
-ctypes.windll.user32.CreateWindowExA.argtypes = (
-    ctypes.wintypes.DWORD,
-    ctypes.wintypes.LPCTSTR,
-    ctypes.wintypes.LPCTSTR,
-    ctypes.wintypes.DWORD,
-    ctypes.c_int,
-    ctypes.c_int,
-    ctypes.c_int,
-    ctypes.c_int,
-    ctypes.wintypes.HWND,
-    ctypes.wintypes.HMENU,
-    ctypes.wintypes.HINSTANCE,
-    ctypes.wintypes.LPVOID
-)
-ctypes.windll.user32.CreateWindowExA.restype = ctypes.wintypes.HWND
+# Function prototypes: library, return type, and argument types.
+_PROTOTYPES = {
+
+    'CloseHandle' : ( 'kernel32', ctypes.wintypes.BOOL, (
+        ctypes.wintypes.HANDLE,
+    ) ),
+
+    'CreateEventW' : ( 'kernel32', ctypes.wintypes.HANDLE, (
+        ctypes.wintypes.LPVOID,
+        ctypes.wintypes.BOOL,
+        ctypes.wintypes.BOOL,
+        LPCWSTR
+    ) ),
+
+    'CreateWindowExA' : ( 'user32', ctypes.wintypes.HWND, (
+        DWORD,
+        LPCTSTR,
+        LPCTSTR,
+        DWORD,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.HMENU,
+        ctypes.wintypes.HINSTANCE,
+        ctypes.wintypes.LPVOID
+    ) ),
+
+    'CreateWindowExW' : ( 'user32', ctypes.wintypes.HWND, (
+        DWORD,
+        LPCWSTR,
+        LPCWSTR,
+        DWORD,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.HMENU,
+        ctypes.wintypes.HINSTANCE,
+        ctypes.wintypes.LPVOID
+    ) ),
+
+    'DefWindowProcA' : ( 'user32', LRESULT, (
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.UINT,
+        ctypes.wintypes.WPARAM,
+        ctypes.wintypes.LPARAM
+    ) ),
+
+    'DefWindowProcW' : ( 'user32', LRESULT, (
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.UINT,
+        ctypes.wintypes.WPARAM,
+        ctypes.wintypes.LPARAM
+    ) ),
+
+    'DestroyIcon' : ( 'user32', ctypes.wintypes.BOOL, (
+        ctypes.wintypes.HICON,
+    ) ),
+
+    'DestroyWindow' : ( 'user32', ctypes.wintypes.BOOL, (
+        ctypes.wintypes.HWND,
+    ) ),
+
+    'DispatchMessageA' : ( 'user32', LRESULT, (
+        ctypes.wintypes.LPMSG,
+    ) ),
+
+    'DispatchMessageW' : ( 'user32', LRESULT, (
+        ctypes.wintypes.LPMSG,
+    ) ),
+
+    'FormatMessageA' : ( 'kernel32', DWORD, (
+        DWORD,
+        ctypes.wintypes.LPCVOID,
+        DWORD,
+        DWORD,
+        LPTSTR,
+        DWORD,
+        ctypes.POINTER( va_list )
+    ) ),
+
+    'FormatMessageW' : ( 'kernel32', DWORD, (
+        DWORD,
+        ctypes.wintypes.LPCVOID,
+        DWORD,
+        DWORD,
+        ctypes.wintypes.LPVOID,
+        DWORD,
+        ctypes.POINTER( va_list )
+    ) ),
+
+    'GetMessageA' : ( 'user32', ctypes.wintypes.BOOL, (
+        ctypes.wintypes.LPMSG,
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.UINT,
+        ctypes.wintypes.UINT
+    ) ),
+
+    'GetMessageW' : ( 'user32', ctypes.wintypes.BOOL, (
+        ctypes.wintypes.LPMSG,
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.UINT,
+        ctypes.wintypes.UINT
+    ) ),
+
+    'GetModuleHandleA' : ( 'kernel32', ctypes.wintypes.HMODULE, (
+        LPCTSTR,
+    ) ),
+
+    'GetModuleHandleW' : ( 'kernel32', ctypes.wintypes.HMODULE, (
+        LPCWSTR,
+    ) ),
+
+    'GetLastError' : ( 'kernel32', DWORD, () ),
+
+    'KillTimer' : ( 'user32', ctypes.wintypes.BOOL, (
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.WPARAM
+    ) ),
+
+    'LoadIconA' : ( 'user32', ctypes.wintypes.HICON, (
+        ctypes.wintypes.HINSTANCE,
+        LPCTSTR
+    ) ),
+
+    'LoadIconW' : ( 'user32', ctypes.wintypes.HICON, (
+        ctypes.wintypes.HINSTANCE,
+        LPCWSTR
+    ) ),
+
+    'LoadImageA' : ( 'user32', ctypes.wintypes.HANDLE, (
+        ctypes.wintypes.HINSTANCE,
+        LPCTSTR,
+        ctypes.wintypes.UINT,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.wintypes.UINT
+    ) ),
+
+    'LoadImageW' : ( 'user32', ctypes.wintypes.HANDLE, (
+        ctypes.wintypes.HINSTANCE,
+        LPCWSTR,
+        ctypes.wintypes.UINT,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.wintypes.UINT
+    ) ),
+
+    'LocalFree' : ( 'kernel32', ctypes.wintypes.HLOCAL, (
+        ctypes.wintypes.HLOCAL,
+    ) ),
+
+    'MessageBoxW' : ( 'user32', ctypes.c_int, (
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.LPCWSTR,
+        ctypes.wintypes.LPCWSTR,
+        ctypes.wintypes.UINT
+    ) ),
+
+    'PostMessageA' : ( 'user32', ctypes.wintypes.BOOL, (
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.UINT,
+        ctypes.wintypes.WPARAM,
+        ctypes.wintypes.LPARAM
+    ) ),
+
+    'PostMessageW' : ( 'user32', ctypes.wintypes.BOOL, (
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.UINT,
+        ctypes.wintypes.WPARAM,
+        ctypes.wintypes.LPARAM
+    ) ),
+
+    'PostQuitMessage' : ( 'user32', None, (
+        ctypes.c_int,
+    ) ),
+
+    'RegisterClassExA' : ( 'user32', ctypes.wintypes.ATOM, (
+        ctypes.POINTER( WNDCLASSEX ),
+    ) ),
+
+    'RegisterClassExW' : ( 'user32', ctypes.wintypes.ATOM, (
+        ctypes.POINTER( WNDCLASSEXW ),
+    ) ),
+
+    'RegisterWindowMessageW' : ( 'user32', ctypes.wintypes.UINT, (
+        LPCWSTR,
+    ) ),
+
+    'SetEvent' : ( 'kernel32', ctypes.wintypes.BOOL, (
+        ctypes.wintypes.HANDLE,
+    ) ),
+
+    'SetTimer' : ( 'user32', ctypes.wintypes.WPARAM, (
+        ctypes.wintypes.HWND,
+        ctypes.wintypes.WPARAM,
+        ctypes.wintypes.UINT,
+        ctypes.c_void_p
+    ) ),
+
+    'Shell_NotifyIconA' : ( 'shell32', ctypes.wintypes.BOOL, (
+        DWORD,
+        ctypes.POINTER( NOTIFYICONDATA )
+    ) ),
+
+    'Shell_NotifyIconW' : ( 'shell32', ctypes.wintypes.BOOL, (
+        DWORD,
+        ctypes.POINTER( NOTIFYICONDATAW )
+    ) ),
+
+    'UnregisterClassA' : ( 'user32', ctypes.wintypes.BOOL, (
+        LPCTSTR,
+        ctypes.wintypes.HINSTANCE
+    ) ),
+
+    'UnregisterClassW' : ( 'user32', ctypes.wintypes.BOOL, (
+        LPCWSTR,
+        ctypes.wintypes.HINSTANCE
+    ) ),
+
+    'UpdateWindow' : ( 'user32', ctypes.wintypes.BOOL, (
+        ctypes.wintypes.HWND,
+    ) ),
+
+    'WaitForSingleObject' : ( 'kernel32', DWORD, (
+        ctypes.wintypes.HANDLE,
+        DWORD
+    ) )
+}
 
-#=============================================================================
-ctypes.windll.user32.DefWindowProcA.argtypes = (
-    ctypes.wintypes.HWND,
-    ctypes.wintypes.UINT,
-    ctypes.wintypes.WPARAM,
-    ctypes.wintypes.LPARAM
-)
-ctypes.windll.user32.DefWindowProcA.restype = ctypes.wintypes.LRESULT
 
 #=============================================================================
-ctypes.windll.user32.DestroyWindow.argtypes = (
-    ctypes.wintypes.HWND,
-)
-ctypes.windll.user32.DestroyWindow.restype = ctypes.wintypes.BOOL
+class Win32Binding( object ):
+    """
+    Lazily-bound Win32 API functions.
 
-#=============================================================================
-ctypes.windll.user32.DispatchMessageA.argtypes = (
-    ctypes.wintypes.LPMSG,
-)
-ctypes.windll.user32.DispatchMessageA.restype = ctypes.wintypes.LRESULT
+    Functions are looked up in their DLL, and given their prototype from
+    `_PROTOTYPES`, the first time they are accessed.  The typed function is
+    then cached on the instance, so later calls bypass the lookup entirely.
+    Nothing is loaded at import time, so this module can be imported where
+    the Win32 API does not exist.
 
-#=============================================================================
-ctypes.windll.kernel32.FormatMessageA.argtypes = (
-    ctypes.wintypes.DWORD,
-    ctypes.wintypes.LPCVOID,
-    ctypes.wintypes.DWORD,
-    ctypes.wintypes.DWORD,
-    ctypes.wintypes.LPTSTR,
-    ctypes.wintypes.DWORD,
-    ctypes.POINTER( ctypes.wintypes.va_list )
-)
-ctypes.windll.kernel32.FormatMessageA.restype = ctypes.wintypes.DWORD
+    Libraries are loaded with `use_last_error`, so each call's error code is
+    saved (see `ctypes.get_last_error()`) before the interpreter's own API
+    calls can overwrite it.
+    """
 
-#=============================================================================
-ctypes.windll.user32.GetMessageA.argtypes = (
-    ctypes.wintypes.LPMSG,
-    ctypes.wintypes.HWND,
-    ctypes.wintypes.UINT,
-    ctypes.wintypes.UINT
-)
-ctypes.windll.user32.GetMessageA.restype = ctypes.wintypes.BOOL
 
-#=============================================================================
-ctypes.windll.kernel32.GetModuleHandleA.argtypes = (
-    ctypes.wintypes.LPCTSTR,
-)
-ctypes.windll.kernel32.GetModuleHandleA.restype = ctypes.wintypes.HMODULE
+    #=========================================================================
+    def __init__( self ):
+        """
+        Initializes the binding (without loading any libraries).
+        """
+        self._libraries = {}
 
-#=============================================================================
-ctypes.windll.kernel32.GetLastError.argtypes = ()
-ctypes.windll.kernel32.GetLastError.restype = ctypes.wintypes.DWORD
 
-#=============================================================================
-ctypes.windll.user32.LoadIconA.argtypes = (
-    ctypes.wintypes.HINSTANCE,
-    ctypes.wintypes.LPCTSTR
-)
-ctypes.windll.user32.LoadIconA.restype = ctypes.wintypes.HICON
+    #=========================================================================
+    def __getattr__( self, name ):
+        """
+        Resolves and types a Win32 API function.
 
-#=============================================================================
-ctypes.windll.user32.LoadImageA.argtypes = (
-    ctypes.wintypes.HINSTANCE,
-    ctypes.wintypes.LPCTSTR,
-    ctypes.wintypes.UINT,
-    ctypes.c_int,
-    ctypes.c_int,
-    ctypes.wintypes.UINT
-)
-ctypes.windll.user32.LoadImageA.restype = ctypes.wintypes.HANDLE
+        @param name The name of the function
+        @return     The typed foreign function
+        """
 
-#=============================================================================
-ctypes.windll.user32.PostQuitMessage.argtypes = (
-    ctypes.c_int,
-)
-ctypes.windll.user32.PostQuitMessage.restype = None
+        # Check for a known prototype.
+        try:
+            library, restype, argtypes = _PROTOTYPES[ name ]
+        except KeyError:
+            raise AttributeError( name ) from None
 
-#=============================================================================
-ctypes.windll.user32.RegisterClassExA.argtypes = (
-    ctypes.POINTER( WNDCLASSEX ),
-)
-ctypes.windll.user32.RegisterClassExA.restype = ctypes.wintypes.ATOM
+        # Check for the Win32 API.
+        if getattr( ctypes, 'WinDLL', None ) is None:
+            raise OSError( 'The Win32 API is not available on this platform.' )
 
-#=============================================================================
-ctypes.windll.shell32.Shell_NotifyIconA.argtypes = (
-    ctypes.wintypes.DWORD,
-    ctypes.POINTER( NOTIFYICONDATA )
-)
-ctypes.windll.shell32.Shell_NotifyIconA.restype = ctypes.wintypes.BOOL
+        # Load the library once.
+        dll = self._libraries.get( library )
+        if dll is None:
+            dll = ctypes.WinDLL( library, use_last_error = True )
+            self._libraries[ library ] = dll
 
-#=============================================================================
-ctypes.windll.user32.UnregisterClassA.argtypes = (
-    ctypes.wintypes.LPCTSTR,
-    ctypes.wintypes.HINSTANCE
-)
-ctypes.windll.user32.UnregisterClassA.restype = ctypes.wintypes.BOOL
+        # Resolve and type the function, then cache it.
+        function          = getattr( dll, name )
+        function.argtypes = argtypes
+        function.restype  = restype
+        setattr( self, name, function )
+        return function
 
-#=============================================================================
-ctypes.windll.user32.UpdateWindow.argtypes = (
-    ctypes.wintypes.HWND,
-)
-ctypes.windll.user32.UpdateWindow.restype = ctypes.wintypes.BOOL
+
+# The lazily-bound Win32 API
+win32 = Win32Binding()
 
 
 #-----------------------------------------------------------------------------
 # Application Constants
 #-----------------------------------------------------------------------------
 
+# Text encoding used with the ANSI ("A") API (the system code page)
+ANSI_ENCODING = 'mbcs' if sys.platform == 'win32' else 'utf-8'
+
 APPLICATION_MESSAGE_ID = WM_USER + 24
+PUMP_MESSAGE_ID        = WM_USER + 25
+PUMP_TIMER_ID          = 25
 APPLICATION_NAME       = 'Bugme!'
 WINDOW_CLASS_NAME      = 'bugme_class'
 
-# Create a path to the icon shown in the tray.
-script_path = os.path.realpath( __file__ )
-script_dir  = os.path.dirname( script_path )
-project_dir = os.path.dirname( script_dir )
-icon_dir    = os.path.join( project_dir, 'icons' )
-ICON_PATH   = os.path.join( icon_dir, 'bugme.ico' )
+# Balloon outcomes (how each balloon went away)
+OUTCOME_CLICKED = 'clicked'
+OUTCOME_TIMEOUT = 'timeout'
+OUTCOME_HIDDEN  = 'hidden'
+OUTCOME_EXPIRED = 'expired'
+
+# Balloon events mapped to outcomes
+BALLOON_OUTCOMES = {
+    NIN_BALLOONUSERCLICK : OUTCOME_CLICKED,
+    NIN_BALLOONTIMEOUT   : OUTCOME_TIMEOUT,
+    NIN_BALLOONHIDE      : OUTCOME_HIDDEN
+}
+
+# Balloon icons mapped to scheduling priorities (higher is more urgent)
+SEVERITY_PRIORITIES = {
+    NIIF_NONE    : 0,
+    NIIF_INFO    : 1,
+    NIIF_USER    : 1,
+    NIIF_WARNING : 2,
+    NIIF_ERROR   : 3
+}
+
+# Record severities mapped to balloon icon flags
+SEVERITY_FLAGS = {
+    'none'    : NIIF_NONE,
+    'info'    : NIIF_INFO,
+    'warning' : NIIF_WARNING,
+    'warn'    : NIIF_WARNING,
+    'error'   : NIIF_ERROR,
+    'user'    : NIIF_USER
+}
 
 
-#-----------------------------------------------------------------------------
-# Convenience Functions for the Application
-#-----------------------------------------------------------------------------
-
 
 #=============================================================================
-def format_last_error():
+def _icon_path():
     """
-    Produces a string message of the last error that occurred.
+    Creates a path to the icon shown in the tray.
 
-    @return A string describing the most recent Win32 API error
+    @return The path to the project's icon
     """
+    script_path = os.path.realpath( __file__ )
+    script_dir  = os.path.dirname( script_path )
+    project_dir = os.path.dirname( script_dir )
+    icon_dir    = os.path.join( project_dir, 'icons' )
+    return os.path.join( icon_dir, 'bugme.ico' )
 
-    # Error message buffer size.
-    BUFFER_SIZE = 128
-
-    # Message buffer.
-    message = ctypes.create_string_buffer( BUFFER_SIZE )
 
-    # Most recent error code.
-    code = ctypes.windll.kernel32.GetLastError()
+#=============================================================================
+def __getattr__( name ):
+    """
+    Resolves module attributes that are expensive to compute at import time.
 
-    # Convert error code to string.
-    FORMAT_MESSAGE_FROM_HMODULE = 0x00000800
-    FORMAT_MESSAGE_FROM_SYSTEM  = 0x00001000
-    flags = FORMAT_MESSAGE_FROM_HMODULE | FORMAT_MESSAGE_FROM_SYSTEM
-    result = ctypes.windll.kernel32.FormatMessageA(
-        flags,                      # DWORD    dwFlags
-        None,                       # LPCVOID  lpSource
-        code,                       # DWORD    dwMessageId
-        0,                          # DWORD    dwLanguageId
-        ctypes.pointer( message ),  # LPTSTR   lpBufffer
-        BUFFER_SIZE,                # DWORD    nSize
-        None                        # va_list* Arguments
+    @param name The name of the attribute
+    @return     The attribute's value
+    """
+    if name == 'ICON_PATH':
+        globals()[ name ] = _icon_path()
+        return globals()[ name ]
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format( __name__, name )
     )
 
-    # Check success of formatting the error string.
-    if result == 0:
-        raise RuntimeError( 'FormatMessageW() failed.' )
 
-    # Return the message as a string.
-    return str( message )
+#-----------------------------------------------------------------------------
+# Convenience Functions for the Application
+#-----------------------------------------------------------------------------
 
 
 #=============================================================================
-def strarg( string ):
+@functools.lru_cache( maxsize = 256 )
+def format_error( code ):
     """
-    String-passing "macro" to convert Python (Unicode) strings into character
-    strings suitable for passing to the ASCII Win32 interfaces.
+    Describes a Win32 error code.
+
+    The system allocates a buffer large enough for the whole message, so
+    long messages are not truncated.  Descriptions are cached by code, so
+    each code is only looked up once.
 
-    @param string The string for which to build an argument object
+    @param code The error code (e.g. from GetLastError())
+    @return     A string describing the error
     """
-    return ctypes.c_char_p( bytes( string, 'ascii' ) )
+
+    # Let the system allocate the message buffer.
+    buffer = ctypes.wintypes.LPWSTR()
+    flags  = FORMAT_MESSAGE_ALLOCATE_BUFFER \
+        | FORMAT_MESSAGE_FROM_SYSTEM        \
+        | FORMAT_MESSAGE_IGNORE_INSERTS
+    try:
+        length = win32.FormatMessageW(
+            flags,                      # DWORD    dwFlags
+            None,                       # LPCVOID  lpSource
+            code,                       # DWORD    dwMessageId
+            0,                          # DWORD    dwLanguageId
+            ctypes.byref( buffer ),     # LPWSTR   lpBuffer
+            0,                          # DWORD    nSize
+            None                        # va_list* Arguments
+        )
+    except OSError:
+        length = 0
+
+    # Codes the system can not describe are reported by number.
+    if length == 0:
+        return 'Unknown error {} (0x{:08X}).'.format( code, code & 0xFFFFFFFF )
+
+    # Copy the message's value out of the buffer, then free it.
+    try:
+        return buffer.value.strip()
+    finally:
+        win32.LocalFree( buffer )
 
 
 #=============================================================================
-def notify_procedure( hWnd, uMsg, wParam, lParam ):
+def format_last_error():
     """
-    Handles messages for the window class.
+    Produces a string message of the last error that occurred.
 
-    @param hWnd   Destination window handle
-    @param uMsg   Event message ID
-    @param wParam Context-specific additional parameter
-    @param lParam Context-specific additional parameter
+    @return A string describing the most recent Win32 API error
     """
+    return format_error( ctypes.get_last_error() )
 
-    # Application message.
-    if uMsg == APPLICATION_MESSAGE_ID:
-
-        logging.debug( 'Application message received in window procedure.' )
 
-        # Determine details of important events to handle.
-        event = lParam & 0x0000FFFF;
-        if     ( event == NIN_BALLOONTIMEOUT   ) \
-            or ( event == NIN_BALLOONHIDE      ) \
-            or ( event == NIN_BALLOONUSERCLICK ):
+#=============================================================================
+class Win32Error( RuntimeError ):
+    """
+    A failed Win32 API call.
 
-            # Free the window responsible for the tray item.
-            ctypes.windll.user32.DestroyWindow( hWnd )
+    The error keeps the name of the API that failed and its error code; the
+    code's description is only looked up when the error is displayed.
+    """
 
-            # Unregister the window class.
-            ctypes.windll.user32.UnregisterClassA(
-                strarg( WINDOW_CLASS_NAME ),
-                ctypes.windll.kernel32.GetModuleHandleA( None )
-            )
 
-    # Window destroy message.
-    elif uMsg == WM_DESTROY:
+    #=========================================================================
+    def __init__( self, message, api, code = 0 ):
+        """
+        Initializes the error.
 
-        logging.debug( 'WM_DESTROY received in window procedure.' )
+        @param message Description of the operation that failed
+        @param api     The name of the API that failed (e.g.
+                       "Shell_NotifyIcon")
+        @param code    The API's error code (0 if unknown)
+        """
+        super().__init__( message, api, code )
+        self.message = message
+        self.api     = api
+        self.code    = code
 
-        # Prepare to remove the tray item.
-        notify_data = NOTIFYICONDATA(
-            cbSize = ctypes.sizeof( NOTIFYICONDATA ),
-            hWnd   = hWnd
-        )
 
-        # Remove the tray item.
-        result = ctypes.windll.shell32.Shell_NotifyIconA(
-            NIM_DELETE,
-            ctypes.byref( notify_data )
+    #=========================================================================
+    def __str__( self ):
+        if self.code == 0:
+            return '{} ({} failed.)'.format( self.message, self.api )
+        return '{} ({} failed: {})'.format(
+            self.message,
+            self.api,
+            format_error( self.code )
         )
 
-        # Check romoval.
-        if bool( result ) == False:
-            raise RuntimeError( 'Unable to delete notification item.' )
-
-        logging.debug( 'Notification item deleted.' )
 
-        # Indicate the application is shutting down.
-        ctypes.windll.user32.PostQuitMessage( 0 )
+#=============================================================================
+def encode_text( text, size, encoding = None ):
+    """
+    Encodes text to fit a fixed-size, terminated character field.
 
-    # All other messages.
-    else:
+    Characters that can not be encoded are replaced.  Text that does not fit
+    is truncated on a character boundary (never in the middle of a
+    multi-byte sequence).
 
-        # Pass message on to default handler.
-        return ctypes.windll.user32.DefWindowProcA(
-            hWnd,
-            uMsg,
-            wParam,
-            lParam
-        )
+    @param text     The text to encode
+    @param size     The size of the field (bytes, including the terminator)
+    @param encoding The text encoding (defaults to ANSI_ENCODING)
+    @return         The encoded text (without a terminator)
+    """
 
-    # Indicate message was handled here.
-    return 0
+    # Every character encodes to at least one byte, so only the characters
+    # that could possibly fit are encoded.
+    if encoding is None:
+        encoding = ANSI_ENCODING
+    limit = size - 1
+    data  = text[ : limit ].encode( encoding, 'replace' )
+    if len( data ) <= limit:
+        return data
+
+    # UTF-8 boundaries are found by backing up over continuation bytes.
+    if encoding in ( 'utf-8', 'utf8' ):
+        while ( limit > 0 ) and ( ( data[ limit ] & 0xC0 ) == 0x80 ):
+            limit -= 1
+        return data[ : limit ]
+
+    # Other (multi-byte) encodings are measured one character at a time.
+    length = 0
+    for index, character in enumerate( text[ : limit ] ):
+        length += len( character.encode( encoding, 'replace' ) )
+        if length > limit:
+            return text[ : index ].encode( encoding, 'replace' )
+    return data
 
 
 #=============================================================================
-def notify( message, title = 'Bugme!' ):
+@functools.lru_cache( maxsize = 1024 )
+def encode_wide( text, length ):
     """
-    Use the Win32 API to display a notification balloon.
+    Encodes text to fit a fixed-length, terminated wide character field.
 
-    @param message The message contents to display
-    @param title   The title of the message to display
+    The text is encoded to UTF-16 once; repeated text (e.g. from the same
+    message template) reuses the encoded buffer.  Text that does not fit is
+    truncated on a code point boundary (never between the halves of a
+    surrogate pair).  Lone surrogates are passed through unchanged.
+
+    @param text   The text to encode
+    @param length The length of the field (WCHARs, including the terminator)
+    @return       The UTF-16 (little-endian) text, including the terminator
     """
 
-    # Get current program module handle.
-    module_handle = ctypes.windll.kernel32.GetModuleHandleA( None )
+    # Every character encodes to at least one code unit, so only the
+    # characters that could possibly fit are encoded.
+    limit = ( length - 1 ) * 2
+    data  = text[ : length - 1 ].encode( 'utf-16-le', 'surrogatepass' )
+    if len( data ) > limit:
 
-    # Define the window class.
-    window_class = WNDCLASSEX(
-        cbSize        = ctypes.sizeof( WNDCLASSEX ),
-        hInstance     = module_handle,
-        lpszClassName = strarg( WINDOW_CLASS_NAME ),
-        lpfnWndProc   = WNDPROC( notify_procedure )
+        # Back up over a high (leading) surrogate cut from its low half.
+        if 0xD8 <= data[ limit - 1 ] <= 0xDB:
+            limit -= 2
+        data = data[ : limit ]
+    return data + b'\0\0'
+
+
+#=============================================================================
+def strarg( string, encoding = None ):
+    """
+    String-passing "macro" to convert Python (Unicode) strings into character
+    strings suitable for passing to the ANSI Win32 interfaces.
+
+    The string is encoded with `encode_text()`, so characters the code page
+    can not represent are replaced instead of raising.
+
+    @param string   The string for which to build an argument object
+    @param encoding The text encoding (defaults to ANSI_ENCODING)
+    @return         A `c_char_p` of the encoded, terminated string
+    """
+    size = ( len( string ) * 4 ) + 1
+    return ctypes.c_char_p( encode_text( string, size, encoding ) )
+
+
+#-----------------------------------------------------------------------------
+# Win32 Backends
+#-----------------------------------------------------------------------------
+
+#=============================================================================
+class Win32Backend( object ):
+    """
+    Shell/user32 backend that calls straight into the (wide) Win32 API.
+
+    Backends expose the handful of window and tray operations used by the
+    notifier.  Window procedures are plain Python callables taking
+    `( hWnd, uMsg, wParam, lParam )`; when a procedure returns `None`, the
+    backend passes the message on to the default window procedure.
+
+    The "W" functions are used throughout, so names and balloon text are
+    passed as UTF-16 (tray operations take NOTIFYICONDATAW structures).
+    """
+
+
+    #=========================================================================
+    def __init__( self ):
+        """
+        Initializes the backend.
+        """
+
+        # Keep references to the callback thunks for registered classes.
+        self._procedures = {}
+
+
+    #=========================================================================
+    def module_handle( self ):
+        """
+        Retrieves the handle of the current program module.
+
+        @return The module handle
+        """
+        return win32.GetModuleHandleW( None )
+
+
+    #=========================================================================
+    def register_class( self, class_name, procedure ):
+        """
+        Registers a window class.
+
+        @param class_name The name of the window class
+        @param procedure  The window procedure for the class
+        @return           The class atom (0 on failure)
+        """
+
+        # Wrap the procedure so unhandled messages reach the default handler.
+        def window_procedure( hWnd, uMsg, wParam, lParam ):
+            result = procedure( hWnd, uMsg, wParam, lParam )
+            if result is None:
+                return win32.DefWindowProcW(
+                    hWnd,
+                    uMsg,
+                    wParam,
+                    lParam
+                )
+            return result
+
+        # The thunk must outlive the class registration.
+        thunk = WNDPROC( window_procedure )
+        self._procedures[ class_name ] = thunk
+
+        # Define and register the window class.
+        window_class = WNDCLASSEXW(
+            cbSize        = ctypes.sizeof( WNDCLASSEXW ),
+            hInstance     = self.module_handle(),
+            lpszClassName = class_name,
+            lpfnWndProc   = thunk
+        )
+        return win32.RegisterClassExW(
+            ctypes.byref( window_class )
+        )
+
+
+    #=========================================================================
+    def unregister_class( self, class_name ):
+        """
+        Unregisters a window class.
+
+        @param class_name The name of the window class
+        @return           True if the class was unregistered
+        """
+        result = win32.UnregisterClassW(
+            class_name,
+            self.module_handle()
+        )
+        self._procedures.pop( class_name, None )
+        return bool( result )
+
+
+    #=========================================================================
+    def create_window( self, class_name, window_name ):
+        """
+        Creates a (never displayed) window that owns tray items.
+
+        @param class_name  The name of a registered window class
+        @param window_name The name of the window
+        @return            The window handle (false-y on failure)
+        """
+
+        # Set the window style flags.
+        WS_OVERLAPPED = 0x00000000
+        WS_SYSMENU    = 0x00080000
+        style = WS_OVERLAPPED | WS_SYSMENU
+
+        # Create the window.
+        return win32.CreateWindowExW(
+            0,                              # DWORD     dwExStyle
+            class_name,                     # LPCWSTR   lpClassName
+            window_name,                    # LPCWSTR   lpWindowName
+            style,                          # DWORD     dwStyle
+            0,                              # int       x
+            0,                              # int       y
+            CW_USEDEFAULT,                  # int       nWidth
+            CW_USEDEFAULT,                  # int       nHeight
+            0,                              # HWND      hWndParent
+            0,                              # HMENU     hMenu
+            self.module_handle(),           # HINSTANCE hInstance
+            None                            # LPVOID    lpParam
+        )
+
+
+    #=========================================================================
+    def destroy_window( self, hwnd ):
+        """
+        Destroys a window.
+
+        @param hwnd The window handle
+        @return     True if the window was destroyed
+        """
+        return bool( win32.DestroyWindow( hwnd ) )
+
+
+    #=========================================================================
+    def load_icon( self, path, size = 0,
+        flags = LR_LOADFROMFILE | LR_DEFAULTSIZE ):
+        """
+        Loads an icon from a file.
+
+        @param path  The path to the icon file
+        @param size  The width and height of the icon (0 for the default)
+        @param flags The LR_* flags for LoadImage()
+        @return      The icon handle (false-y on failure)
+        """
+        return win32.LoadImageW(
+            self.module_handle(),
+            path,
+            IMAGE_ICON,
+            size,
+            size,
+            flags
+        )
+
+
+    #=========================================================================
+    def load_stock_icon( self, identifier = IDI_INFORMATION ):
+        """
+        Loads a shared, system-provided icon.
+
+        @param identifier The IDI_* identifier of the icon
+        @return           The (shared) icon handle
+        """
+        return win32.LoadIconW( 0, ctypes.cast( identifier, LPCWSTR ) )
+
+
+    #=========================================================================
+    def destroy_icon( self, icon_handle ):
+        """
+        Releases an icon loaded from a file.
+
+        @param icon_handle The icon handle
+        @return            True if the icon was destroyed
+        """
+        return bool( win32.DestroyIcon( icon_handle ) )
+
+
+    #=========================================================================
+    def shell_notify_icon( self, message, notify_data ):
+        """
+        Adds, modifies, or deletes a tray item.
+
+        @param message     The NIM_* operation to perform
+        @param notify_data The NOTIFYICONDATAW describing the item
+        @return            True if the operation succeeded
+        """
+
+        # Shell_NotifyIcon() does not always set an error code, so a stale
+        # code must not be mistaken for the call's.
+        ctypes.set_last_error( 0 )
+        return bool(
+            win32.Shell_NotifyIconW(
+                message,
+                ctypes.byref( notify_data )
+            )
+        )
+
+
+    #=========================================================================
+    def get_message( self, message, hwnd ):
+        """
+        Waits for the next window message.
+
+        @param message The MSG structure to receive the message
+        @param hwnd    The window filter (None for all of the thread's windows)
+        @return        GetMessage() result (positive to keep pumping)
+        """
+        return win32.GetMessageW(
+            ctypes.byref( message ),
+            hwnd,
+            0,
+            0
+        )
+
+
+    #=========================================================================
+    def dispatch_message( self, message ):
+        """
+        Dispatches a window message to its window procedure.
+
+        @param message The MSG structure to dispatch
+        """
+        win32.DispatchMessageW( ctypes.byref( message ) )
+
+
+    #=========================================================================
+    def post_message( self, hwnd, uMsg, wParam = 0, lParam = 0 ):
+        """
+        Queues a message for a window (from any thread).
+
+        @param hwnd   Destination window handle
+        @param uMsg   Message ID
+        @param wParam Message argument 1
+        @param lParam Message argument 2
+        @return       True if the message was queued
+        """
+        return bool( win32.PostMessageW( hwnd, uMsg, wParam, lParam ) )
+
+
+    #=========================================================================
+    def set_timer( self, hwnd, timer_id, milliseconds ):
+        """
+        Starts (or restarts) a window's periodic WM_TIMER messages.
+
+        @param hwnd         The window handle
+        @param timer_id     The timer ID (passed as the messages' wParam)
+        @param milliseconds The interval between messages
+        @return             True if the timer was started
+        """
+        return bool( win32.SetTimer( hwnd, timer_id, milliseconds, None ) )
+
+
+    #=========================================================================
+    def kill_timer( self, hwnd, timer_id ):
+        """
+        Stops a window's periodic WM_TIMER messages.
+
+        @param hwnd     The window handle
+        @param timer_id The timer ID
+        @return         True if the timer was stopped
+        """
+        return bool( win32.KillTimer( hwnd, timer_id ) )
+
+
+    #=========================================================================
+    def register_message( self, name ):
+        """
+        Registers (or looks up) a system-wide window message.
+
+        @param name The name of the message (e.g. "TaskbarCreated")
+        @return     The message ID (0 on failure)
+        """
+        return win32.RegisterWindowMessageW( name )
+
+
+    #=========================================================================
+    def last_error( self ):
+        """
+        Retrieves the error code of the calling thread's last failed call.
+
+        @return The error code
+        """
+        return ctypes.get_last_error()
+
+
+#=============================================================================
+class MemoryBackend( object ):
+    """
+    In-memory stand-in for the Win32 backend.
+
+    Every call is counted in `calls`, and icons that have been loaded but not
+    destroyed are kept in `icons`.  Tray items live in a dictionary, and
+    balloons are "displayed" by queueing NIN_BALLOONSHOW followed by the
+    `outcome` event for the item's window.  This allows the notification
+    logic to run (and be benchmarked) anywhere.
+
+    Latency may be injected: `latency` delays each balloon's outcome (the
+    time it stays on screen), and `api_latency` makes calls to the named
+    APIs (e.g. "Shell_NotifyIcon") take time.  A balloon that is replaced
+    or whose tray item is deleted before its outcome is due ends with
+    NIN_BALLOONHIDE instead, as with the shell.
+
+    Transient shell failures may be injected: the next `failures` calls to
+    Shell_NotifyIcon fail (with ERROR_TIMEOUT, as when the shell is busy).
+    `restart_taskbar()` simulates the shell restarting.
+
+    With `keep_balloons`, the message, title, and NIIF_* flags of every
+    balloon displayed are kept (in order) in `balloons`.
+
+    Window timers queue WM_TIMER on the same schedule as balloon outcomes
+    (each one again `interval` after it is delivered, so they do not pile
+    up).  A balloon modified with an empty `szInfo` is retracted (ending
+    with NIN_BALLOONHIDE).
+    """
+
+    # Message posted to end a message loop
+    WM_QUIT = WM_QUIT
+
+
+    #=========================================================================
+    def __init__( self, outcome = None, latency = 0.0, api_latency = None,
+        clock = time.monotonic, failures = 0, keep_balloons = False ):
+        """
+        Initializes the backend.
+
+        @param outcome       The balloon event that ends every balloon
+                             (defaults to NIN_BALLOONTIMEOUT)
+        @param latency       Seconds each balloon is displayed before its
+                             outcome
+        @param api_latency   Seconds taken by calls, keyed by API name
+        @param clock         Time source for balloon latency (seconds)
+        @param failures      Number of upcoming Shell_NotifyIcon calls that
+                             fail
+        @param keep_balloons Set to keep the balloons displayed in
+                             `balloons`
+        """
+        self.outcome      = NIN_BALLOONTIMEOUT if outcome is None else outcome
+        self.latency      = latency
+        self.api_latency  = {} if api_latency is None else api_latency
+        self.clock        = clock
+        self.failures     = failures
+        self.error        = 0
+        self.calls        = collections.Counter()
+        self.classes      = {}
+        self.windows      = {}
+        self.items        = {}
+        self.icons        = set()
+        self.balloons     = [] if keep_balloons == True else None
+        self._messages    = collections.deque()
+        self._condition   = threading.Condition()
+        self._next_handle = 0x1000
+        self._balloons    = {}
+        self._timers      = []
+        self._sequence    = 0
+        self._registered  = {}
+        self._intervals   = {}
+
+
+    #=========================================================================
+    def _handle( self ):
+        """
+        Allocates a new fake handle.
+        """
+        self._next_handle += 4
+        return self._next_handle
+
+
+    #=========================================================================
+    def _call( self, api ):
+        """
+        Counts a call (and takes the call's injected latency).
+
+        @param api The API name
+        """
+        self.calls[ api ] += 1
+        if api in self.api_latency:
+            time.sleep( self.api_latency[ api ] )
+
+
+    #=========================================================================
+    def _post_balloon( self, key, callback ):
+        """
+        Displays a balloon (queueing its events).
+
+        @param key      The tray item's `( hwnd, uID )`
+        @param callback The tray item's callback message
+        """
+        hwnd, uid = key
+
+        # A balloon that is still displayed is replaced (and hidden).
+        self._hide_balloon( key, callback )
+        self.post_message( hwnd, callback, uid, NIN_BALLOONSHOW )
+        if self.latency <= 0:
+            self.post_message( hwnd, callback, uid, self.outcome )
+            return
+
+        # Queue the outcome once the balloon has been displayed long enough.
+        with self._condition:
+            self._sequence += 1
+            timer = [
+                self.clock() + self.latency,
+                self._sequence,
+                ( hwnd, callback, uid, self.outcome ),
+                key,
+                None
+            ]
+            heapq.heappush( self._timers, timer )
+            self._balloons[ key ] = timer
+            self._condition.notify()
+
+
+    #=========================================================================
+    def _hide_balloon( self, key, callback ):
+        """
+        Hides a tray item's displayed balloon (if any).
+
+        @param key      The tray item's `( hwnd, uID )`
+        @param callback The tray item's callback message
+        """
+        with self._condition:
+            timer = self._balloons.pop( key, None )
+            if timer is None:
+                return
+            timer[ 3 ] = None
+        self.post_message( key[ 0 ], callback, key[ 1 ], NIN_BALLOONHIDE )
+
+
+    #=========================================================================
+    def post_message( self, hwnd, uMsg, wParam = 0, lParam = 0 ):
+        """
+        Queues a message for a window.
+
+        @param hwnd   Destination window handle
+        @param uMsg   Message ID
+        @param wParam Message argument 1
+        @param lParam Message argument 2
+        @return       True (the message is always queued)
+        """
+        with self._condition:
+            self._messages.append( ( hwnd, uMsg, wParam, lParam ) )
+            self._condition.notify()
+        return True
+
+
+    #=========================================================================
+    def module_handle( self ):
+        """
+        Stand-in for `Win32Backend.module_handle()`.
+        """
+        self._call( 'GetModuleHandle' )
+        return 0x400000
+
+
+    #=========================================================================
+    def register_class( self, class_name, procedure ):
+        """
+        Stand-in for `Win32Backend.register_class()`.
+        """
+        self._call( 'RegisterClassEx' )
+        if class_name in self.classes:
+            return 0
+        self.classes[ class_name ] = procedure
+        return self._handle()
+
+
+    #=========================================================================
+    def unregister_class( self, class_name ):
+        """
+        Stand-in for `Win32Backend.unregister_class()`.
+        """
+        self._call( 'UnregisterClass' )
+        return self.classes.pop( class_name, None ) is not None
+
+
+    #=========================================================================
+    def create_window( self, class_name, window_name ):
+        """
+        Stand-in for `Win32Backend.create_window()`.
+        """
+        self._call( 'CreateWindowEx' )
+        if class_name not in self.classes:
+            return None
+        hwnd = self._handle()
+        self.windows[ hwnd ] = class_name
+        return hwnd
+
+
+    #=========================================================================
+    def destroy_window( self, hwnd ):
+        """
+        Stand-in for `Win32Backend.destroy_window()`.
+        """
+        self._call( 'DestroyWindow' )
+        if hwnd not in self.windows:
+            return False
+        self.classes[ self.windows[ hwnd ] ]( hwnd, WM_DESTROY, 0, 0 )
+        del self.windows[ hwnd ]
+        return True
+
+
+    #=========================================================================
+    def load_icon( self, path, size = 0,
+        flags = LR_LOADFROMFILE | LR_DEFAULTSIZE ):
+        """
+        Stand-in for `Win32Backend.load_icon()`.
+        """
+        self._call( 'LoadImage' )
+        icon_handle = self._handle()
+        self.icons.add( icon_handle )
+        return icon_handle
+
+
+    #=========================================================================
+    def load_stock_icon( self, identifier = IDI_INFORMATION ):
+        """
+        Stand-in for `Win32Backend.load_stock_icon()`.
+        """
+        self._call( 'LoadIcon' )
+        return identifier
+
+
+    #=========================================================================
+    def destroy_icon( self, icon_handle ):
+        """
+        Stand-in for `Win32Backend.destroy_icon()`.
+        """
+        self._call( 'DestroyIcon' )
+        if icon_handle not in self.icons:
+            return False
+        self.icons.remove( icon_handle )
+        return True
+
+
+    #=========================================================================
+    def shell_notify_icon( self, message, notify_data ):
+        """
+        Stand-in for `Win32Backend.shell_notify_icon()`.
+        """
+        self._call( 'Shell_NotifyIcon' )
+        key        = ( notify_data.hWnd, notify_data.uID )
+        self.error = 0
+
+        # Fail while the (simulated) shell is busy.
+        if self.failures > 0:
+            self.failures -= 1
+            self.error     = ERROR_TIMEOUT
+            return False
+
+        # Add a new tray item (remembering its callback message).
+        if message == NIM_ADD:
+            if ( key in self.items ) or ( key[ 0 ] not in self.windows ):
+                return False
+            self.items[ key ] = notify_data.uCallbackMessage
+            return True
+
+        # Modify a tray item (possibly displaying a balloon).
+        if message == NIM_MODIFY:
+            if key not in self.items:
+                return False
+            if notify_data.uFlags & NIF_INFO:
+                # (WCHAR arrays read as strings or integers by platform)
+                if notify_data.szInfo[ 0 ] in ( 0, '\0' ):
+                    self._hide_balloon( key, self.items[ key ] )
+                else:
+                    if self.balloons is not None:
+                        self.balloons.append( (
+                            notify_data.get_text( 'szInfo' ),
+                            notify_data.get_text( 'szInfoTitle' ),
+                            notify_data.dwInfoFlags
+                        ) )
+                    self._post_balloon( key, self.items[ key ] )
+            return True
+
+        # Remove a tray item (hiding its balloon).
+        if message == NIM_DELETE:
+            if key not in self.items:
+                return False
+            self._hide_balloon( key, self.items.pop( key ) )
+            return True
+
+        return False
+
+
+    #=========================================================================
+    def get_message( self, message, hwnd ):
+        """
+        Stand-in for `Win32Backend.get_message()`.
+        """
+        self._call( 'GetMessage' )
+        with self._condition:
+            while True:
+
+                # Queue the balloon outcomes that are due.
+                timers = self._timers
+                now    = self.clock() if len( timers ) > 0 else 0
+                while ( len( timers ) > 0 ) and ( timers[ 0 ][ 0 ] <= now ):
+                    timer = heapq.heappop( timers )
+                    if timer[ 3 ] is None:
+                        continue
+                    self._messages.append( timer[ 2 ] )
+                    if timer[ 4 ] is None:
+                        del self._balloons[ timer[ 3 ] ]
+                    else:
+                        timer[ 0 ] = now + timer[ 4 ]
+                        heapq.heappush( timers, timer )
+                if len( self._messages ) > 0:
+                    break
+
+                # Wait for a message (or the next outcome).
+                if len( timers ) > 0:
+                    self._condition.wait( timers[ 0 ][ 0 ] - now )
+                else:
+                    self._condition.wait()
+            (
+                message.hWnd,
+                message.message,
+                message.wParam,
+                message.lParam
+            ) = self._messages.popleft()
+        return 0 if message.message == self.WM_QUIT else 1
+
+
+    #=========================================================================
+    def dispatch_message( self, message ):
+        """
+        Stand-in for `Win32Backend.dispatch_message()`.
+        """
+        self._call( 'DispatchMessage' )
+        class_name = self.windows.get( message.hWnd )
+        if class_name is not None:
+            self.classes[ class_name ](
+                message.hWnd,
+                message.message,
+                message.wParam,
+                message.lParam
+            )
+
+
+    #=========================================================================
+    def set_timer( self, hwnd, timer_id, milliseconds ):
+        """
+        Stand-in for `Win32Backend.set_timer()`.
+        """
+        self._call( 'SetTimer' )
+        with self._condition:
+            timer = self._intervals.get( ( hwnd, timer_id ) )
+            if timer is not None:
+                timer[ 3 ] = None
+            self._sequence += 1
+            interval = milliseconds / 1000.0
+            timer    = [
+                self.clock() + interval,
+                self._sequence,
+                ( hwnd, WM_TIMER, timer_id, 0 ),
+                ( hwnd, timer_id ),
+                interval
+            ]
+            heapq.heappush( self._timers, timer )
+            self._intervals[ hwnd, timer_id ] = timer
+            self._condition.notify()
+        return True
+
+
+    #=========================================================================
+    def kill_timer( self, hwnd, timer_id ):
+        """
+        Stand-in for `Win32Backend.kill_timer()`.
+        """
+        self._call( 'KillTimer' )
+        with self._condition:
+            timer = self._intervals.pop( ( hwnd, timer_id ), None )
+            if timer is None:
+                return False
+            timer[ 3 ] = None
+        return True
+
+
+    #=========================================================================
+    def register_message( self, name ):
+        """
+        Stand-in for `Win32Backend.register_message()`.
+        """
+        self._call( 'RegisterWindowMessage' )
+        return self._registered.setdefault(
+            name,
+            0xC000 + len( self._registered )
+        )
+
+
+    #=========================================================================
+    def last_error( self ):
+        """
+        Stand-in for `Win32Backend.last_error()`.
+        """
+        return self.error
+
+
+    #=========================================================================
+    def restart_taskbar( self ):
+        """
+        Simulates the shell restarting.
+
+        Every tray item (and displayed balloon) is lost without any events,
+        then the "TaskbarCreated" message (if registered) is broadcast to
+        every window.
+        """
+        with self._condition:
+            for timer in self._balloons.values():
+                timer[ 3 ] = None
+            self._balloons.clear()
+            self.items.clear()
+        message = self._registered.get( 'TaskbarCreated' )
+        if message is not None:
+            for hwnd in list( self.windows ):
+                self.post_message( hwnd, message )
+
+
+#=============================================================================
+def default_backend():
+    """
+    Provides the backend used when one is not specified.
+
+    The BUGME_BACKEND environment variable selects the in-memory backend
+    when set to "memory" (e.g. to run the command-line interface on
+    platforms without the Win32 API).
+
+    @return A backend instance (instrumented when metrics are enabled)
+    """
+    if os.environ.get( 'BUGME_BACKEND' ) == 'memory':
+        return instrument( MemoryBackend() )
+    return instrument( Win32Backend() )
+
+
+#-----------------------------------------------------------------------------
+# Instrumentation
+#-----------------------------------------------------------------------------
+
+# Shell_NotifyIcon messages mapped to instrumented phases
+_NOTIFY_PHASES = {
+    NIM_ADD    : 'nim_add',
+    NIM_MODIFY : 'nim_modify',
+    NIM_DELETE : 'nim_delete'
+}
+
+
+#=============================================================================
+class Histogram( object ):
+    """
+    Latency histogram with power-of-two nanosecond buckets.
+
+    Bucket `k` counts durations of less than 2**k nanoseconds (and at least
+    2**(k-1)), so recording a duration costs one `int.bit_length()`.
+    """
+    __slots__ = ( 'buckets', 'count', 'total', 'minimum', 'maximum' )
+
+
+    #=========================================================================
+    def __init__( self ):
+        self.buckets = [ 0 ] * 65
+        self.count   = 0
+        self.total   = 0
+        self.minimum = None
+        self.maximum = 0
+
+
+    #=========================================================================
+    def record( self, duration ):
+        """
+        Records a duration.
+
+        @param duration The duration in nanoseconds
+        """
+        self.buckets[ duration.bit_length() ] += 1
+        self.count += 1
+        self.total += duration
+        if ( self.minimum is None ) or ( duration < self.minimum ):
+            self.minimum = duration
+        if duration > self.maximum:
+            self.maximum = duration
+
+
+    #=========================================================================
+    def quantile( self, fraction ):
+        """
+        Estimates a quantile (as the upper bound of its bucket).
+
+        @param fraction The quantile (0 to 1)
+        @return         The estimated duration in nanoseconds
+        """
+        if self.count == 0:
+            return 0
+        rank       = fraction * self.count
+        cumulative = 0
+        for index, count in enumerate( self.buckets ):
+            cumulative += count
+            if ( cumulative >= rank ) and ( count > 0 ):
+                return min( 1 << index, self.maximum )
+        return self.maximum
+
+
+#=============================================================================
+class Metrics( object ):
+    """
+    Per-phase latency histograms and per-API error counters.
+
+    Metrics are collected by backends wrapped in an InstrumentedBackend, and
+    by tray items (the time until a balloon is dismissed).  While metrics
+    are disabled, nothing is wrapped or timed.
+    """
+
+
+    #=========================================================================
+    def __init__( self ):
+        self.enabled    = False
+        self.histograms = collections.defaultdict( Histogram )
+        self.errors     = collections.Counter()
+
+
+    #=========================================================================
+    def observe( self, phase, start ):
+        """
+        Records the time since the start of a phase.
+
+        @param phase The phase name
+        @param start The phase's start time (from `time.perf_counter_ns()`)
+        """
+        self.histograms[ phase ].record( time.perf_counter_ns() - start )
+
+
+    #=========================================================================
+    def reset( self ):
+        """
+        Clears the collected metrics.
+        """
+        self.histograms.clear()
+        self.errors.clear()
+
+
+    #=========================================================================
+    def stats( self ):
+        """
+        Takes a snapshot of the collected metrics.
+
+        @return A dictionary with "phases" (per-phase count and latencies in
+                milliseconds) and "errors" (error counts by API)
+        """
+        phases = {}
+        for phase, histogram in self.histograms.items():
+            phases[ phase ] = {
+                'count' : histogram.count,
+                'mean'  : histogram.total / histogram.count / 1e6,
+                'min'   : histogram.minimum / 1e6,
+                'p50'   : histogram.quantile( 0.50 ) / 1e6,
+                'p90'   : histogram.quantile( 0.90 ) / 1e6,
+                'p99'   : histogram.quantile( 0.99 ) / 1e6,
+                'max'   : histogram.maximum / 1e6
+            }
+        return { 'phases' : phases, 'errors' : dict( self.errors ) }
+
+
+    #=========================================================================
+    def format( self ):
+        """
+        Formats the collected metrics as a table.
+
+        @return The table (as a string)
+        """
+        lines = [ '{:<16} {:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+            'phase', 'count', 'mean ms', 'p50 ms', 'p99 ms', 'max ms'
+        ) ]
+        for phase, values in sorted( self.stats()[ 'phases' ].items() ):
+            lines.append(
+                '{:<16} {:>8} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                    phase,
+                    values[ 'count' ],
+                    values[ 'mean' ],
+                    values[ 'p50' ],
+                    values[ 'p99' ],
+                    values[ 'max' ]
+                )
+            )
+        for api, count in sorted( self.errors.items() ):
+            lines.append( 'errors {:<16} {:>8}'.format( api, count ) )
+        return '\n'.join( lines )
+
+
+    #=========================================================================
+    def prometheus( self ):
+        """
+        Formats the collected metrics in the Prometheus text format.
+
+        @return The metrics text
+        """
+        name  = 'bugme_phase_duration_seconds'
+        lines = [
+            '# HELP {} Duration of notification phases.'.format( name ),
+            '# TYPE {} histogram'.format( name )
+        ]
+        for phase, histogram in sorted( self.histograms.items() ):
+            label      = 'phase="{}"'.format( phase )
+            cumulative = 0
+            for index, count in enumerate( histogram.buckets ):
+                cumulative += count
+                if count > 0:
+                    lines.append( '{}_bucket{{{},le="{:.9g}"}} {}'.format(
+                        name, label, ( 1 << index ) / 1e9, cumulative
+                    ) )
+            lines.append( '{}_bucket{{{},le="+Inf"}} {}'.format(
+                name, label, histogram.count
+            ) )
+            lines.append( '{}_sum{{{}}} {:.9f}'.format(
+                name, label, histogram.total / 1e9
+            ) )
+            lines.append( '{}_count{{{}}} {}'.format(
+                name, label, histogram.count
+            ) )
+        name = 'bugme_api_errors_total'
+        lines.append( '# HELP {} Failed Win32 API calls.'.format( name ) )
+        lines.append( '# TYPE {} counter'.format( name ) )
+        for api, count in sorted( self.errors.items() ):
+            lines.append( '{}{{api="{}"}} {}'.format( name, api, count ) )
+        return '\n'.join( lines ) + '\n'
+
+
+    #=========================================================================
+    def write_prometheus( self, path ):
+        """
+        Writes the Prometheus text dump to a file (replacing it atomically).
+
+        @param path The path of the file
+        """
+        temporary = path + '.tmp'
+        with open( temporary, 'w' ) as handle:
+            handle.write( self.prometheus() )
+        os.replace( temporary, path )
+
+
+# Metrics collected by instrumented backends
+metrics = Metrics()
+
+
+#=============================================================================
+def stats():
+    """
+    Takes a snapshot of the collected metrics.
+
+    @return See `Metrics.stats()`
+    """
+    return metrics.stats()
+
+
+#=============================================================================
+class InstrumentedBackend( object ):
+    """
+    Backend wrapper that times each phase, and counts failures by API.
+
+    Methods that are not instrumented are passed through to the wrapped
+    backend.
+    """
+
+
+    #=========================================================================
+    def __init__( self, backend, metrics = metrics ):
+        """
+        Initializes an instrumented backend.
+
+        @param backend The backend to wrap
+        @param metrics The Metrics that collect the measurements
+        """
+        self.backend = backend
+        self.metrics = metrics
+
+
+    #=========================================================================
+    def __getattr__( self, name ):
+        return getattr( self.backend, name )
+
+
+    #=========================================================================
+    def _measure( self, phase, api, function, *args ):
+        """
+        Calls a backend method, and records its duration and failure.
+
+        @param phase    The phase name
+        @param api      The API name for error counts
+        @param function The backend method
+        @param args     The method's arguments
+        @return         The method's result
+        """
+        start  = time.perf_counter_ns()
+        result = function( *args )
+        self.metrics.observe( phase, start )
+        if bool( result ) == False:
+            self.metrics.errors[ api ] += 1
+        return result
+
+
+    #=========================================================================
+    def register_class( self, class_name, procedure ):
+        return self._measure( 'register_class', 'RegisterClassEx',
+            self.backend.register_class, class_name, procedure )
+
+
+    #=========================================================================
+    def create_window( self, class_name, window_name ):
+        return self._measure( 'create_window', 'CreateWindowEx',
+            self.backend.create_window, class_name, window_name )
+
+
+    #=========================================================================
+    def load_icon( self, path, size = 0,
+        flags = LR_LOADFROMFILE | LR_DEFAULTSIZE ):
+        return self._measure( 'load_image', 'LoadImage',
+            self.backend.load_icon, path, size, flags )
+
+
+    #=========================================================================
+    def shell_notify_icon( self, message, notify_data ):
+        return self._measure(
+            _NOTIFY_PHASES.get( message, 'shell_notify_icon' ),
+            'Shell_NotifyIcon',
+            self.backend.shell_notify_icon,
+            message,
+            notify_data
+        )
+
+
+#=============================================================================
+def instrument( backend ):
+    """
+    Wraps a backend for instrumentation when metrics are enabled.
+
+    @param backend The backend
+    @return        The backend (or an InstrumentedBackend wrapping it)
+    """
+    if metrics.enabled == True:
+        return InstrumentedBackend( backend )
+    return backend
+
+
+#-----------------------------------------------------------------------------
+# Icons
+#-----------------------------------------------------------------------------
+
+# ICO file header and directory entry layouts
+_ICONDIR      = struct.Struct( '<HHH' )
+_ICONDIRENTRY = struct.Struct( '<BBBBHHII' )
+
+# Icon directory entry (one per image in an ICO file)
+IconEntry = collections.namedtuple(
+    'IconEntry',
+    ( 'width', 'height', 'colors', 'planes', 'bit_count', 'size', 'offset' )
+)
+
+
+#=============================================================================
+def read_ico_directory( path ):
+    """
+    Reads the image directory of an ICO file.
+
+    The file is memory-mapped, so only the header and directory pages are
+    actually read (not the image data).
+
+    @param path The path to the ICO file
+    @return     A list of IconEntry tuples
+    """
+    with open( path, 'rb' ) as handle:
+        access = mmap.ACCESS_READ
+        with mmap.mmap( handle.fileno(), 0, access = access ) as data:
+
+            # Check the file header.
+            if len( data ) < _ICONDIR.size:
+                raise ValueError( 'Truncated icon file: {}'.format( path ) )
+            reserved, kind, count = _ICONDIR.unpack_from( data, 0 )
+            end = _ICONDIR.size + ( count * _ICONDIRENTRY.size )
+            if ( reserved != 0 ) or ( kind != 1 ) or ( end > len( data ) ):
+                raise ValueError( 'Invalid icon file: {}'.format( path ) )
+
+            # Read each directory entry (dimensions of 0 mean 256).
+            entries = []
+            for offset in range( _ICONDIR.size, end, _ICONDIRENTRY.size ):
+                width, height, colors, _, planes, bit_count, size, image = \
+                    _ICONDIRENTRY.unpack_from( data, offset )
+                entries.append( IconEntry(
+                    width or 256,
+                    height or 256,
+                    colors,
+                    planes,
+                    bit_count,
+                    size,
+                    image
+                ) )
+            return entries
+
+
+#=============================================================================
+def best_icon_size( path, size ):
+    """
+    Picks the image in an ICO file that best fits a desired size.
+
+    The smallest image at least as large as the desired size is preferred
+    (with the most colors among equal sizes); otherwise the largest image is
+    used.
+
+    @param path The path to the ICO file
+    @param size The desired width and height
+    @return     The width of the best-fitting image
+    """
+    entries = read_ico_directory( path )
+    if len( entries ) == 0:
+        raise ValueError( 'Empty icon file: {}'.format( path ) )
+    fits = [ entry for entry in entries if entry.width >= size ]
+    if len( fits ) > 0:
+        best = min( fits, key = lambda e: ( e.width, -e.bit_count ) )
+    else:
+        best = max( entries, key = lambda e: ( e.width, e.bit_count ) )
+    return best.width
+
+
+#=============================================================================
+class IconCache( object ):
+    """
+    Bounded LRU cache of loaded icon handles.
+
+    Icons are keyed by `( path, size, flags )`.  When the cache is full, the
+    least recently used icon is destroyed.  (The shell keeps its own copy of
+    icons given to Shell_NotifyIcon(), so icons may be destroyed while still
+    shown in the tray.)  If an icon can not be loaded, the shared stock
+    information icon is used instead (and is never destroyed).
+
+    Icons may also be registered by name (e.g. one per severity):
+
+        icons.register( 'error', 'icons/error.ico' )
+        notifier.notify( 'Build failed.', icon = 'error' )
+    """
+
+
+    #=========================================================================
+    def __init__( self, backend = None, capacity = 8 ):
+        """
+        Initializes an empty cache.
+
+        @param backend  The backend that loads and destroys icons
+        @param capacity The maximum number of icons kept loaded
+        """
+        self.backend   = default_backend() if backend is None else backend
+        self.capacity  = capacity
+        self.hits      = 0
+        self.loads     = 0
+        self.evictions = 0
+        self._entries  = collections.OrderedDict()
+        self._lock     = threading.Lock()
+        self._names    = {}
+
+
+    #=========================================================================
+    def __len__( self ):
+        """
+        Reports the number of icons currently loaded.
+        """
+        return len( self._entries )
+
+
+    #=========================================================================
+    def get( self, path, size = 0, flags = LR_LOADFROMFILE | LR_DEFAULTSIZE ):
+        """
+        Retrieves an icon, loading it if it is not already cached.
+
+        When a size is given for an ICO file, the best-fitting image in the
+        file is loaded.
+
+        @param path  The path to the icon file
+        @param size  The desired width and height (0 for the default)
+        @param flags The LR_* flags for loading the icon
+        @return      The icon handle
+        """
+        key = ( path, size, flags )
+        with self._lock:
+
+            # Check the cache.
+            entry = self._entries.get( key )
+            if entry is not None:
+                self._entries.move_to_end( key )
+                self.hits += 1
+                return entry[ 0 ]
+
+            # Load the icon (or the stock icon).
+            self.loads += 1
+            load_size = size
+            if ( size > 0 ) and path.lower().endswith( '.ico' ):
+                try:
+                    load_size = best_icon_size( path, size )
+                    flags    &= ~LR_DEFAULTSIZE
+                except ( OSError, ValueError ):
+                    pass
+            icon_handle = self.backend.load_icon( path, load_size, flags )
+            shared      = bool( icon_handle ) == False
+            if shared == True:
+                logging.warning( 'Unable to load icon: {}'.format( path ) )
+                icon_handle = self.backend.load_stock_icon()
+            self._entries[ key ] = ( icon_handle, shared )
+
+            # Destroy the least recently used icons.
+            while len( self._entries ) > self.capacity:
+                _, evicted = self._entries.popitem( last = False )
+                self._destroy( evicted )
+                self.evictions += 1
+
+        return icon_handle
+
+
+    #=========================================================================
+    def register( self, name, path, size = 0 ):
+        """
+        Registers a named icon (loaded the first time it is used).
+
+        @param name The name of the icon (e.g. a severity)
+        @param path The path to the icon file
+        @param size The desired width and height (0 for the default)
+        """
+        self._names[ name ] = ( path, size )
+
+
+    #=========================================================================
+    def named( self, name ):
+        """
+        Retrieves a registered icon.
+
+        @param name The name of the icon
+        @return     The icon handle
+        """
+        path, size = self._names[ name ]
+        return self.get( path, size )
+
+
+    #=========================================================================
+    def clear( self ):
+        """
+        Destroys every cached icon.
+        """
+        with self._lock:
+            while len( self._entries ) > 0:
+                self._destroy( self._entries.popitem()[ 1 ] )
+
+
+    #=========================================================================
+    def _destroy( self, entry ):
+        """
+        Destroys a cached icon (unless it is shared).
+
+        @param entry The cache entry of the icon
+        """
+        icon_handle, shared = entry
+        if shared == False:
+            self.backend.destroy_icon( icon_handle )
+
+
+#-----------------------------------------------------------------------------
+# Message Templates
+#-----------------------------------------------------------------------------
+
+#=============================================================================
+class Payload( object ):
+    """
+    A rendered balloon, with its text already encoded for NOTIFYICONDATAW.
+
+    Payloads may be displayed in place of a message (e.g. with
+    `Notifier.show()` or `Pump.submit()`); the payload's title and flags
+    are then used.
+    """
+
+    __slots__ = ( 'message', 'title', 'flags', 'info', 'info_title' )
+
+
+    #=========================================================================
+    def __init__( self, message, title = 'Bugme!', flags = NIIF_USER ):
+        """
+        Renders a payload.
+
+        @param message The message contents to display
+        @param title   The title of the message to display
+        @param flags   The NIIF_* flags for the balloon
+        """
+        self.message    = message
+        self.title      = title
+        self.flags      = flags
+        self.info       = encode_wide( message, NOTIFYICONDATAW.INFO_SIZE )
+        self.info_title = encode_wide( title, NOTIFYICONDATAW.TITLE_SIZE )
+
+
+#=============================================================================
+class Template( object ):
+    """
+    A message template compiled for repeated rendering.
+
+    Templates use `str.format()` replacement fields, which must be named
+    (e.g. "Build {job} failed on {host}").  The fields of the title and
+    message are found once, when the template is compiled; arguments are
+    then given positionally (in the order the fields first appear) or by
+    name.
+    """
+
+
+    #=========================================================================
+    def __init__( self, message, title = 'Bugme!', flags = NIIF_USER ):
+        """
+        Compiles a template.
+
+        @param message The message template
+        @param title   The title template
+        @param flags   The NIIF_* flags for balloons from the template
+        """
+        self.message = message
+        self.title   = title
+        self.flags   = flags
+
+        # Find the fields (in order, without duplicates).
+        fields = []
+        for text in ( message, title ):
+            for _, name, _, _ in string.Formatter().parse( text ):
+                if name is None:
+                    continue
+                if ( name == '' ) or name.isdigit():
+                    raise ValueError(
+                        'Template fields must be named: {!r}'.format( text )
+                    )
+                if name not in fields:
+                    fields.append( name )
+        self.fields = tuple( fields )
+
+        # Bind the formatting functions.
+        self._message = message.format_map
+        self._title   = title.format_map
+
+
+    #=========================================================================
+    def arguments( self, args, fields ):
+        """
+        Orders a template's arguments.
+
+        @param args   Positional arguments (in field order)
+        @param fields Named arguments
+        @return       A tuple of arguments in field order
+        """
+        if len( fields ) == 0:
+            if len( args ) != len( self.fields ):
+                raise TypeError( 'Expected {} template arguments, got {}.'
+                    .format( len( self.fields ), len( args ) ) )
+            return args
+        fields = dict( zip( self.fields, args ), **fields )
+        return tuple( fields[ name ] for name in self.fields )
+
+
+    #=========================================================================
+    def render( self, *args, **fields ):
+        """
+        Renders (and encodes) a balloon from the template.
+
+        @param args   Positional arguments (in field order)
+        @param fields Named arguments
+        @return       The rendered Payload
+        """
+        values = dict( zip( self.fields, self.arguments( args, fields ) ) )
+        return Payload(
+            self._message( values ),
+            self._title( values ),
+            self.flags
+        )
+
+
+#=============================================================================
+class TemplateRegistry( object ):
+    """
+    Named templates with a bounded LRU cache of rendered payloads.
+
+    Payloads are keyed by the template's name and argument tuple, so a
+    repeated alert skips formatting and encoding entirely:
+
+        templates.register( 'failed', 'Build {job} failed on {host}',
+            'Build Failed', NIIF_ERROR )
+        notifier.show( templates.render( 'failed', 1234, 'build-07' ) )
+
+    Arguments that can not be hashed are rendered without the cache.
+    """
+
+
+    #=========================================================================
+    def __init__( self, capacity = 4096 ):
+        """
+        Initializes an empty registry.
+
+        @param capacity The maximum number of payloads kept
+        """
+        self.capacity  = capacity
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+        self._entries  = collections.OrderedDict()
+        self._lock     = threading.Lock()
+        self._names    = {}
+
+
+    #=========================================================================
+    def __len__( self ):
+        """
+        Reports the number of payloads currently cached.
+        """
+        return len( self._entries )
+
+
+    #=========================================================================
+    def register( self, name, message, title = 'Bugme!', flags = NIIF_USER ):
+        """
+        Compiles and registers a template.
+
+        Payloads rendered from a template that is being replaced are
+        dropped from the cache.
+
+        @param name    The name of the template
+        @param message The message template
+        @param title   The title template
+        @param flags   The NIIF_* flags for balloons from the template
+        @return        The compiled Template
+        """
+        template = Template( message, title, flags )
+        with self._lock:
+            if name in self._names:
+                stale = [ key for key in self._entries if key[ 0 ] == name ]
+                for key in stale:
+                    del self._entries[ key ]
+            self._names[ name ] = template
+        return template
+
+
+    #=========================================================================
+    def render( self, name, *args, **fields ):
+        """
+        Retrieves a rendered payload, rendering it if it is not cached.
+
+        @param name   The name of a registered template
+        @param args   Positional arguments (in field order)
+        @param fields Named arguments
+        @return       The rendered Payload
+        """
+        template = self._names[ name ]
+        if len( fields ) > 0:
+            args = template.arguments( args, fields )
+        key = ( name, args )
+
+        # Check the cache.  (Lookups are single, atomic dictionary
+        # operations, so hits do not take the lock; the hit count may be
+        # slightly low under contention.)
+        entries = self._entries
+        try:
+            payload = entries.get( key )
+        except TypeError:
+            return template.render( *args )
+        if payload is not None:
+            try:
+                entries.move_to_end( key )
+            except KeyError:
+                pass
+            self.hits += 1
+            return payload
+
+        # Render outside of the lock, then cache the payload.
+        payload = template.render( *args )
+        with self._lock:
+            self.misses += 1
+            self._entries[ key ] = payload
+            while len( self._entries ) > self.capacity:
+                self._entries.popitem( last = False )
+                self.evictions += 1
+        return payload
+
+
+    #=========================================================================
+    def stats( self ):
+        """
+        Reports the cache's hit rate.
+
+        @return A dictionary of counters, and the hit rate (0.0 to 1.0)
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'templates' : len( self._names ),
+                'payloads'  : len( self._entries ),
+                'hits'      : self.hits,
+                'misses'    : self.misses,
+                'evictions' : self.evictions,
+                'hit_rate'  : self.hits / lookups if lookups > 0 else 0.0
+            }
+
+
+# Templates shared by all notifiers
+templates = TemplateRegistry()
+
+
+#-----------------------------------------------------------------------------
+# Notification History
+#-----------------------------------------------------------------------------
+
+# History file header: magic, capacity, entry count, and title count (the
+# columns follow, then the UTF-8 size of each title, then the titles, so a
+# title may contain any character)
+_HISTORY_HEADER = struct.Struct( '<8sIII' )
+_HISTORY_MAGIC  = b'BUGMEHS2'
+
+# Outcomes stored in the history (a balloon that is still displayed has no
+# outcome)
+_HISTORY_OUTCOMES = (
+    None,
+    OUTCOME_CLICKED,
+    OUTCOME_TIMEOUT,
+    OUTCOME_HIDDEN,
+    OUTCOME_EXPIRED
+)
+_HISTORY_CODES = {
+    outcome : code for code, outcome in enumerate( _HISTORY_OUTCOMES )
+}
+
+# Translation tables marking clicked balloons, and the balloons that were
+# not clicked, with 1s (and everything else with 0s)
+_CLICKED_MASK = bytes(
+    int( code == _HISTORY_CODES[ OUTCOME_CLICKED ] ) for code in range( 256 )
+)
+_UNCLICKED_MASK = bytes( 1 - bit for bit in _CLICKED_MASK )
+
+
+#=============================================================================
+class HistoryRecord( object ):
+    """
+    One balloon from the notification history.
+    """
+
+    __slots__ = ( 'sequence', 'time', 'severity', 'outcome', 'title' )
+
+
+    #=========================================================================
+    def __init__( self, sequence, time, severity, outcome, title ):
+        """
+        Initializes a record.
+
+        @param sequence The balloon's sequence number in the history
+        @param time     When the balloon was displayed (seconds since the
+                        epoch)
+        @param severity The balloon's NIIF_* icon
+        @param outcome  How the balloon went away (OUTCOME_*, or None)
+        @param title    The balloon's title
+        """
+        self.sequence = sequence
+        self.time     = time
+        self.severity = severity
+        self.outcome  = outcome
+        self.title    = title
+
+
+    #=========================================================================
+    def __repr__( self ):
+        return 'HistoryRecord({!r}, {!r}, {!r}, {!r}, {!r})'.format(
+            self.sequence,
+            self.time,
+            self.severity,
+            self.outcome,
+            self.title
+        )
+
+
+#=============================================================================
+class History( object ):
+    """
+    Bounded ring of displayed balloons and their outcomes.
+
+    The history is stored in columns: display times, NIIF_* icons, outcomes,
+    and title IDs are kept in `array` buffers (14 bytes per balloon), and
+    each distinct title is stored once.  Once the ring is full, the oldest
+    balloon is overwritten by each new one, so memory stays flat however
+    many balloons are recorded.  (Titles that are no longer referenced are
+    dropped once the title table has grown to twice the ring's capacity.)
+
+    Balloons are expected to be recorded in time order; queries for recent
+    balloons find their range by bisection, then filter the columns without
+    visiting every record in Python.
+    """
+
+
+    #=========================================================================
+    def __init__( self, capacity = 65536 ):
+        """
+        Initializes an empty history.
+
+        @param capacity The number of balloons retained
+        """
+        self.capacity   = capacity
+        self.count      = 0
+        self.times      = array.array( 'd' )
+        self.severities = array.array( 'B' )
+        self.outcomes   = array.array( 'B' )
+        self.title_ids  = array.array( 'I' )
+        self.saved      = 0
+        self._titles    = []
+        self._title_ids = {}
+        self._lock      = threading.Lock()
+
+
+    #=========================================================================
+    def __len__( self ):
+        """
+        Reports the number of balloons retained.
+        """
+        return min( self.count, self.capacity )
+
+
+    #=========================================================================
+    def record( self, title, flags = NIIF_USER, outcome = None,
+        when = None ):
+        """
+        Records a displayed balloon.
+
+        @param title   The balloon's title
+        @param flags   The balloon's NIIF_* flags
+        @param outcome How the balloon went away (None while displayed)
+        @param when    When the balloon was displayed (defaults to now)
+        @return        The balloon's sequence number (for `complete()`)
+        """
+        if when is None:
+            when = time.time()
+        severity = flags & NIIF_ICON_MASK
+        code     = _HISTORY_CODES[ outcome ]
+        with self._lock:
+            title_id = self._intern( title )
+            sequence = self.count
+            if sequence < self.capacity:
+                self.times.append( when )
+                self.severities.append( severity )
+                self.outcomes.append( code )
+                self.title_ids.append( title_id )
+            else:
+                index                    = sequence % self.capacity
+                self.times[ index ]      = when
+                self.severities[ index ] = severity
+                self.outcomes[ index ]   = code
+                self.title_ids[ index ]  = title_id
+            self.count = sequence + 1
+        return sequence
+
+
+    #=========================================================================
+    def complete( self, sequence, outcome ):
+        """
+        Records how a balloon went away.
+
+        @param sequence The balloon's sequence number
+        @param outcome  How the balloon went away (OUTCOME_*)
+        @return         True if the balloon was still retained
+        """
+        with self._lock:
+            if sequence < ( self.count - self.capacity ):
+                return False
+            index                  = sequence % self.capacity
+            self.outcomes[ index ] = _HISTORY_CODES[ outcome ]
+        return True
+
+
+    #=========================================================================
+    def _intern( self, title ):
+        """
+        Finds (or assigns) a title's ID.
+
+        @param title The title
+        @return      The title's ID
+        """
+        title_id = self._title_ids.get( title )
+        if title_id is None:
+            if len( self._titles ) >= ( 2 * self.capacity ):
+                self._compact_titles()
+            title_id                 = len( self._titles )
+            self._title_ids[ title ] = title_id
+            self._titles.append( title )
+        return title_id
+
+
+    #=========================================================================
+    def _compact_titles( self ):
+        """
+        Drops the titles that are no longer referenced, and renumbers the
+        rest.
+        """
+        live            = sorted( set( self.title_ids ) )
+        remap           = { old : new for new, old in enumerate( live ) }
+        self._titles    = [ self._titles[ old ] for old in live ]
+        self._title_ids = {
+            title : new for new, title in enumerate( self._titles )
+        }
+        self.title_ids  = array.array(
+            'I',
+            map( remap.__getitem__, self.title_ids )
+        )
+
+
+    #=========================================================================
+    def _segments( self, since = None ):
+        """
+        Finds the index ranges of the retained balloons, oldest first.
+
+        @param since Only include balloons displayed at or after this time
+        @return      A list of `( start, stop )` index ranges
+        """
+        if self.count <= self.capacity:
+            segments = [ ( 0, self.count ) ]
+        else:
+            split    = self.count % self.capacity
+            segments = [ ( split, self.capacity ), ( 0, split ) ]
+        if since is None:
+            return segments
+        return [
+            ( bisect.bisect_left( self.times, since, start, stop ), stop )
+            for start, stop in segments
+        ]
+
+
+    #=========================================================================
+    def _record( self, index ):
+        """
+        Builds the record of a retained balloon.
+
+        @param index The balloon's index in the columns
+        @return      The HistoryRecord
+        """
+        first = self.count - len( self )
+        return HistoryRecord(
+            first + ( ( index - first ) % self.capacity ),
+            self.times[ index ],
+            self.severities[ index ],
+            _HISTORY_OUTCOMES[ self.outcomes[ index ] ],
+            self._titles[ self.title_ids[ index ] ]
+        )
+
+
+    #=========================================================================
+    def records( self, since = None ):
+        """
+        Lists the retained balloons.
+
+        @param since Only include balloons displayed at or after this time
+        @return      A list of HistoryRecords, oldest first
+        """
+        with self._lock:
+            return [
+                self._record( index )
+                for start, stop in self._segments( since )
+                for index in range( start, stop )
+            ]
+
+
+    #=========================================================================
+    def unacknowledged( self, seconds = 3600.0, severity = NIIF_ERROR,
+        now = None ):
+        """
+        Finds recent balloons of a severity that were not clicked.
+
+        @param seconds  How far back to look
+        @param severity The NIIF_* icon of the balloons
+        @param now      The current time (defaults to now)
+        @return         A list of HistoryRecords, newest first
+        """
+        if now is None:
+            now = time.time()
+        severity_mask = bytes(
+            int( code == severity ) for code in range( 256 )
+        )
+        found         = []
+        with self._lock:
+            for start, stop in self._segments( now - seconds ):
+                if start == stop:
+                    continue
+
+                # Mark the balloons that match with 1s, and combine the
+                # marks of both columns as (arbitrarily large) integers.
+                size       = stop - start
+                severities = int.from_bytes(
+                    self.severities[ start : stop ].tobytes().translate(
+                        severity_mask ),
+                    'little'
+                )
+                unclicked  = int.from_bytes(
+                    self.outcomes[ start : stop ].tobytes().translate(
+                        _UNCLICKED_MASK ),
+                    'little'
+                )
+                mask       = ( severities & unclicked ).to_bytes(
+                    size, 'little' )
+                found.extend(
+                    self._record( index ) for index in itertools.compress(
+                        range( start, stop ), mask )
+                )
+        found.reverse()
+        return found
+
+
+    #=========================================================================
+    def click_through( self, seconds = None, now = None ):
+        """
+        Measures how often each title's balloons were clicked.
+
+        @param seconds How far back to look (None for every retained
+                       balloon)
+        @param now     The current time (defaults to now)
+        @return        A list of `( title, shown, clicked, rate )` tuples,
+                       most shown first
+        """
+        since = None
+        if seconds is not None:
+            since = ( time.time() if now is None else now ) - seconds
+        shown   = collections.Counter()
+        clicked = collections.Counter()
+        with self._lock:
+            for start, stop in self._segments( since ):
+                title_ids = self.title_ids[ start : stop ]
+                shown.update( title_ids )
+                clicked.update( itertools.compress(
+                    title_ids,
+                    self.outcomes[ start : stop ].tobytes().translate(
+                        _CLICKED_MASK )
+                ) )
+            titles = self._titles
+            return [
+                (
+                    titles[ title_id ],
+                    count,
+                    clicked[ title_id ],
+                    clicked[ title_id ] / count
+                )
+                for title_id, count in shown.most_common()
+            ]
+
+
+    #=========================================================================
+    def extend( self, other, start = 0 ):
+        """
+        Records the balloons retained by another history.
+
+        The balloons are merged with this history's by display time (so
+        queries can still bisect the columns), and the most recent
+        `capacity` balloons are kept.  This history's balloons are
+        renumbered.
+
+        @param other The other History
+        @param start Only record balloons from this sequence number on
+        @return      The sequence number after the last balloon recorded
+                     (or `start`, if none were)
+        """
+        added = [
+            record for record in other.records() if record.sequence >= start
+        ]
+        if len( added ) == 0:
+            return start
+        merged = list( heapq.merge(
+            self.records(),
+            added,
+            key = lambda record: record.time
+        ) )
+
+        # Rebuild the ring from the merged balloons.
+        with self._lock:
+            self.count      = 0
+            self.times      = array.array( 'd' )
+            self.severities = array.array( 'B' )
+            self.outcomes   = array.array( 'B' )
+            self.title_ids  = array.array( 'I' )
+            self._titles    = []
+            self._title_ids = {}
+        for record in merged[ -self.capacity : ]:
+            self.record(
+                record.title,
+                record.severity,
+                record.outcome,
+                record.time
+            )
+        return added[ -1 ].sequence + 1
+
+
+    #=========================================================================
+    def save( self, path ):
+        """
+        Writes the retained balloons to a file (replacing it atomically).
+
+        @param path The path to the history file
+        """
+        with self._lock:
+            columns = [ array.array( column.typecode ) for column in (
+                self.times, self.severities, self.outcomes, self.title_ids ) ]
+            for start, stop in self._segments():
+                for column, source in zip( columns, ( self.times,
+                    self.severities, self.outcomes, self.title_ids ) ):
+                    column.extend( source[ start : stop ] )
+            titles = [ title.encode( 'utf-8' ) for title in self._titles ]
+        sizes = array.array( 'I', map( len, titles ) )
+        if sys.byteorder != 'little':
+            for column in columns + [ sizes ]:
+                column.byteswap()
+        temporary = path + '.tmp'
+        with open( temporary, 'wb' ) as handle:
+            handle.write( _HISTORY_HEADER.pack(
+                _HISTORY_MAGIC,
+                self.capacity,
+                len( columns[ 0 ] ),
+                len( titles )
+            ) )
+            for column in columns + [ sizes ]:
+                column.tofile( handle )
+            handle.write( b''.join( titles ) )
+        os.replace( temporary, path )
+
+
+    #=========================================================================
+    @classmethod
+    def load( cls, path ):
+        """
+        Reads a history file.
+
+        @param path The path to the history file
+        @return     The History
+        """
+        with open( path, 'rb' ) as handle:
+            magic, capacity, count, titles = _HISTORY_HEADER.unpack(
+                handle.read( _HISTORY_HEADER.size ) )
+            if magic != _HISTORY_MAGIC:
+                raise ValueError( 'Not a history file: {}'.format( path ) )
+            history = cls( capacity )
+            sizes   = array.array( 'I' )
+            for column, length in ( ( history.times, count ),
+                ( history.severities, count ), ( history.outcomes, count ),
+                ( history.title_ids, count ), ( sizes, titles ) ):
+                column.fromfile( handle, length )
+                if sys.byteorder != 'little':
+                    column.byteswap()
+            data            = handle.read( sum( sizes ) )
+            offsets         = itertools.accumulate( sizes, initial = 0 )
+            history._titles = [
+                data[ offset : offset + size ].decode( 'utf-8' )
+                for offset, size in zip( offsets, sizes )
+            ]
+        history._title_ids = {
+            title : title_id for title_id, title in enumerate(
+                history._titles )
+        }
+        history.count = count
+        return history
+
+
+#=============================================================================
+def save_history( path, history = None ):
+    """
+    Adds a history's new balloons to a history file.
+
+    The file is locked while it is updated, so several processes may share
+    one history file.  Only the balloons recorded since the history was
+    last saved are added (its `saved` sequence number tracks them), so
+    saving again does not duplicate entries; a balloon's outcome is stored
+    as it was when the balloon was first saved.
+
+    @param path    The path to the history file
+    @param history The history to add (defaults to `notify_history`)
+    """
+    if history is None:
+        history = notify_history
+    lock = _FileLock( path + '.lock' )
+    try:
+        with lock:
+            try:
+                stored = History.load( path )
+            except FileNotFoundError:
+                stored = History( history.capacity )
+            saved = stored.extend( history, history.saved )
+            stored.save( path )
+            history.saved = saved
+    finally:
+        lock.close()
+
+
+#=============================================================================
+def format_history( history, seconds = 3600.0, now = None ):
+    """
+    Summarizes a notification history.
+
+    @param history The History to summarize
+    @param seconds How far back to look for unacknowledged errors
+    @param now     The current time (defaults to now)
+    @return        The summary (a multi-line string)
+    """
+    lines  = [ '{} notifications retained (capacity {})'.format(
+        len( history ), history.capacity ) ]
+    errors = history.unacknowledged( seconds, now = now )
+    lines.append( 'Unacknowledged errors in the last {:g} s: {}'.format(
+        seconds, len( errors ) ) )
+    for record in errors:
+        lines.append( '  {}  {}'.format(
+            time.strftime( '%Y-%m-%d %H:%M:%S',
+                time.localtime( record.time ) ),
+            record.title
+        ) )
+    lines.append( 'Click-through by title:' )
+    lines.append( '  {:>8} {:>8} {:>7}  {}'.format(
+        'shown', 'clicked', 'rate', 'title' ) )
+    for title, shown, clicked, rate in history.click_through():
+        lines.append( '  {:>8} {:>8} {:>6.1%}  {}'.format(
+            shown, clicked, rate, title ) )
+    return '\n'.join( lines )
+
+
+# Balloons displayed by all notifiers
+notify_history = History()
+
+
+#-----------------------------------------------------------------------------
+# Click Actions
+#-----------------------------------------------------------------------------
+
+# Action targets that are opened as URLs (instead of run as commands)
+_URL_PATTERN = re.compile( r'^(?:[A-Za-z][A-Za-z0-9+.-]*://|mailto:)' )
+
+# Action result statuses
+ACTION_DONE    = 'done'
+ACTION_FAILED  = 'failed'
+ACTION_TIMEOUT = 'timeout'
+
+
+#=============================================================================
+class ActionResult( object ):
+    """
+    The result of running a click action.
+
+    `value` is what the action produced: the callable's return value, the
+    `subprocess.CompletedProcess` of a command (with its captured output),
+    or whether a browser opened the URL.
+    """
+
+    __slots__ = ( 'action', 'status', 'value', 'error', 'elapsed' )
+
+
+    #=========================================================================
+    def __init__( self, action, status, value = None, error = None,
+        elapsed = 0.0 ):
+        """
+        Initializes a result.
+
+        @param action  The Action that ran
+        @param status  ACTION_DONE, ACTION_FAILED, or ACTION_TIMEOUT
+        @param value   What the action produced
+        @param error   The exception raised by the action (if any)
+        @param elapsed Seconds the action ran
+        """
+        self.action  = action
+        self.status  = status
+        self.value   = value
+        self.error   = error
+        self.elapsed = elapsed
+
+
+    #=========================================================================
+    def __repr__( self ):
+        return 'ActionResult({!r}, {!r}, {!r}, {!r}, {:.3f})'.format(
+            self.action.target,
+            self.status,
+            self.value,
+            self.error,
+            self.elapsed
+        )
+
+
+#=============================================================================
+class Action( object ):
+    """
+    Something to do when a balloon is clicked.
+
+    The target is a Python callable, a URL (opened with the default
+    browser), or a command line (a string, or a sequence of arguments).
+    Commands are killed when they run longer than the timeout, and their
+    output is captured.  A URL that takes longer than the timeout to open
+    is abandoned: its result is reported as timed out, and the worker is
+    freed (the browser may still open it).  Callables can not be
+    interrupted: a callable that overruns its timeout holds its worker
+    until it returns, and is then reported as timed out.
+    """
+
+    __slots__ = ( 'target', 'timeout' )
+
+
+    #=========================================================================
+    def __init__( self, target, timeout = 30.0 ):
+        """
+        Initializes an action.
+
+        @param target  A callable (called without arguments), a URL, or a
+                       command line
+        @param timeout Seconds the action may run (enforced for commands
+                       and URLs; only reported for callables)
+        """
+        self.target  = target
+        self.timeout = timeout
+
+
+    #=========================================================================
+    def run( self ):
+        """
+        Runs the action (on a worker thread).
+
+        @return The ActionResult (errors are captured, not raised)
+        """
+        start = time.monotonic()
+        try:
+            value = self._run()
+        except Exception as error:
+            status = ACTION_FAILED
+            if isinstance( error, TimeoutError ):
+                status = ACTION_TIMEOUT
+            return ActionResult( self, status, None, error,
+                time.monotonic() - start )
+        elapsed = time.monotonic() - start
+
+        # Commands that exit with an error status have failed, and anything
+        # that overran its timeout has timed out.
+        status = ACTION_DONE
+        if getattr( value, 'returncode', 0 ) != 0:
+            status = ACTION_FAILED
+        if elapsed > self.timeout:
+            status = ACTION_TIMEOUT
+        return ActionResult( self, status, value, None, elapsed )
+
+
+    #=========================================================================
+    def _run( self ):
+        """
+        Runs the action's target.
+
+        @return What the target produced
+        """
+        target = self.target
+        if callable( target ):
+            return target()
+        if isinstance( target, str ) and _URL_PATTERN.match( target ):
+            return self._open( target )
+        import subprocess
+        if isinstance( target, str ) and ( sys.platform != 'win32' ):
+            import shlex
+            target = shlex.split( target )
+        try:
+            return subprocess.run(
+                target,
+                stdin          = subprocess.DEVNULL,
+                capture_output = True,
+                timeout        = self.timeout
+            )
+        except subprocess.TimeoutExpired as error:
+            raise TimeoutError( str( error ) ) from error
+
+
+    #=========================================================================
+    def _open( self, url ):
+        """
+        Opens a URL with the default browser, giving up after the timeout.
+
+        The browser is launched from its own (daemon) thread, since
+        `webbrowser.open()` may block until the browser exits.
+
+        @param url The URL
+        @return    Whether a browser opened the URL
+        """
+        import concurrent.futures
+        import webbrowser
+        future = concurrent.futures.Future()
+        def open_url():
+            try:
+                future.set_result( webbrowser.open( url ) )
+            except Exception as error:
+                future.set_exception( error )
+        threading.Thread(
+            target = open_url,
+            name   = 'bugme-browser',
+            daemon = True
+        ).start()
+        try:
+            return future.result( self.timeout )
+        except concurrent.futures.TimeoutError:
+            raise TimeoutError( 'Opening {} took over {:g} s.'.format(
+                url, self.timeout ) ) from None
+
+
+#=============================================================================
+class ActionPool( object ):
+    """
+    Bounded pool of worker threads that run click actions.
+
+    Actions are handed off from the message pump, so a slow action never
+    delays message dispatching.  At most `workers` actions run at once,
+    and at most `backlog` more wait for a worker; actions submitted beyond
+    that are dropped (the pump never waits for the pool).  The results of
+    recent actions are kept in `results`.
+    """
+
+
+    #=========================================================================
+    def __init__( self, workers = 4, backlog = 16, results = 64 ):
+        """
+        Initializes a pool (threads are started when first needed).
+
+        @param workers The number of worker threads
+        @param backlog The number of actions that may wait for a worker
+        @param results The number of recent results kept
+        """
+        self.workers   = workers
+        self.backlog   = backlog
+        self.results   = collections.deque( maxlen = results )
+        self.submitted = 0
+        self.dropped   = 0
+        self._slots    = threading.BoundedSemaphore( workers + backlog )
+        self._executor = None
+        self._lock     = threading.Lock()
+
+
+    #=========================================================================
+    def submit( self, action ):
+        """
+        Runs an action on a worker thread (without waiting for it).
+
+        @param action The Action to run
+        @return       A `concurrent.futures.Future` of the ActionResult (None
+                      if the pool is full)
+        """
+        if self._slots.acquire( blocking = False ) == False:
+            self.dropped += 1
+            logging.warning( 'Action pool is full; dropped click action.' )
+            return None
+        with self._lock:
+            if self._executor is None:
+                import concurrent.futures
+                self._executor = concurrent.futures.ThreadPoolExecutor(
+                    self.workers,
+                    thread_name_prefix = 'bugme-action'
+                )
+            self.submitted += 1
+            future = self._executor.submit( action.run )
+        future.add_done_callback( self._done )
+        return future
+
+
+    #=========================================================================
+    def _done( self, future ):
+        """
+        Keeps a finished action's result, and frees its slot.
+
+        @param future The action's future
+        """
+        self._slots.release()
+        result = future.result()
+        self.results.append( result )
+        if result.status != ACTION_DONE:
+            logging.warning( 'Click action {}: {!r}'.format(
+                result.status, result.action.target ) )
+
+
+    #=========================================================================
+    def shutdown( self, wait = True ):
+        """
+        Stops the worker threads (a later submission starts new ones).
+
+        @param wait Set to wait for queued and running actions
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown( wait = wait )
+
+
+# Workers that run the click actions of all notifiers
+action_pool = ActionPool()
+
+
+#-----------------------------------------------------------------------------
+# Retry Policy
+#-----------------------------------------------------------------------------
+
+#=============================================================================
+class RetryPolicy( object ):
+    """
+    Retries transient failures with jittered exponential backoff.
+
+    Shell_NotifyIcon() fails transiently while the shell is busy (or
+    restarting).  Failed calls are retried after a delay that starts at
+    `delay` and grows by `factor` (up to `limit`) with each attempt.  Each
+    delay is jittered (shortened by up to `jitter` of itself, at random) so
+    that many retrying callers do not hit the shell in lock-step.  Retries
+    stop after `attempts` calls, or once `deadline` seconds have passed.
+
+    Only transient failures are retried: a failed call is classified by
+    its error code (see `call()`), and only the codes in `transient`
+    (ERROR_TIMEOUT, reported while the shell is busy) are retried.
+    Permanent failures (e.g. NIM_ADD of an existing item) fail at once.
+
+    `call()` waits between attempts, so it must not be used where waiting
+    blocks other work; the pump instead schedules its retries on its timer
+    wheel (using `delays()`, `deadline`, and `is_transient()`).
+    """
+
+
+    #=========================================================================
+    def __init__( self, attempts = 5, delay = 0.05, factor = 2.0,
+        limit = 1.0, jitter = 0.5, deadline = 2.0, clock = time.monotonic,
+        sleep = time.sleep, random = None, transient = ( ERROR_TIMEOUT, ) ):
+        """
+        Initializes a retry policy.
+
+        @param attempts  Largest number of calls (including the first)
+        @param delay     Seconds before the first retry
+        @param factor    Growth of the delay with each retry
+        @param limit     Largest delay between retries (seconds)
+        @param jitter    Largest fraction of each delay removed at random
+        @param deadline  Seconds after the first call when retries stop
+        @param clock     Time source for the deadline (seconds)
+        @param sleep     Function that waits for a number of seconds
+        @param random    Function returning random numbers in [0, 1)
+        @param transient Error codes of failures that are retried
+        """
+        if random is None:
+            import random as _random
+            random = _random.random
+        self.attempts  = attempts
+        self.delay     = delay
+        self.factor    = factor
+        self.limit     = limit
+        self.jitter    = jitter
+        self.deadline  = deadline
+        self.clock     = clock
+        self.sleep     = sleep
+        self.random    = random
+        self.transient = frozenset( transient )
+        self.retries   = 0
+
+
+    #=========================================================================
+    def delays( self ):
+        """
+        Generates the (jittered) delays before each retry.
+
+        @return An iterator of delays (seconds), one per retry
+        """
+        delay = self.delay
+        for _ in range( self.attempts - 1 ):
+            yield delay * ( 1.0 - ( self.jitter * self.random() ) )
+            delay = min( delay * self.factor, self.limit )
+
+
+    #=========================================================================
+    def is_transient( self, code ):
+        """
+        Classifies a failure by its error code.
+
+        @param code The error code of the failed call
+        @return     True if the failure is transient (worth retrying)
+        """
+        return code in self.transient
+
+
+    #=========================================================================
+    def call( self, function, *args, error = None ):
+        """
+        Calls a function until it succeeds, fails permanently, or retries run
+        out.
+
+        @param function The function to call (returns a true value when it
+                        succeeds)
+        @param args     Arguments passed to the function
+        @param error    Function returning the error code of the failed
+                        call (e.g. `backend.last_error`); when None, every
+                        failure is retried
+        @return         The function's last result
+        """
+
+        # Stop at success, or at a permanent failure.
+        def finished( result ):
+            if result:
+                return True
+            if error is None:
+                return False
+            return self.is_transient( error() ) == False
+
+        result = function( *args )
+        if finished( result ):
+            return result
+        deadline = self.clock() + self.deadline
+        for delay in self.delays():
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                break
+            self.sleep( min( delay, remaining ) )
+            self.retries += 1
+            logging.debug( 'Retrying {}.'.format(
+                getattr( function, '__name__', 'call' )
+            ) )
+            result = function( *args )
+            if finished( result ):
+                break
+        return result
+
+
+#-----------------------------------------------------------------------------
+# Persistent Notifier
+#-----------------------------------------------------------------------------
+
+# Window class registrations (reference counted per backend), and the
+# notifiers that own each window.
+_class_lock       = threading.Lock()
+_class_references = {}
+_notifiers        = {}
+
+
+#=============================================================================
+def _acquire_class( backend ):
+    """
+    Registers the notifier window class for a backend (once).
+
+    @param backend The backend on which to register the window class
+    """
+    with _class_lock:
+        count = _class_references.get( backend, 0 )
+        if count == 0:
+            class_atom = backend.register_class(
+                WINDOW_CLASS_NAME,
+                notify_procedure
+            )
+            if class_atom == 0:
+                raise Win32Error(
+                    'Unable to register window class.',
+                    'RegisterClassEx',
+                    backend.last_error()
+                )
+            logging.debug( 'Window class registered.' )
+        _class_references[ backend ] = count + 1
+
+
+#=============================================================================
+def _release_class( backend ):
+    """
+    Unregisters the notifier window class once it is no longer used.
+
+    @param backend The backend on which the window class was registered
+    """
+    with _class_lock:
+        count = _class_references.pop( backend ) - 1
+        if count > 0:
+            _class_references[ backend ] = count
+        else:
+            backend.unregister_class( WINDOW_CLASS_NAME )
+            logging.debug( 'Window class unregistered.' )
+
+
+#=============================================================================
+class TrayItem( object ):
+    """
+    A single tray item (icon) owned by a notifier's window.
+
+    Items are identified by their uID, which the shell passes back (as
+    `wParam`) with every callback message for the item.
+    """
+
+
+    #=========================================================================
+    def __init__( self, notifier, uid, icon_path ):
+        """
+        Initializes a tray item (without adding it to the tray).
+
+        @param notifier  The notifier that owns the item's window
+        @param uid       The item's ID
+        @param icon_path The icon displayed in the tray
+        """
+        self.notifier      = notifier
+        self.uid           = uid
+        self.icon_path     = icon_path
+        self.event         = None
+        self.handler       = None
+        self.shown         = 0
+        self.replacing     = False
+        self.unshown       = 0
+        self.pending       = False
+        self.sequence      = None
+        self.action        = None
+        self.icon_handle   = None
+        self._balloon_data = None
+
+
+    #=========================================================================
+    def add( self ):
+        """
+        Adds the item to the tray.
+        """
+        backend = self.notifier.backend
+
+        # Load the icon into an icon instance.
+        self.icon_handle = self.notifier.icons.get( self.icon_path )
+        if bool( self.icon_handle ) == False:
+            raise Win32Error(
+                'Unable to load icon.',
+                'LoadImage',
+                backend.last_error()
+            )
+        logging.debug( 'Icon loaded.' )
+
+        # Add the notification item to the tray.
+        self._add_icon()
+
+        # Reserve the notification data used to display balloons.
+        self._balloon_data = NOTIFYICONDATAW(
+            cbSize = ctypes.sizeof( NOTIFYICONDATAW ),
+            hWnd   = self.notifier.window_handle,
+            uID    = self.uid,
+            uFlags = NIF_INFO,
+            hIcon  = self.icon_handle
+        )
+
+
+    #=========================================================================
+    def _add_icon( self ):
+        """
+        Adds the item's icon to the tray (retrying transient failures).
+        """
+        backend     = self.notifier.backend
+        notify_data = NOTIFYICONDATAW(
+            cbSize           = ctypes.sizeof( NOTIFYICONDATAW ),
+            hWnd             = self.notifier.window_handle,
+            uID              = self.uid,
+            uFlags           = NIF_ICON | NIF_MESSAGE | NIF_TIP,
+            uCallbackMessage = APPLICATION_MESSAGE_ID,
+            hIcon            = self.icon_handle
+        )
+        notify_data.set_text( 'szTip', APPLICATION_NAME )
+        result = self.notifier.retry.call(
+            backend.shell_notify_icon,
+            NIM_ADD,
+            notify_data,
+            error = backend.last_error
+        )
+        if result == False:
+            raise Win32Error(
+                'Unable to add notification icon.',
+                'Shell_NotifyIcon',
+                backend.last_error()
+            )
+        logging.debug( 'Notification item added.' )
+
+
+    #=========================================================================
+    def restore( self ):
+        """
+        Adds the item back to the tray after the shell restarts.
+
+        A balloon that was displayed when the shell went away is displayed
+        again (the events that would have ended it never arrive).
+        """
+        self._add_icon()
+        if self.pending == True:
+            self.replacing = True
+            self.unshown   = 1
+            self._modify()
+
+
+    #=========================================================================
+    def remove( self ):
+        """
+        Removes the item from the tray.
+        """
+        notify_data = NOTIFYICONDATAW(
+            cbSize = ctypes.sizeof( NOTIFYICONDATAW ),
+            hWnd   = self.notifier.window_handle,
+            uID    = self.uid
+        )
+        result = self.notifier.backend.shell_notify_icon(
+            NIM_DELETE,
+            notify_data
+        )
+        if result == False:
+            logging.warning( 'Unable to delete notification item.' )
+        else:
+            logging.debug( 'Notification item deleted.' )
+        self.release()
+
+
+    #=========================================================================
+    def release( self ):
+        """
+        Releases the item's reserved notification data.
+        """
+        self._balloon_data = None
+
+
+    #=========================================================================
+    def show( self, message, title = 'Bugme!', flags = NIIF_USER,
+        icon = None, action = None, timeout = None ):
+        """
+        Displays a balloon without waiting for it to go away.
+
+        @param message The message contents to display (or a rendered
+                       Payload, whose title and flags are used instead)
+        @param title   The title of the message to display
+        @param flags   The NIIF_* flags for the balloon
+        @param icon    The name of a registered balloon icon (replaces the
+                       balloon's NIIF_* icon flags)
+        @param action  The Action run when the balloon is clicked
+        @param timeout Seconds the shell should display the balloon (sent
+                       as uTimeout, which only older shells honor; see
+                       `Pump.submit()` for enforced expiry)
+        """
+        payload = message if type( message ) is Payload else None
+        if payload is not None:
+            title = payload.title
+            flags = payload.flags
+
+        # Forget the event that ended any previous balloon.
+        self.event    = None
+        self.pending  = True
+        self.unshown += 1
+
+        # Fill in the reserved notification data.
+        notify_data = self._balloon_data
+        if icon is not None:
+            notify_data.hBalloonIcon = self.notifier.icons.named( icon )
+            flags = ( flags & ~NIIF_ICON_MASK ) | NIIF_USER
+        else:
+            notify_data.hBalloonIcon = None
+        notify_data.dwInfoFlags = flags
+        notify_data.uTimeout    = 0 if timeout is None else \
+            int( timeout * 1000 )
+        if payload is not None:
+            notify_data.set_data( 'szInfo', payload.info )
+            notify_data.set_data( 'szInfoTitle', payload.info_title )
+        else:
+            notify_data.set_text( 'szInfo', message )
+            notify_data.set_text( 'szInfoTitle', title )
+
+        # Display the notification message for the tray item.
+        try:
+            self._modify()
+        except:
+            self.pending  = False
+            self.unshown -= 1
+            raise
+
+        self.action = action
+
+        # Record the balloon (and the end of a balloon it replaced).
+        history = self.notifier.history
+        if history is not None:
+            if self.sequence is not None:
+                history.complete( self.sequence, OUTCOME_HIDDEN )
+            self.sequence = history.record( title, flags )
+
+        # Time the balloon until it is dismissed.
+        if metrics.enabled == True:
+            self.shown = time.perf_counter_ns()
+
+
+    #=========================================================================
+    def _modify( self ):
+        """
+        Displays the reserved balloon (retrying transient failures).
+        """
+        backend = self.notifier.backend
+        result  = self.notifier.retry.call(
+            backend.shell_notify_icon,
+            NIM_MODIFY,
+            self._balloon_data,
+            error = backend.last_error
+        )
+        if result == False:
+            raise Win32Error(
+                'Unable to post notification message.',
+                'Shell_NotifyIcon',
+                backend.last_error()
+            )
+        logging.debug( 'Notification message posted.' )
+
+
+    #=========================================================================
+    def replace( self, message, title = 'Bugme!', flags = NIIF_USER,
+        icon = None, action = None, timeout = None ):
+        """
+        Replaces the displayed balloon.
+
+        Events that end the replaced balloon are ignored until the shell
+        has shown (NIN_BALLOONSHOW) every balloon displayed so far.
+
+        @param message The message contents to display
+        @param title   The title of the message to display
+        @param flags   The NIIF_* flags for the balloon
+        @param icon    The name of a registered balloon icon
+        @param action  The Action run when the balloon is clicked
+        @param timeout Seconds the shell should display the balloon
+        """
+        self.replacing = True
+        self.show( message, title, flags, icon, action, timeout )
+
+
+    #=========================================================================
+    def expire( self ):
+        """
+        Ends the displayed balloon's history as expired (before it is
+        retracted or replaced), and forgets its click action.
+        """
+        history = self.notifier.history
+        if ( history is not None ) and ( self.sequence is not None ):
+            history.complete( self.sequence, OUTCOME_EXPIRED )
+        self.sequence = None
+        self.action   = None
+
+
+    #=========================================================================
+    def retract( self ):
+        """
+        Removes the displayed balloon (leaving the icon in the tray).
+
+        The balloon is modified with an empty `szInfo`, which the shell
+        takes as a request to remove it.  Events that end the retracted
+        balloon are ignored, as with `replace()`.
+        """
+        self.expire()
+        self.pending   = False
+        self.replacing = True
+        notify_data    = self._balloon_data
+        notify_data.set_text( 'szInfo', '' )
+        notify_data.set_text( 'szInfoTitle', '' )
+        self._modify()
+
+
+    #=========================================================================
+    def receive( self, event ):
+        """
+        Handles a callback event for the item.
+
+        @param event The NIN_* event
+        """
+        if event == NIN_BALLOONSHOW:
+            self.unshown = max( 0, self.unshown - 1 )
+            if self.unshown == 0:
+                self.replacing = False
+        elif ( event in BALLOON_OUTCOMES ) and ( self.replacing == False ):
+            self.event   = event
+            self.pending = False
+            self.unshown = 0
+            if self.sequence is not None:
+                self.notifier.history.complete(
+                    self.sequence,
+                    BALLOON_OUTCOMES[ event ]
+                )
+                self.sequence = None
+
+            # Hand the balloon's click action off to the action pool.
+            action, self.action = self.action, None
+            if ( event == NIN_BALLOONUSERCLICK ) and ( action is not None ):
+                self.notifier.actions.submit( action )
+            if self.shown != 0:
+                metrics.observe( 'dismiss', self.shown )
+                self.shown = 0
+            if self.handler is not None:
+                self.handler( self, event )
+
+
+#=============================================================================
+class Notifier( object ):
+    """
+    Long-lived notification window and tray items.
+
+    The window class, window, icon, and tray item are set up once when the
+    notifier is opened.  Each notification then only modifies the tray item
+    to display a new balloon.  Notifiers are also context managers:
+
+        with Notifier() as notifier:
+            notifier.notify( 'Build failed.' )
+            notifier.notify( 'Build fixed.' )
+
+    One window may own several tray items (see `add_item()`); the window's
+    messages are dispatched through a table keyed by message ID, and item
+    callbacks are routed to items by uID.  When the shell restarts (and
+    broadcasts "TaskbarCreated"), the items are added back to the tray.
+
+    Windows belong to the thread that creates them, so a notifier must be
+    opened and used from a single thread.
+    """
+
+
+    #=========================================================================
+    def __init__( self, backend = None, icon_path = None, uid = 0,
+        icons = None, retry = None, history = notify_history,
+        actions = action_pool ):
+        """
+        Initializes a notifier.
+
+        @param backend   The shell/user32 backend (defaults to Win32)
+        @param icon_path The icon displayed in the tray (defaults to the
+                         project's icon)
+        @param uid       The default tray item's ID
+        @param icons     An IconCache to share (defaults to a cache owned by
+                         the notifier)
+        @param retry     The RetryPolicy for tray operations (defaults to a
+                         policy owned by the notifier)
+        @param history   The History that records displayed balloons (None
+                         to not record them)
+        @param actions   The ActionPool that runs click actions
+        """
+        self.backend       = default_backend() if backend is None else backend
+        self.icon_path     = _icon_path() if icon_path is None else icon_path
+        self.uid           = uid
+        self.retry         = RetryPolicy() if retry is None else retry
+        self.history       = history
+        self.actions       = actions
+        self.icons         = icons
+        self._own_icons    = icons is None
+        if self._own_icons == True:
+            self.icons = IconCache( self.backend )
+        self.item          = None
+        self.items         = {}
+        self.window_handle = None
+        self._handlers     = {
+            APPLICATION_MESSAGE_ID : self._item_message
+        }
+
+
+    #=========================================================================
+    def __enter__( self ):
+        self.open()
+        return self
+
+
+    #=========================================================================
+    def __exit__( self, exc_type, exc_value, traceback ):
+        self.close()
+
+
+    #=========================================================================
+    @property
+    def event( self ):
+        """
+        The event that ended the default item's most recent balloon.
+        """
+        return self.item.event
+
+
+    #=========================================================================
+    def open( self ):
+        """
+        Creates the window and adds the default tray item.
+        """
+
+        # Make sure the window class is registered.
+        _acquire_class( self.backend )
+
+        try:
+
+            # Create the window that owns the notification.
+            window_handle = self.backend.create_window(
+                WINDOW_CLASS_NAME,
+                APPLICATION_NAME
+            )
+            if bool( window_handle ) == False:
+                raise Win32Error(
+                    'Unable to create window.',
+                    'CreateWindowEx',
+                    self.backend.last_error()
+                )
+            logging.debug( 'Window created.' )
+            with _class_lock:
+                _notifiers[ window_handle ] = self
+            self.window_handle = window_handle
+
+            # Add the items back when the shell restarts.
+            message = self.backend.register_message( 'TaskbarCreated' )
+            if message != 0:
+                self._handlers[ message ] = self._taskbar_created
+
+            # Add the default tray item.
+            self.item = self.add_item( self.uid, self.icon_path )
+
+        except:
+            self._destroy()
+            raise
+
+
+    #=========================================================================
+    def close( self ):
+        """
+        Removes the tray items, and releases the window.
+        """
+
+        # Check for an already-closed notifier.
+        if self.window_handle is None:
+            return
+
+        # Remove the tray items.
+        for uid in list( self.items ):
+            self.remove_item( uid )
+
+        # Release the window and window class.
+        self._destroy()
+
+
+    #=========================================================================
+    def _destroy( self ):
+        """
+        Releases the items, icons, and window (if any), and the window class.
+        """
+        for item in self.items.values():
+            item.release()
+        self.items.clear()
+        if self._own_icons == True:
+            self.icons.clear()
+        if self.window_handle is not None:
+            self.backend.destroy_window( self.window_handle )
+            with _class_lock:
+                _notifiers.pop( self.window_handle, None )
+            self.window_handle = None
+        _release_class( self.backend )
+
+
+    #=========================================================================
+    def add_item( self, uid, icon_path = None ):
+        """
+        Adds a tray item to the notifier's window.
+
+        @param uid       The item's ID (unique within the notifier)
+        @param icon_path The icon displayed in the tray (defaults to the
+                         notifier's icon)
+        @return          The new TrayItem
+        """
+        if uid in self.items:
+            raise ValueError( 'Duplicate tray item ID: {}'.format( uid ) )
+        if icon_path is None:
+            icon_path = self.icon_path
+        item = TrayItem( self, uid, icon_path )
+        item.add()
+        self.items[ uid ] = item
+        return item
+
+
+    #=========================================================================
+    def remove_item( self, uid ):
+        """
+        Removes a tray item from the notifier's window.
+
+        @param uid The item's ID
+        """
+        item = self.items.pop( uid )
+        item.remove()
+        if item is self.item:
+            self.item = None
+
+
+    #=========================================================================
+    def show( self, message, title = 'Bugme!', flags = NIIF_USER,
+        icon = None, action = None ):
+        """
+        Displays a balloon from the default item without waiting for it to
+        go away.
+
+        @param message The message contents to display (or a rendered
+                       Payload)
+        @param title   The title of the message to display
+        @param flags   The NIIF_* flags for the balloon
+        @param icon    The name of a registered balloon icon (replaces the
+                       balloon's NIIF_* icon flags)
+        @param action  The Action run when the balloon is clicked
+        """
+        self.item.show( message, title, flags, icon, action )
+
+
+    #=========================================================================
+    def wait( self, item = None ):
+        """
+        Handles window messages until an item's balloon goes away.
+
+        @param item The item to wait for (defaults to the default item)
+        @return     The NIN_BALLOON* event that ended the balloon (None if
+                    the message loop ended first)
+        """
+        if item is None:
+            item = self.item
+        window_message = ctypes.wintypes.MSG()
+        while item.event is None:
+            result = self.backend.get_message(
+                window_message,
+                self.window_handle
+            )
+            if result <= 0:
+                break
+            self.backend.dispatch_message( window_message )
+        return item.event
+
+
+    #=========================================================================
+    def notify( self, message, title = 'Bugme!', flags = NIIF_USER,
+        icon = None, action = None ):
+        """
+        Displays a balloon, and waits for it to go away.
+
+        @param message The message contents to display
+        @param title   The title of the message to display
+        @param flags   The NIIF_* flags for the balloon
+        @param icon    The name of a registered balloon icon
+        @param action  The Action run when the balloon is clicked
+        @return        The NIN_BALLOON* event that ended the balloon
+        """
+        self.show( message, title, flags, icon, action )
+        return self.wait()
+
+
+    #=========================================================================
+    def notify_many( self, records, title = 'Bugme!', flags = NIIF_USER ):
+        """
+        Displays a sequence of balloons, one after the other.
+
+        Each balloon is displayed once the previous balloon has gone away.
+
+        @param records An iterable of messages, or of `( message[, title[,
+                       flags]] )` tuples
+        @param title   The title for records that do not specify one
+        @param flags   The NIIF_* flags for records that do not specify them
+        @return        A list of outcomes (OUTCOME_*), one per record
+        """
+        outcomes = []
+        for record in records:
+            if isinstance( record, ( str, Payload ) ):
+                record = ( record, )
+            record = tuple( record ) + ( title, flags )[ len( record ) - 1 : ]
+            event  = self.notify( *record[ : 3 ] )
+            outcomes.append( BALLOON_OUTCOMES.get( event ) )
+        return outcomes
+
+
+    #=========================================================================
+    def procedure( self, uMsg, wParam, lParam ):
+        """
+        Handles messages for the notifier's window.
+
+        @param uMsg   Event message ID
+        @param wParam Context-specific additional parameter
+        @param lParam Context-specific additional parameter
+        @return       0 if the message was handled, None otherwise
+        """
+        handler = self._handlers.get( uMsg )
+        if handler is None:
+            return None
+        return handler( wParam, lParam )
+
+
+    #=========================================================================
+    def _item_message( self, wParam, lParam ):
+        """
+        Routes a tray item callback message to its item.
+
+        @param wParam The item's ID
+        @param lParam The NIN_* event (low word)
+        @return       0 (the message was handled)
+        """
+        logging.debug( 'Application message received in window procedure.' )
+        item = self.items.get( wParam )
+        if item is not None:
+            item.receive( lParam & 0x0000FFFF )
+        return 0
+
+
+    #=========================================================================
+    def _taskbar_created( self, wParam, lParam ):
+        """
+        Adds the tray items back after the shell restarts.
+
+        @param wParam Unused
+        @param lParam Unused
+        @return       0 (the message was handled)
+        """
+        logging.debug( 'Taskbar created; restoring tray items.' )
+        for item in list( self.items.values() ):
+            try:
+                item.restore()
+            except Win32Error as error:
+                logging.warning( 'Unable to restore tray item: {}'.format(
+                    error
+                ) )
+        return 0
+
+
+#=============================================================================
+def notify_procedure( hWnd, uMsg, wParam, lParam ):
+    """
+    Handles messages for the window class.
+
+    Messages are routed to the notifier that owns the destination window.
+
+    @param hWnd   Destination window handle
+    @param uMsg   Event message ID
+    @param wParam Context-specific additional parameter
+    @param lParam Context-specific additional parameter
+    @return       0 if the message was handled, None to pass the message on
+                  to the default handler
+    """
+    notifier = _notifiers.get( hWnd )
+    if notifier is None:
+        return None
+    return notifier.procedure( uMsg, wParam, lParam )
+
+
+#=============================================================================
+def notify( message, title = 'Bugme!', backend = None, action = None ):
+    """
+    Use the Win32 API to display a notification balloon.
+
+    @param message The message contents to display
+    @param title   The title of the message to display
+    @param backend The shell/user32 backend (defaults to Win32)
+    @param action  The Action run when the balloon is clicked
+    @return        Exit status (0 = success)
+    """
+    with Notifier( backend ) as notifier:
+        notifier.notify( message, title, action = action )
+    logging.debug( 'Notification procedure complete.' )
+    return 0
+
+
+#=============================================================================
+def notify_many( records, title = 'Bugme!', flags = NIIF_USER,
+    backend = None ):
+    """
+    Display a sequence of balloons through a single tray item.
+
+    The window, icon, and tray item are set up once for the whole sequence.
+
+    @param records An iterable of messages, or of `( message[, title[,
+                   flags]] )` tuples
+    @param title   The title for records that do not specify one
+    @param flags   The NIIF_* flags for records that do not specify them
+    @param backend The shell/user32 backend (defaults to Win32)
+    @return        A list of outcomes (OUTCOME_*), one per record
+    """
+    with Notifier( backend ) as notifier:
+        return notifier.notify_many( records, title, flags )
+
+
+#-----------------------------------------------------------------------------
+# Admission Control
+#-----------------------------------------------------------------------------
+
+#=============================================================================
+class TokenBucket( object ):
+    """
+    Token bucket rate limiter.
+
+    The bucket holds up to `burst` tokens, and refills at `rate` tokens per
+    second.  Each admitted item takes one token.
+    """
+
+
+    #=========================================================================
+    def __init__( self, rate, burst, clock = time.monotonic ):
+        """
+        Initializes a full token bucket.
+
+        @param rate  The refill rate (tokens per second)
+        @param burst The capacity of the bucket (tokens)
+        @param clock The time source (seconds)
+        """
+        self.rate   = rate
+        self.burst  = burst
+        self.tokens = float( burst )
+        self.clock  = clock
+        self.stamp  = clock()
+
+
+    #=========================================================================
+    def take( self, count = 1 ):
+        """
+        Attempts to take tokens from the bucket.
+
+        @param count The number of tokens to take
+        @return      True if the tokens were available (and taken)
+        """
+        now         = self.clock()
+        self.tokens = min(
+            self.burst,
+            self.tokens + ( ( now - self.stamp ) * self.rate )
+        )
+        self.stamp  = now
+        if self.tokens < count:
+            return False
+        self.tokens -= count
+        return True
+
+
+#=============================================================================
+class _Admitted( object ):
+    """
+    Notification admitted into the pending queue.
+    """
+    __slots__ = ( 'message', 'title', 'flags', 'first', 'count', 'shown' )
+
+
+    #=========================================================================
+    def __init__( self, message, title, flags, first ):
+        self.message = message
+        self.title   = title
+        self.flags   = flags
+        self.first   = first
+        self.count   = 1
+        self.shown   = False
+
+
+#=============================================================================
+class Admission( object ):
+    """
+    Admission layer in front of notifications.
+
+    Duplicate suppression: a repeat of a `( message, title )` pair is folded
+    into the first copy while that copy is pending (displayed with a "(×N)"
+    counter), or suppressed outright for `window` seconds after it has been
+    popped for display.  Pending pairs stay pinned until they are popped;
+    popped pairs are then kept in a bounded LRU cache.
+
+    Rate limiting: each title (channel) has its own token bucket, and
+    notifications that find their bucket empty are dropped.  A `rate` of
+    None disables rate limiting.
+
+    Any number of threads may submit notifications (and pop them) at once.
+
+        admission = Admission( rate = 0.5, burst = 3 )
+        admission.submit( 'Disk full.', 'storage' )
+        notify_many( admission.drain() )
+    """
+
+
+    #=========================================================================
+    def __init__( self, window = 10.0, capacity = 1024, rate = 1.0,
+        burst = 5, rates = None, clock = time.monotonic ):
+        """
+        Initializes the admission layer.
+
+        @param window   Duplicate suppression window (seconds)
+        @param capacity Maximum number of pairs in the duplicate cache
+        @param rate     Default per-title rate (notifications per second),
+                        or None to not limit titles
+        @param burst    Default per-title burst (notifications)
+        @param rates    Optional dictionary of per-title `( rate, burst )`
+        @param clock    The time source (seconds)
+        """
+        self.window     = window
+        self.capacity   = capacity
+        self.rate       = rate
+        self.burst      = burst
+        self.rates      = {} if rates is None else rates
+        self.clock      = clock
+        self.submitted  = 0
+        self.admitted   = 0
+        self.suppressed = 0
+        self.dropped    = 0
+        self._buckets   = {}
+        self._pending   = collections.deque()
+        self._queued    = {}
+        self._recent    = collections.OrderedDict()
+        self._condition = threading.Condition()
+
+
+    #=========================================================================
+    def __len__( self ):
+        """
+        Reports the number of pending notifications.
+        """
+        return len( self._pending )
+
+
+    #=========================================================================
+    def submit( self, message, title = 'Bugme!', flags = NIIF_USER ):
+        """
+        Submits a notification for admission.
+
+        @param message The message contents to display
+        @param title   The title (and rate limiting channel) of the message
+        @param flags   The NIIF_* flags for the balloon
+        @return        True if the notification was queued as a new balloon
+        """
+        key = ( message, title )
+        with self._condition:
+            now             = self.clock()
+            self.submitted += 1
+
+            # Fold repeats into a pending copy.
+            entry = self._queued.get( key )
+            if entry is not None:
+                entry.count     += 1
+                self.suppressed += 1
+                return False
+
+            # Suppress repeats of a recently displayed copy.
+            entry = self._recent.get( key )
+            if ( entry is not None ) and \
+                ( ( now - entry.first ) < self.window ):
+                entry.count += 1
+                self._recent.move_to_end( key )
+                self.suppressed += 1
+                return False
+
+            # Apply the title's rate limit.
+            bucket = self._buckets.get( title )
+            if bucket is None:
+                rate, burst = self.rates.get(
+                    title,
+                    ( self.rate, self.burst )
+                )
+                if rate is not None:
+                    bucket = TokenBucket( rate, burst, self.clock )
+                self._buckets[ title ] = bucket
+            if ( bucket is not None ) and ( bucket.take() == False ):
+                self.dropped += 1
+                return False
+
+            # Queue the notification (pinned until it is popped).
+            entry = _Admitted( message, title, flags, now )
+            self._queued[ key ] = entry
+            self._pending.append( entry )
+            self.admitted += 1
+            self._condition.notify_all()
+            return True
+
+
+    #=========================================================================
+    def pop( self ):
+        """
+        Removes the next pending notification for display.
+
+        @return A `( message, title, flags )` tuple, or None if nothing is
+                pending
+        """
+        with self._condition:
+            return self._pop()
+
+
+    #=========================================================================
+    def _pop( self ):
+        """
+        Removes the next pending notification (with the lock held).
+
+        The notification's pair moves from the pending pairs to the LRU
+        cache of displayed pairs (evicting the least recently seen).
+
+        @return A `( message, title, flags )` tuple, or None if nothing is
+                pending
+        """
+        if len( self._pending ) == 0:
+            return None
+        entry       = self._pending.popleft()
+        entry.shown = True
+        entry.first = self.clock()
+        key         = ( entry.message, entry.title )
+        del self._queued[ key ]
+        self._recent[ key ] = entry
+        self._recent.move_to_end( key )
+        while len( self._recent ) > self.capacity:
+            self._recent.popitem( last = False )
+        self._condition.notify_all()
+        message = entry.message
+        if entry.count > 1:
+            message = '{} (×{})'.format( message, entry.count )
+        return ( message, entry.title, entry.flags )
+
+
+    #=========================================================================
+    def drain( self ):
+        """
+        Generates pending notifications until none are left.
+
+        @return An iterator of `( message, title, flags )` tuples
+        """
+        record = self.pop()
+        while record is not None:
+            yield record
+            record = self.pop()
+
+
+    #=========================================================================
+    def records( self, records, backlog = 1024 ):
+        """
+        Admits a stream of notification records.
+
+        The records are submitted by a background thread while the consumer
+        takes admitted records at its own pace, so repeats that arrive while
+        the consumer is behind are folded into the pending copies.  The
+        background thread waits while `backlog` records are pending.
+
+        @param records An iterable of `( message, title, flags )` tuples
+        @param backlog Maximum number of pending records
+        @return        An iterator of admitted `( message, title, flags )`
+                       tuples
+        """
+        finished = [ False ]
+        pending  = self._pending
+
+        # Submit records off the consumer's thread.
+        def consume():
+            try:
+                for record in records:
+                    with self._condition:
+                        while len( pending ) >= backlog:
+                            self._condition.wait()
+                    self.submit( *record[ : 3 ] )
+            finally:
+                with self._condition:
+                    finished[ 0 ] = True
+                    self._condition.notify_all()
+        thread = threading.Thread( target = consume, daemon = True )
+        thread.start()
+
+        # Take admitted records until the stream ends.
+        while True:
+            with self._condition:
+                while ( len( pending ) == 0 ) and ( finished[ 0 ] == False ):
+                    self._condition.wait()
+                record = self._pop()
+            if record is None:
+                break
+            yield record
+        thread.join()
+
+
+    #=========================================================================
+    def stats( self ):
+        """
+        Takes a snapshot of the admission counters.
+
+        @return A dictionary of counters
+        """
+        with self._condition:
+            return {
+                'submitted'  : self.submitted,
+                'admitted'   : self.admitted,
+                'suppressed' : self.suppressed,
+                'dropped'    : self.dropped,
+                'pending'    : len( self._pending )
+            }
+
+
+#-----------------------------------------------------------------------------
+# Digest Mode
+#-----------------------------------------------------------------------------
+
+#=============================================================================
+class CountMinSketch( object ):
+    """
+    Count-min sketch of key frequencies.
+
+    Each key is counted in one cell of every row (conservative update), and
+    its estimate is the smallest of those cells: never below the true count,
+    and above it by at most `2 * total / width` with probability
+    `1 - 2 ** -depth`.  Memory is fixed at `width * depth` counters no
+    matter how many distinct keys are counted.
+
+    Row indices are derived from one `hash()` of the key (double hashing),
+    so estimates are only comparable within a process.
+    """
+
+
+    #=========================================================================
+    def __init__( self, width = 4096, depth = 4 ):
+        """
+        Initializes an empty sketch.
+
+        @param width The number of counters in each row
+        @param depth The number of rows
+        """
+        self.width  = width
+        self.depth  = depth
+        self.total  = 0
+        self._table = array.array( 'I', bytes( width * depth * 4 ) )
+        self._rows  = tuple( row * width for row in range( depth ) )
+
+
+    #=========================================================================
+    def _cells( self, key ):
+        """
+        Computes the table index of a key's cell in every row.
+
+        @param key The key
+        @return    A list of table indices
+        """
+        code  = hash( key ) & 0xFFFFFFFFFFFFFFFF
+        step  = ( code >> 32 ) | 1
+        width = self.width
+        cells = []
+        for offset in self._rows:
+            cells.append( offset + ( code % width ) )
+            code += step
+        return cells
+
+
+    #=========================================================================
+    def add( self, key, count = 1 ):
+        """
+        Counts occurrences of a key.
+
+        @param key   The key
+        @param count The number of occurrences
+        @return      The key's new estimated count
+        """
+        table    = self._table
+        cells    = self._cells( key )
+        values   = [ table[ cell ] for cell in cells ]
+        estimate = min( values ) + count
+        for cell, value in zip( cells, values ):
+            if value < estimate:
+                table[ cell ] = estimate
+        self.total += count
+        return estimate
+
+
+    #=========================================================================
+    def estimate( self, key ):
+        """
+        Estimates the count of a key.
+
+        @param key The key
+        @return    The estimated count (never below the true count)
+        """
+        table = self._table
+        return min( [ table[ cell ] for cell in self._cells( key ) ] )
+
+
+    #=========================================================================
+    def clear( self ):
+        """
+        Resets every counter to zero.
+        """
+        self._table = array.array( 'I', bytes( len( self._table ) * 4 ) )
+        self.total  = 0
+
+
+#=============================================================================
+class HyperLogLog( object ):
+    """
+    HyperLogLog estimate of the number of distinct keys.
+
+    Keys are spread over `2 ** precision` one-byte registers that keep the
+    longest run of leading zero bits seen in their hashes.  The standard
+    error is about `1.04 / sqrt( 2 ** precision )` (3% for the default),
+    in a fixed `2 ** precision` bytes.
+    """
+
+
+    #=========================================================================
+    def __init__( self, precision = 10 ):
+        """
+        Initializes an empty estimator.
+
+        @param precision The number of hash bits used to pick a register
+        """
+        self.precision  = precision
+        self._registers = bytearray( 1 << precision )
+
+
+    #=========================================================================
+    def __len__( self ):
+        """
+        Estimates the number of distinct keys added.
+
+        @return The estimated number of distinct keys
+        """
+        registers = self._registers
+        size      = len( registers )
+        estimate  = ( 0.7213 / ( 1.0 + ( 1.079 / size ) ) ) * size * size / \
+            sum( 2.0 ** -rank for rank in registers )
+
+        # Linear counting is more accurate while most registers are empty
+        zeros = registers.count( 0 )
+        if ( estimate <= ( 2.5 * size ) ) and ( zeros > 0 ):
+            estimate = size * math.log( size / zeros )
+        return int( round( estimate ) )
+
+
+    #=========================================================================
+    def add( self, key ):
+        """
+        Adds a key to the estimate.
+
+        @param key The key
+        """
+        code      = hash( key ) & 0xFFFFFFFFFFFFFFFF
+        index     = code & ( ( 1 << self.precision ) - 1 )
+        rank      = 65 - self.precision - \
+            ( code >> self.precision ).bit_length()
+        registers = self._registers
+        if registers[ index ] < rank:
+            registers[ index ] = rank
+
+
+    #=========================================================================
+    def clear( self ):
+        """
+        Forgets every key.
+        """
+        self._registers = bytearray( len( self._registers ) )
+
+
+#=============================================================================
+class Digest( object ):
+    """
+    Windowed digest of a notification stream.
+
+    Notifications are counted instead of displayed: a count-min sketch
+    estimates how often each title (source) occurred, and a small min-heap
+    keeps the `top` most frequent titles seen so far.  Every `window`
+    seconds the counts are folded into one summary balloon whose text fits
+    the `szInfo` field:
+
+        1532 messages: 12 errors, 340 warnings
+        812  db-01
+        410  web-03
+        +61 more
+
+    Memory is bounded by the sketch and the heap, so it stays flat however
+    many distinct titles a burst carries.  Counts are sketch estimates and
+    may slightly overstate rare titles.
+
+        digest = Digest( window = 60.0 )
+        notify_records( digest.records( read_records( sys.stdin ) ) )
+    """
+
+    # Severity names indexed by scheduling priority
+    SEVERITIES = ( 'none', 'info', 'warning', 'error' )
+
+
+    #=========================================================================
+    def __init__( self, window = 60.0, top = 8, width = 4096, depth = 4,
+        title = 'Digest', clock = time.monotonic ):
+        """
+        Initializes an empty digest.
+
+        @param window The length of a digest window (seconds)
+        @param top    The number of titles to list in a summary
+        @param width  The number of counters in each sketch row
+        @param depth  The number of sketch rows
+        @param title  The title of summary balloons
+        @param clock  The time source (seconds)
+        """
+        self.window     = window
+        self.top        = top
+        self.title      = title
+        self.clock      = clock
+        self.sketch     = CountMinSketch( width, depth )
+        self.started    = clock()
+        self.windows    = 0
+        self._lock      = threading.Lock()
+        self._counts    = {}
+        self._heap      = []
+        self._distinct  = HyperLogLog()
+        self._severity  = [ 0 ] * len( self.SEVERITIES )
+
+
+    #=========================================================================
+    def __len__( self ):
+        """
+        Counts the notifications in the current window.
+
+        @return The number of notifications added since the last flush
+        """
+        return self.sketch.total
+
+
+    #=========================================================================
+    def add( self, message, title = None, flags = NIIF_INFO ):
+        """
+        Counts a notification in the current window.
+
+        @param message The notification text (not retained)
+        @param title   The notification title (the digest key)
+        @param flags   The balloon flags (severity)
+        """
+        key = title or ''
+        with self._lock:
+            self._severity[ severity_priority( flags ) ] += 1
+            self._distinct.add( key )
+            count  = self.sketch.add( key )
+            counts = self._counts
+            if key in counts:
+                counts[ key ] = count
+                heapq.heappush( self._heap, ( count, key ) )
+                if len( self._heap ) > ( 4 * self.top ):
+                    self._heap = [ ( c, k ) for k, c in counts.items() ]
+                    heapq.heapify( self._heap )
+            elif len( counts ) < self.top:
+                counts[ key ] = count
+                heapq.heappush( self._heap, ( count, key ) )
+            elif count > self._floor():
+                del counts[ heapq.heappop( self._heap )[ 1 ] ]
+                counts[ key ] = count
+                heapq.heappush( self._heap, ( count, key ) )
+
+
+    #=========================================================================
+    def _floor( self ):
+        """
+        Finds the smallest count among the top titles.
+
+        Heap entries are not removed when a title's count goes up, so stale
+        entries are discarded from the top of the heap first.
+
+        @return The smallest current count in the heap
+        """
+        heap   = self._heap
+        counts = self._counts
+        while counts.get( heap[ 0 ][ 1 ] ) != heap[ 0 ][ 0 ]:
+            heapq.heappop( heap )
+        return heap[ 0 ][ 0 ]
+
+
+    #=========================================================================
+    def summary( self ):
+        """
+        Formats the current window as a balloon.
+
+        The first line carries the totals, followed by one line per top
+        title (most frequent first) for as long as the text fits the
+        `szInfo` field, and a "+N more" line for the titles left out.
+
+        @return A `( message, title, flags )` tuple, or None if the window
+                is empty
+        """
+        with self._lock:
+            total = self.sketch.total
+            if total == 0:
+                return None
+            severity = self._severity
+            titles   = sorted(
+                self._counts.items(),
+                key = lambda item: ( -item[ 1 ], item[ 0 ] )
+            )
+            distinct = max( len( self._distinct ), len( titles ) )
+            elapsed  = self.clock() - self.started
+
+        # Totals, most severe first
+        limit  = NOTIFYICONDATAW.INFO_SIZE - 1
+        counts = [
+            '{} {}{}'.format(
+                severity[ level ],
+                self.SEVERITIES[ level ],
+                '' if severity[ level ] == 1 else 's'
+            )
+            for level in ( 3, 2 ) if severity[ level ] > 0
+        ]
+        lines  = [ '{} message{}{}'.format(
+            total,
+            '' if total == 1 else 's',
+            ': ' + ', '.join( counts ) if counts else ''
+        ) ]
+
+        # Top titles while they fit, leaving room for the "+N more" line
+        width  = len( str( titles[ 0 ][ 1 ] ) ) + 2 if titles else 0
+        shown  = 0
+        for key, count in titles:
+            line = '{:<{}}{}'.format( count, width, key or '(untitled)' )
+            if len( line ) > 40:
+                line = line[ : 37 ] + '...'
+            size = sum( len( l ) + 1 for l in lines ) + len( line )
+            if ( size + len( '\n+{} more'.format( distinct ) ) ) > limit:
+                break
+            lines.append( line )
+            shown += 1
+        if distinct > shown:
+            lines.append( '+{} more'.format( distinct - shown ) )
+
+        # Balloon with the most severe icon seen in the window
+        level = max(
+            level for level in range( len( severity ) )
+            if severity[ level ] > 0
+        )
+        title = '{} ({:.0f}s)'.format( self.title, elapsed )
+        return (
+            '\n'.join( lines )[ : limit ],
+            title[ : NOTIFYICONDATAW.TITLE_SIZE - 1 ],
+            ( NIIF_INFO, NIIF_INFO, NIIF_WARNING, NIIF_ERROR )[ level ]
+        )
+
+
+    #=========================================================================
+    def flush( self ):
+        """
+        Summarizes the current window and starts a new one.
+
+        @return A `( message, title, flags )` tuple, or None if the window
+                was empty
+        """
+        summary = self.summary()
+        with self._lock:
+            self.sketch.clear()
+            self._counts.clear()
+            del self._heap[ : ]
+            self._distinct.clear()
+            self._severity = [ 0 ] * len( self.SEVERITIES )
+            self.started   = self.clock()
+            if summary is not None:
+                self.windows += 1
+        return summary
+
+
+    #=========================================================================
+    def records( self, records ):
+        """
+        Digests a stream of notification records.
+
+        The records are consumed by a background thread, so a summary is
+        produced at the end of each window even while the stream is idle.
+        The last (partial) window is summarized when the stream ends.
+
+        @param records An iterable of `( message, title, flags )` tuples
+        @return        An iterator of summary `( message, title, flags )`
+                       tuples
+        """
+        finished = threading.Event()
+
+        # Count records off the consumer's thread
+        def consume():
+            try:
+                for record in records:
+                    self.add( *record[ : 3 ] )
+            finally:
+                finished.set()
+        thread = threading.Thread( target = consume, daemon = True )
+        thread.start()
+
+        # Summarize each window as it closes
+        while True:
+            remaining = ( self.started + self.window ) - self.clock()
+            if finished.wait( max( remaining, 0.0 ) ) == True:
+                break
+            summary = self.flush()
+            if summary is not None:
+                yield summary
+        thread.join()
+        summary = self.flush()
+        if summary is not None:
+            yield summary
+
+
+    #=========================================================================
+    def stats( self ):
+        """
+        Takes a snapshot of the digest counters.
+
+        @return A dictionary of counters
+        """
+        return {
+            'windows'  : self.windows,
+            'pending'  : self.sketch.total,
+            'distinct' : len( self._distinct ),
+            'tracked'  : len( self._counts ),
+            'sketch'   : self.sketch.width * self.sketch.depth
+        }
+
+
+#-----------------------------------------------------------------------------
+# Timer Wheel
+#-----------------------------------------------------------------------------
+
+#=============================================================================
+class Timer( object ):
+    """
+    Timer scheduled on a TimerWheel.
+    """
+    __slots__ = ( 'deadline', 'tick', 'function', 'args', 'slot' )
+
+
+    #=========================================================================
+    def __init__( self, deadline, tick, function, args ):
+        self.deadline = deadline
+        self.tick     = tick
+        self.function = function
+        self.args     = args
+        self.slot     = None
+
+
+    #=========================================================================
+    @property
+    def active( self ):
+        """
+        True while the timer has neither fired nor been cancelled.
+        """
+        return self.slot is not None
+
+
+#=============================================================================
+class TimerWheel( object ):
+    """
+    Hierarchical timer wheel.
+
+    Time is divided into ticks of `resolution` seconds.  The first level has
+    one slot per tick for the next `slots` ticks, and each further level
+    has slots `slots` times as wide, so `levels` levels span
+    `slots ** levels` ticks (timers further out wait in the last level).
+    A timer lives in the slot that covers its tick; when the wheel turns
+    into a wider slot, its timers cascade down to the narrower levels.
+
+    Scheduling and cancelling are O(1) whatever the number of timers, and
+    advancing costs O(1) per tick plus O(1) per timer fired (or cascaded,
+    at most once per level).  Timers never fire before their deadline, and
+    no later than one tick after it (when the wheel is advanced at least
+    once per tick).
+
+    The wheel does not run on its own: its owner calls `advance()` (e.g.
+    from a periodic WM_TIMER), and timers fire on the owner's thread.
+
+        wheel = TimerWheel()
+        timer = wheel.schedule( time.monotonic() + 5.0, print, 'expired' )
+        wheel.cancel( timer )
+    """
+
+
+    #=========================================================================
+    def __init__( self, resolution = 0.05, slots = 64, levels = 4,
+        clock = time.monotonic ):
+        """
+        Initializes an empty wheel.
+
+        @param resolution The length of a tick (seconds)
+        @param slots      The number of slots in each level (a power of 2)
+        @param levels     The number of levels
+        @param clock      The time source (seconds)
+        """
+        if ( slots < 2 ) or ( ( slots & ( slots - 1 ) ) != 0 ):
+            raise ValueError( 'Slots must be a power of 2.' )
+        self.resolution = resolution
+        self.slots      = slots
+        self.levels     = levels
+        self.clock      = clock
+        self.fired      = 0
+        self._bits      = slots.bit_length() - 1
+        self._mask      = slots - 1
+        self._span      = 1 << ( self._bits * levels )
+        self._wheels    = [
+            [ {} for _ in range( slots ) ] for _ in range( levels )
+        ]
+        self._count     = 0
+        self._tick      = int( clock() // resolution )
+
+
+    #=========================================================================
+    def __len__( self ):
+        """
+        Counts the pending timers.
+
+        @return The number of timers that have not fired or been cancelled
+        """
+        return self._count
+
+
+    #=========================================================================
+    def schedule( self, deadline, function, *args ):
+        """
+        Schedules a function to be called at (or shortly after) a deadline.
+
+        @param deadline The time (from `clock`) to call the function
+        @param function The function to call
+        @param args     The function's arguments
+        @return         The Timer (for `cancel()`)
+        """
+        tick  = -int( -deadline // self.resolution )
+        timer = Timer( deadline, max( tick, self._tick + 1 ), function, args )
+        self._place( timer )
+        self._count += 1
+        return timer
+
+
+    #=========================================================================
+    def cancel( self, timer ):
+        """
+        Cancels a timer.
+
+        @param timer The Timer (from `schedule()`)
+        @return      True if the timer was pending
+        """
+        slot = timer.slot
+        if slot is None:
+            return False
+        del slot[ timer ]
+        timer.slot   = None
+        self._count -= 1
+        return True
+
+
+    #=========================================================================
+    def _place( self, timer ):
+        """
+        Adds a timer to the slot that covers its tick.
+
+        @param timer The Timer
+        """
+        tick  = timer.tick
+        delta = tick - self._tick
+        bits  = self._bits
+
+        # The first level whose slots (relative to the current tick) reach
+        # the timer's tick.
+        if delta >= self._span:
+            tick  = self._tick + self._span - 1
+            level = self.levels - 1
+        else:
+            level = 0
+            while delta >= ( 1 << ( bits * ( level + 1 ) ) ):
+                level += 1
+        index         = ( tick >> ( bits * level ) ) & self._mask
+        slot          = self._wheels[ level ][ index ]
+        slot[ timer ] = None
+        timer.slot    = slot
+
+
+    #=========================================================================
+    def advance( self, now = None ):
+        """
+        Turns the wheel to the current time, calling expired timers.
+
+        Timers are called in deadline order within a tick.  A timer that
+        raises is logged (and does not stop the others).
+
+        @param now The current time (defaults to `clock()`)
+        @return    The number of timers called
+        """
+        target = int( ( self.clock() if now is None else now ) //
+            self.resolution )
+        wheels = self._wheels
+        mask   = self._mask
+        bits   = self._bits
+        fired  = 0
+        while self._tick < target:
+
+            # Nothing to fire or cascade on the way.
+            if self._count == 0:
+                self._tick = target
+                break
+            self._tick += 1
+            tick        = self._tick
+
+            # Cascade the timers of each wider slot the wheel turns into.
+            level = 1
+            while ( level < self.levels ) and \
+                ( ( tick & ( ( 1 << ( bits * level ) ) - 1 ) ) == 0 ):
+                index = ( tick >> ( bits * level ) ) & mask
+                slot  = wheels[ level ][ index ]
+                if len( slot ) > 0:
+                    wheels[ level ][ index ] = {}
+                    for timer in slot:
+                        self._place( timer )
+                level += 1
+
+            # Call the timers of this tick's slot.
+            slot = wheels[ 0 ][ tick & mask ]
+            if len( slot ) == 0:
+                continue
+            wheels[ 0 ][ tick & mask ] = {}
+            self._count -= len( slot )
+            for timer in sorted( slot, key = lambda t: t.deadline ):
+                timer.slot = None
+                fired     += 1
+                try:
+                    timer.function( *timer.args )
+                except Exception:
+                    logging.exception( 'Timer function failed.' )
+        self.fired += fired
+        return fired
+
+
+#-----------------------------------------------------------------------------
+# Message Pump Thread
+#-----------------------------------------------------------------------------
+
+#=============================================================================
+def severity_priority( flags ):
+    """
+    Ranks a balloon's severity for scheduling.
+
+    Only the icon bits of the flags count (NIIF_NOSOUND and the other
+    modifiers do not change a balloon's priority).
+
+    @param flags The balloon's NIIF_* flags
+    @return      The priority (higher is more urgent)
+    """
+    return SEVERITY_PRIORITIES.get( flags & NIIF_ICON_MASK, 1 )
+
+
+#=============================================================================
+class Scheduler( object ):
+    """
+    Priority queue of notifications, keyed on severity and deadline.
+
+    More severe notifications come first; among equally severe ones, those
+    with earlier deadlines come first, and then those submitted first.
+    Notifications whose deadline has passed are dropped instead of being
+    returned (and collected in `expired`).  Pushing and popping are
+    O(log n), and discarding is O(1) (discarded entries are skipped when
+    they reach the top).
+    """
+
+
+    #=========================================================================
+    def __init__( self, clock = time.monotonic ):
+        """
+        Initializes an empty scheduler.
+
+        @param clock Time source for deadlines (seconds)
+        """
+        self.clock      = clock
+        self.expired    = collections.deque()
+        self._heap      = []
+        self._sequence  = 0
+        self._discarded = set()
+
+
+    #=========================================================================
+    def __len__( self ):
+        return len( self._heap ) - len( self._discarded )
+
+
+    #=========================================================================
+    def entry( self, request, flags, deadline = None ):
+        """
+        Creates a scheduling entry (without queueing it).
+
+        @param request  The notification
+        @param flags    The notification's NIIF_* flags
+        @param deadline The time (from `clock`) after which the notification
+                        is no longer worth displaying, or None
+        @return         The entry (its first item is the negated priority)
+        """
+        self._sequence += 1
+        return (
+            -severity_priority( flags ),
+            float( 'inf' ) if deadline is None else deadline,
+            self._sequence,
+            request
+        )
+
+
+    #=========================================================================
+    def push( self, entry ):
+        """
+        Queues an entry.
+
+        @param entry The entry (see `entry()`)
+        """
+        heapq.heappush( self._heap, entry )
+
+
+    #=========================================================================
+    def discard( self, entry ):
+        """
+        Removes a queued entry.
+
+        @param entry The entry (which must be queued)
+        """
+        self._discarded.add( entry[ 2 ] )
+
+
+    #=========================================================================
+    def pop( self ):
+        """
+        Removes the most urgent entry that has not expired.
+
+        @return The entry, or None if no entries are left
+        """
+        heap = self._heap
+        now  = None
+        while len( heap ) > 0:
+            entry = heapq.heappop( heap )
+            if entry[ 2 ] in self._discarded:
+                self._discarded.remove( entry[ 2 ] )
+                continue
+            if entry[ 1 ] != float( 'inf' ):
+                if now is None:
+                    now = self.clock()
+                if entry[ 1 ] < now:
+                    self.expired.append( entry )
+                    continue
+            return entry
+        return None
+
+
+    #=========================================================================
+    def clear( self ):
+        """
+        Removes every entry.
+
+        @return The removed entries
+        """
+        entries, self._heap = self._heap, []
+        discarded, self._discarded = self._discarded, set()
+        return [ entry for entry in entries if entry[ 2 ] not in discarded ]
+
+
+#=============================================================================
+class _Channel( object ):
+    """
+    Display queue for one of a pump's tray items.
+
+    `timers` holds the staleness timer of each queued entry with a
+    deadline (by sequence), and `expiry` the displayed balloon's timer.
+    `retries` holds the retry state of entries whose display failed
+    transiently (by sequence), and `retry` the timer that resumes display.
+    """
+    __slots__ = ( 'item', 'queue', 'current', 'timers', 'expiry',
+        'retries', 'retry' )
+
+
+    #=========================================================================
+    def __init__( self, item, clock = time.monotonic ):
+        self.item    = item
+        self.queue   = Scheduler( clock )
+        self.current = None
+        self.timers  = {}
+        self.expiry  = None
+        self.retries = {}
+        self.retry   = None
+
+
+#=============================================================================
+class Pump( object ):
+    """
+    Dedicated message pump thread that owns a notifier.
+
+    Notifications may be submitted from any thread.  They are handed to the
+    pump through an inbox (waking it with a posted message), and displayed
+    one after the other for each tray item.  Each notification's callback
+    is called on the pump thread with the notification's outcome
+    (OUTCOME_*), or with None if the pump stopped before the notification
+    was displayed (on the submitting thread, if the pump had already
+    stopped).
+
+    Each item's queue is ordered by severity and deadline (see Scheduler).
+    A notification more severe than the displayed balloon preempts it: the
+    balloon is replaced (with NIM_MODIFY), and the preempted notification
+    is queued again.  Notifications whose deadline passes before they are
+    displayed complete with OUTCOME_EXPIRED.  Callbacks are therefore
+    called in completion order, which is not the order of submission (a
+    preempted notification completes after the notifications that
+    preempted it).
+
+    Deadlines and display timeouts are enforced by a TimerWheel, which the
+    pump advances on a periodic WM_TIMER while any timer is pending.  A
+    queued notification completes with OUTCOME_EXPIRED as soon as its
+    deadline passes, and a displayed balloon whose timeout passes is
+    replaced by the next queued notification (or retracted), and
+    completes with OUTCOME_EXPIRED.
+
+    The pump thread never sleeps to retry a tray operation.  A balloon that
+    fails transiently (see RetryPolicy) is queued again, and the item's
+    display resumes from the timer wheel after the policy's next delay.
+
+    The pump's single window may own several tray items (see `add_item()`),
+    each with its own display queue.  Callback messages are routed to the
+    items by uID, so balloons for different items do not wait on each
+    other.
+
+        with Pump() as pump:
+            pump.submit( 'Build failed.', callback = print )
+    """
+
+
+    #=========================================================================
+    def __init__( self, backend = None, icon_path = None, retry = None,
+        wheel = None ):
+        """
+        Initializes a pump (without starting it).
+
+        @param backend   The shell/user32 backend (defaults to Win32)
+        @param icon_path The icon displayed in the tray
+        @param retry     The RetryPolicy for balloons (retried on the timer
+                         wheel)
+        @param wheel     The TimerWheel for deadlines and timeouts (its
+                         clock is the clock of deadlines)
+        """
+        self.backend    = default_backend() if backend is None else backend
+        self.icon_path  = icon_path
+        self.retry      = RetryPolicy() if retry is None else retry
+        self.wheel      = TimerWheel() if wheel is None else wheel
+        self.notifier   = None
+        self._channels  = {}
+        self._closed    = False
+        self._error     = None
+        self._inbox     = collections.deque()
+        self._lock      = threading.Lock()
+        self._ready     = threading.Event()
+        self._signalled = False
+        self._stopping  = False
+        self._thread    = None
+        self._ticking   = False
+
+
+    #=========================================================================
+    def __enter__( self ):
+        self.start()
+        return self
+
+
+    #=========================================================================
+    def __exit__( self, exc_type, exc_value, traceback ):
+        self.stop()
+
+
+    #=========================================================================
+    def start( self ):
+        """
+        Starts the pump thread, and waits for its tray item to be added.
+        """
+        self._thread = threading.Thread(
+            target = self._run,
+            name   = 'bugme-pump',
+            daemon = True
+        )
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+
+
+    #=========================================================================
+    def stop( self ):
+        """
+        Stops the pump thread, and removes its tray items.
+        """
+        if ( self._thread is None ) or ( self._thread.is_alive() == False ):
+            return
+        with self._lock:
+            if self._closed == False:
+                self._stopping = True
+                self._wake()
+        self._thread.join()
+
+
+    #=========================================================================
+    def post( self, function, *args ):
+        """
+        Runs a function on the pump thread (from any thread).
+
+        Functions posted before the pump thread exits are run, even while
+        the pump is stopping; functions posted after it are not.
+
+        @param function The function to run
+        @param args     The function's arguments
+        @return         True if the function will run, False if the pump
+                        has stopped
+        """
+        with self._lock:
+            if self._closed == True:
+                return False
+            self._inbox.append( ( function, args ) )
+
+            # Only post a wake message if the pump has not already been
+            # woken.
+            if self._signalled == False:
+                self._signalled = True
+                self._wake()
+        return True
+
+
+    #=========================================================================
+    def call( self, function, *args ):
+        """
+        Runs a function on the pump thread, and waits for its result.
+
+        @param function The function to run
+        @param args     The function's arguments
+        @return         The function's return value
+        """
+        done   = threading.Event()
+        result = [ None, None ]
+        def run():
+            try:
+                result[ 0 ] = function( *args )
+            except Exception as error:
+                result[ 1 ] = error
+            done.set()
+        if self.post( run ) == False:
+            raise RuntimeError( 'Pump is stopped.' )
+        done.wait()
+        if result[ 1 ] is not None:
+            raise result[ 1 ]
+        return result[ 0 ]
+
+
+    #=========================================================================
+    def add_item( self, uid, icon_path = None ):
+        """
+        Adds a tray item to the pump's window (from any thread).
+
+        @param uid       The item's ID
+        @param icon_path The icon displayed in the tray (defaults to the
+                         pump's icon)
+        """
+        self.call( self._add_item, uid, icon_path )
+
+
+    #=========================================================================
+    def remove_item( self, uid ):
+        """
+        Removes a tray item from the pump's window (from any thread).
+
+        Notifications still queued for the item complete with None.
+
+        @param uid The item's ID
+        """
+        self.call( self._remove_item, uid )
+
+
+    #=========================================================================
+    def submit( self, message, title = 'Bugme!', flags = NIIF_USER,
+        callback = None, uid = 0, deadline = None, action = None,
+        timeout = None ):
+        """
+        Submits a notification for display (from any thread).
+
+        @param message  The message contents to display
+        @param title    The title of the message to display
+        @param flags    The NIIF_* flags for the balloon (including
+                        NIIF_NOSOUND and NIIF_RESPECT_QUIET_TIME)
+        @param callback Called with the outcome on the pump thread (once,
+                        when the notification completes; see `Pump` for
+                        the order)
+        @param uid      The ID of the tray item that displays the balloon
+        @param deadline The time (from the wheel's clock) after which the
+                        notification is dropped instead of displayed
+        @param action   The Action run (on the notifier's action pool) when
+                        the balloon is clicked
+        @param timeout  Seconds the balloon is displayed before it is
+                        replaced or retracted (None leaves it to the shell)
+        """
+        if type( message ) is Payload:
+            title, flags = message.title, message.flags
+        request = ( message, title, flags, callback, action, timeout )
+        if self.post( self._enqueue, uid, request, deadline ) == False:
+            self._complete( request, None )
+
+
+    #=========================================================================
+    def _wake( self ):
+        """
+        Wakes the pump thread to look at its inbox.
+        """
+        self.backend.post_message(
+            self.notifier.window_handle,
+            PUMP_MESSAGE_ID
+        )
+
+
+    #=========================================================================
+    def _run( self ):
+        """
+        Pump thread entry point.
+        """
+
+        # The window must be created on the thread that pumps its messages.
+        self.notifier = Notifier(
+            self.backend,
+            self.icon_path,
+            retry = self.retry
+        )
+        try:
+            self.notifier.open()
+        except Exception as error:
+            self._error = error
+            self._ready.set()
+            return
+
+        # Once messages are being pumped, tray operations are not retried
+        # in place (balloons are retried on the timer wheel instead).
+        self.notifier.retry = RetryPolicy( attempts = 1 )
+        self._attach( self.notifier.item )
+        self._ready.set()
+
+        # Handle window messages until asked to stop.
+        window_message = ctypes.wintypes.MSG()
+        try:
+            while self._stopping == False:
+                result = self.backend.get_message( window_message, None )
+                if result <= 0:
+                    break
+                if window_message.message == PUMP_MESSAGE_ID:
+                    self._receive()
+                    continue
+                if ( window_message.message == WM_TIMER ) and \
+                    ( window_message.wParam == PUMP_TIMER_ID ):
+                    self._tick()
+                    continue
+                self.backend.dispatch_message( window_message )
+        finally:
+
+            # Stop taking posted functions before the window is destroyed,
+            # and run the ones already posted (completing notifications with
+            # None).
+            with self._lock:
+                self._stopping = True
+                self._closed   = True
+            if self._ticking == True:
+                self.backend.kill_timer(
+                    self.notifier.window_handle,
+                    PUMP_TIMER_ID
+                )
+                self._ticking = False
+            self.notifier.close()
+            for channel in self._channels.values():
+                self._abandon( channel )
+            self._channels.clear()
+            self._receive()
+
+
+    #=========================================================================
+    def _receive( self ):
+        """
+        Runs the functions posted to the inbox.
+        """
+        self._signalled = False
+        while len( self._inbox ) > 0:
+            function, args = self._inbox.popleft()
+            try:
+                function( *args )
+            except Exception:
+                logging.exception( 'Pump function failed.' )
+
+
+    #=========================================================================
+    def _schedule( self, deadline, function, *args ):
+        """
+        Schedules a function on the pump's timer wheel (on the pump thread).
+
+        The pump's WM_TIMER is started with the first pending timer.
+
+        @param deadline The time (from the wheel's clock) to call it
+        @param function The function to call
+        @param args     The function's arguments
+        @return         The Timer
+        """
+        timer = self.wheel.schedule( deadline, function, *args )
+        if self._ticking == False:
+            self._ticking = self.backend.set_timer(
+                self.notifier.window_handle,
+                PUMP_TIMER_ID,
+                max( 1, int( self.wheel.resolution * 1000 ) )
+            )
+        return timer
+
+
+    #=========================================================================
+    def _tick( self ):
+        """
+        Advances the timer wheel (on WM_TIMER), and stops the WM_TIMER once
+        no timers are pending.
+        """
+        self.wheel.advance()
+        if ( len( self.wheel ) == 0 ) and ( self._ticking == True ):
+            self.backend.kill_timer(
+                self.notifier.window_handle,
+                PUMP_TIMER_ID
+            )
+            self._ticking = False
+
+
+    #=========================================================================
+    def _attach( self, item ):
+        """
+        Starts routing an item's balloon events to a new display queue.
+
+        @param item The tray item
+        """
+        self._channels[ item.uid ] = _Channel( item, self.wheel.clock )
+        item.handler = self._item_event
+
+
+    #=========================================================================
+    def _add_item( self, uid, icon_path ):
+        """
+        Adds a tray item (on the pump thread).
+
+        @param uid       The item's ID
+        @param icon_path The icon displayed in the tray
+        """
+        if self._stopping == True:
+            raise RuntimeError( 'Pump is stopped.' )
+        self._attach( self.notifier.add_item( uid, icon_path ) )
+
+
+    #=========================================================================
+    def _remove_item( self, uid ):
+        """
+        Removes a tray item (on the pump thread).
+
+        @param uid The item's ID
+        """
+        channel = self._channels.pop( uid )
+        self.notifier.remove_item( uid )
+        self._abandon( channel )
+
+
+    #=========================================================================
+    def _abandon( self, channel ):
+        """
+        Completes every notification for a channel with no outcome.
+
+        @param channel The channel to empty
+        """
+        self._disarm( channel )
+        for timer in channel.timers.values():
+            self.wheel.cancel( timer )
+        channel.timers.clear()
+        if channel.retry is not None:
+            self.wheel.cancel( channel.retry )
+            channel.retry = None
+        channel.retries.clear()
+        if channel.current is not None:
+            self._complete( channel.current[ 3 ], None )
+            channel.current = None
+        for entry in channel.queue.clear():
+            self._complete( entry[ 3 ], None )
+        self._expire( channel )
+
+
+    #=========================================================================
+    def _enqueue( self, uid, request, deadline ):
+        """
+        Queues a notification for a tray item (on the pump thread).
+
+        @param uid      The item's ID
+        @param request  The submitted notification
+        @param deadline The notification's deadline (or None)
+        """
+        channel = self._channels.get( uid )
+        if ( channel is None ) or ( self._stopping == True ):
+            if channel is None:
+                logging.warning( 'No tray item with ID {}.'.format( uid ) )
+            self._complete( request, None )
+            return
+        entry   = channel.queue.entry( request, request[ 2 ], deadline )
+        current = channel.current
+
+        # Expire the notification when its deadline passes in the queue.
+        if deadline is not None:
+            channel.timers[ entry[ 2 ] ] = self._schedule(
+                deadline,
+                self._stale,
+                channel,
+                entry
+            )
+
+        # Display the notification now if nothing (or nothing as severe) is
+        # being displayed.  A preempted notification is displayed again
+        # later.
+        if current is None:
+            channel.queue.push( entry )
+            self._next( channel )
+        elif entry[ 0 ] < current[ 0 ]:
+            self._disarm( channel )
+            channel.queue.push( current )
+            channel.current = None
+
+            # The preempted notification's staleness timer was cancelled
+            # when it was displayed, so it is armed again.
+            if current[ 1 ] != float( 'inf' ):
+                channel.timers[ current[ 2 ] ] = self._schedule(
+                    current[ 1 ],
+                    self._stale,
+                    channel,
+                    current
+                )
+            if self._show( channel, entry, True ) == False:
+                self._next( channel )
+        else:
+            channel.queue.push( entry )
+
+
+    #=========================================================================
+    def _show( self, channel, entry, replace = False ):
+        """
+        Displays a notification from a channel.
+
+        @param channel The channel
+        @param entry   The notification's scheduling entry
+        @param replace Set when replacing a displayed balloon
+        @return        True if the notification is being displayed
+        """
+        request = entry[ 3 ]
+        message, title, flags, _, action, timeout = request
+        retry   = channel.retries.get( entry[ 2 ] )
+        if retry is not None:
+            replace = replace or retry[ 2 ]
+        try:
+            if replace == True:
+                channel.item.replace( message, title, flags,
+                    action = action, timeout = timeout )
+            else:
+                channel.item.show( message, title, flags,
+                    action = action, timeout = timeout )
+        except Exception as error:
+            if self._retry_later( channel, entry, replace, error ) == True:
+                return False
+            channel.retries.pop( entry[ 2 ], None )
+            timer = channel.timers.pop( entry[ 2 ], None )
+            if timer is not None:
+                self.wheel.cancel( timer )
+            logging.exception( 'Unable to display notification.' )
+            self._complete( request, None )
+            return False
+        channel.retries.pop( entry[ 2 ], None )
+        timer = channel.timers.pop( entry[ 2 ], None )
+        if timer is not None:
+            self.wheel.cancel( timer )
+        channel.current = entry
+
+        # Take the balloon down when its timeout passes.
+        if timeout is not None:
+            channel.expiry = self._schedule(
+                self.wheel.clock() + timeout,
+                self._timeout,
+                channel,
+                entry
+            )
+        return True
+
+
+    #=========================================================================
+    def _retry_later( self, channel, entry, replace, error ):
+        """
+        Queues a notification again after a transient display failure, and
+        schedules the channel's display to resume after the retry delay.
+
+        The notification keeps its staleness timer while it waits, so its
+        deadline still applies.
+
+        @param channel The channel
+        @param entry   The notification's scheduling entry
+        @param replace Set when the notification was replacing a balloon
+        @param error   The exception raised by the display
+        @return        True if the notification will be retried
+        """
+        policy = self.retry
+        if ( isinstance( error, Win32Error ) == False ) or \
+            ( policy.is_transient( error.code ) == False ):
+            return False
+
+        # Find the retry's delay (starting the retries at the first failure).
+        now   = self.wheel.clock()
+        retry = channel.retries.get( entry[ 2 ] )
+        if retry is None:
+            retry = ( policy.delays(), now + policy.deadline, replace )
+            channel.retries[ entry[ 2 ] ] = retry
+        delay = next( retry[ 0 ], None )
+        if ( delay is None ) or ( now >= retry[ 1 ] ):
+            return False
+
+        # Wait for the retry without blocking the pump thread.
+        policy.retries += 1
+        logging.debug( 'Retrying notification in {:.3f}s.'.format( delay ) )
+        channel.queue.push( entry )
+        if channel.retry is not None:
+            self.wheel.cancel( channel.retry )
+        channel.retry = self._schedule(
+            min( now + delay, retry[ 1 ] ),
+            self._resume,
+            channel
+        )
+        return True
+
+
+    #=========================================================================
+    def _resume( self, channel ):
+        """
+        Resumes a channel's display after a retry delay (on the pump thread,
+        from the timer wheel).
+
+        @param channel The channel
+        """
+        channel.retry = None
+        self._next( channel )
+
+
+    #=========================================================================
+    def _disarm( self, channel ):
+        """
+        Cancels the timeout of a channel's displayed balloon (if any).
+
+        @param channel The channel
+        """
+        if channel.expiry is not None:
+            self.wheel.cancel( channel.expiry )
+            channel.expiry = None
+
+
+    #=========================================================================
+    def _stale( self, channel, entry ):
+        """
+        Expires a queued notification whose deadline has passed (on the
+        pump thread, from the timer wheel).
+
+        @param channel The channel
+        @param entry   The notification's scheduling entry
+        """
+        if channel.timers.pop( entry[ 2 ], None ) is None:
+            return
+        channel.retries.pop( entry[ 2 ], None )
+        channel.queue.discard( entry )
+        channel.queue.expired.append( entry )
+        self._expire( channel )
+
+
+    #=========================================================================
+    def _timeout( self, channel, entry ):
+        """
+        Takes down a displayed balloon whose timeout has passed (on the
+        pump thread, from the timer wheel).
+
+        The balloon is replaced by the channel's next queued notification,
+        or retracted if none is queued, and completes with OUTCOME_EXPIRED.
+
+        @param channel The channel
+        @param entry   The balloon's scheduling entry
+        """
+        channel.expiry = None
+        if channel.current is not entry:
+            return
+        channel.current = None
+        channel.item.expire()
+        self._complete( entry[ 3 ], OUTCOME_EXPIRED )
+
+        # Replace the balloon with the next notification.
+        following = channel.queue.pop()
+        self._expire( channel )
+        if following is not None:
+            if self._show( channel, following, True ) == False:
+                self._next( channel )
+            return
+
+        # Nothing is queued, so the balloon is retracted.
+        try:
+            channel.item.retract()
+        except Exception:
+            logging.exception( 'Unable to retract notification.' )
+
+
+    #=========================================================================
+    def _next( self, channel ):
+        """
+        Displays a channel's next queued notification (if any).
+
+        @param channel The channel to advance
+        """
+        while ( channel.current is None ) and ( channel.retry is None ):
+            entry = channel.queue.pop()
+            self._expire( channel )
+            if entry is None:
+                break
+            self._show( channel, entry )
+
+
+    #=========================================================================
+    def _expire( self, channel ):
+        """
+        Completes a channel's expired notifications.
+
+        @param channel The channel
+        """
+        expired = channel.queue.expired
+        history = self.notifier.history
+        while len( expired ) > 0:
+            entry   = expired.popleft()
+            request = entry[ 3 ]
+            timer   = channel.timers.pop( entry[ 2 ], None )
+            if timer is not None:
+                self.wheel.cancel( timer )
+            if history is not None:
+                history.record( request[ 1 ], request[ 2 ], OUTCOME_EXPIRED )
+            self._complete( request, OUTCOME_EXPIRED )
+
+
+    #=========================================================================
+    def _item_event( self, item, event ):
+        """
+        Completes an item's displayed notification when its balloon ends.
+
+        @param item  The tray item
+        @param event The NIN_BALLOON* event that ended the balloon
+        """
+        channel = self._channels.get( item.uid )
+        if channel is None:
+            return
+        self._disarm( channel )
+        entry, channel.current = channel.current, None
+        if entry is not None:
+            self._complete( entry[ 3 ], BALLOON_OUTCOMES.get( event ) )
+        self._next( channel )
+
+
+    #=========================================================================
+    def _complete( self, request, outcome ):
+        """
+        Delivers a notification's outcome to its callback.
+
+        @param request The submitted notification
+        @param outcome The notification's outcome
+        """
+        callback = request[ 3 ]
+        if callback is None:
+            return
+        try:
+            callback( outcome )
+        except Exception:
+            logging.exception( 'Notification callback failed.' )
+
+
+# Pump shared by asynchronous notifications
+_shared_pump      = None
+_shared_pump_lock = threading.Lock()
+
+
+#=============================================================================
+def shared_pump( backend = None ):
+    """
+    Provides the pump shared by asynchronous notifications.
+
+    The pump is started the first time it is needed.
+
+    @param backend The backend for the pump (only used when starting it)
+    @return        The running shared pump
+    """
+    global _shared_pump
+    with _shared_pump_lock:
+        if _shared_pump is None:
+            pump = Pump( backend )
+            pump.start()
+            _shared_pump = pump
+        return _shared_pump
+
+
+#=============================================================================
+def _resolve_future( future, outcome ):
+    """
+    Resolves an outcome future (on its event loop).
+
+    @param future  The future to resolve
+    @param outcome The notification's outcome
+    """
+    if future.done() == False:
+        future.set_result( outcome )
+
+
+#=============================================================================
+async def notify_async( message, title = 'Bugme!', flags = NIIF_USER,
+    pump = None, uid = 0, action = None, timeout = None ):
+    """
+    Display a notification balloon without blocking the event loop.
+
+    Every awaiting notification shares a single message pump thread.
+
+    @param message The message contents to display
+    @param title   The title of the message to display
+    @param flags   The NIIF_* flags for the balloon
+    @param pump    The pump that displays the balloon (defaults to the
+                   shared pump)
+    @param uid     The ID of the pump's tray item that displays the balloon
+    @param action  The Action run when the balloon is clicked
+    @param timeout Seconds the balloon is displayed before it is taken down
+    @return        The outcome (OUTCOME_*) of the balloon
+    """
+    import asyncio
+
+    # Bridge the outcome from the pump thread to this event loop.
+    loop   = asyncio.get_running_loop()
+    future = loop.create_future()
+    def resolve( outcome ):
+        loop.call_soon_threadsafe( _resolve_future, future, outcome )
+
+    # Submit the notification, and wait for its outcome.
+    if pump is None:
+        pump = shared_pump()
+    pump.submit( message, title, flags, resolve, uid, action = action,
+        timeout = timeout )
+    return await future
+
+
+#-----------------------------------------------------------------------------
+# Stream Input
+#-----------------------------------------------------------------------------
+
+#=============================================================================
+def parse_record( line, title = 'Bugme!', flags = NIIF_USER ):
+    """
+    Parses a line of stream input into a notification.
+
+    Lines are either plain text (the message), or JSON objects with a
+    "message" and optional "title" and "severity" (a SEVERITY_FLAGS name,
+    or NIIF_* flags).  Setting "quiet" to true respects the user's quiet
+    time, and setting "sound" to false displays the balloon silently.
+    Lines that do not parse as JSON objects are treated as plain text.
+
+    @param line  The line of input (with or without its line ending)
+    @param title The title for records that do not specify one
+    @param flags The NIIF_* flags for records that do not specify them
+    @return      A `( message, title, flags )` tuple, or None for blank
+                 lines
+    """
+    text = line.strip()
+    if len( text ) == 0:
+        return None
+    if text[ 0 ] != '{':
+        return ( text, title, flags )
+
+    # Parse JSON records (importing the parser only when needed).
+    import json
+    try:
+        record = json.loads( text )
+    except ValueError:
+        return ( text, title, flags )
+    if isinstance( record, dict ) == False:
+        return ( text, title, flags )
+
+    # Look up the record's fields.
+    severity = record.get( 'severity' )
+    if isinstance( severity, str ):
+        flags = SEVERITY_FLAGS.get( severity.lower(), flags )
+    elif isinstance( severity, int ):
+        flags = severity
+    if record.get( 'quiet' ) == True:
+        flags |= NIIF_RESPECT_QUIET_TIME
+    if record.get( 'sound' ) == False:
+        flags |= NIIF_NOSOUND
+    return (
+        str( record.get( 'message', '' ) ),
+        str( record.get( 'title', title ) ),
+        flags
+    )
+
+
+#=============================================================================
+def read_records( stream, title = 'Bugme!', flags = NIIF_USER ):
+    """
+    Generates notifications from lines of stream input.
+
+    @param stream An iterable of lines (e.g. a text file)
+    @param title  The title for records that do not specify one
+    @param flags  The NIIF_* flags for records that do not specify them
+    @return       An iterator of `( message, title, flags )` tuples
+    """
+    for line in stream:
+        record = parse_record( line, title, flags )
+        if record is not None:
+            yield record
+
+
+#=============================================================================
+def notify_records( records, capacity = 64, pump = None, backend = None,
+    completed = None ):
+    """
+    Displays a notification for each record, with backpressure.
+
+    Records are produced while earlier balloons are displayed by a single
+    pump (and its single notifier).  No more than `capacity` records are in
+    flight at once; when the display falls behind, consuming the records
+    blocks.  Returns once every record has completed.
+
+    @param records   An iterable of `( message, title, flags )` tuples
+    @param capacity  Maximum number of records in flight
+    @param pump      The pump that displays the balloons (defaults to a
+                     pump started for the records)
+    @param backend   The backend for a pump started for the records
+    @param completed Called with each record's index (its position in
+                     `records`) and outcome as the record completes, on the
+                     pump thread.  Records complete in display order, which
+                     is not the order of `records` (see `Pump`).
+    @return          A Counter of outcomes (OUTCOME_*, or None for records
+                     that were not displayed)
+    """
+    outcomes = collections.Counter()
+    slots    = threading.BoundedSemaphore( capacity )
+    def complete( index, outcome ):
+        if completed is not None:
+            completed( index, outcome )
+        outcomes[ outcome ] += 1
+        slots.release()
+
+    # Start a pump for the records.
+    own_pump = pump is None
+    if own_pump == True:
+        pump = Pump( backend )
+        pump.start()
+
+    # Submit records as fast as the display accepts them.
+    try:
+        for index, record in enumerate( records ):
+            slots.acquire()
+            pump.submit(
+                *record,
+                callback = functools.partial( complete, index )
+            )
+
+        # Wait for the records in flight.
+        for _ in range( capacity ):
+            slots.acquire()
+    finally:
+        if own_pump == True:
+            pump.stop()
+
+    return outcomes
+
+
+#=============================================================================
+def notify_stream( stream, title = 'Bugme!', flags = NIIF_USER,
+    capacity = 64, pump = None, backend = None ):
+    """
+    Displays a notification for each record of stream input.
+
+    Reading blocks while `capacity` records are in flight (leaving the rest
+    of the input with its producer), and returns at the end of the stream.
+
+    @param stream   An iterable of lines (e.g. `sys.stdin`)
+    @param title    The title for records that do not specify one
+    @param flags    The NIIF_* flags for records that do not specify them
+    @param capacity Maximum number of records in flight
+    @param pump     The pump that displays the balloons
+    @param backend  The backend for a pump started for the stream
+    @return         A Counter of outcomes (see `notify_records()`)
+    """
+    return notify_records(
+        read_records( stream, title, flags ),
+        capacity,
+        pump,
+        backend
+    )
+
+
+#-----------------------------------------------------------------------------
+# Notification Spool
+#-----------------------------------------------------------------------------
+
+# Spool file header: magic and generation (incremented by compaction)
+_SPOOL_HEADER = struct.Struct( '<8sQ' )
+_SPOOL_MAGIC  = b'BUGMESPL'
+
+# Spool record header (payload length and CRC-32), and payload prefix
+# (NIIF_* flags and title length)
+_SPOOL_RECORD  = struct.Struct( '<II' )
+_SPOOL_PAYLOAD = struct.Struct( '<IH' )
+
+# Spool checkpoint: generation, delivered offset, and CRC-32 of both
+_SPOOL_CHECKPOINT = struct.Struct( '<QQI' )
+
+# Largest payload accepted when reading (anything larger is corruption)
+SPOOL_MAX_RECORD = 64 * 1024
+
+
+#=============================================================================
+class Spool( object ):
+    """
+    Crash-safe, append-only journal of pending notifications.
+
+    Each record is a length-prefixed payload with a CRC-32, appended with a
+    single write so that a crash can only leave a torn record at the end of
+    the file.  Appends are synced to disk in batches (every `sync_every`
+    records or `sync_interval` seconds).  The delivery side reads records
+    through a memory map, and checkpoints the offset just past the last
+    delivered record in a separate file (replaced atomically).  Once the
+    delivered part of the journal passes `compact_threshold` bytes, the
+    undelivered records are copied to a new journal that replaces the old
+    one.
+
+    When a spool is opened, a torn record at the end of the journal is cut
+    off, and reading resumes from the checkpoint.  Delivery is at least
+    once: records displayed after the last checkpoint are displayed again.
+
+    A spool belongs to one process (its threads may append concurrently).
+
+        with Spool( 'alerts.spool' ) as spool:
+            spool.append( 'Build failed.' )
+            spool.deliver()
+    """
+
+
+    #=========================================================================
+    def __init__( self, path, sync_every = 64, sync_interval = 0.05,
+        compact_threshold = 16 * 1024 * 1024 ):
+        """
+        Opens (or creates) a spool.
+
+        @param path              The path of the journal (the checkpoint is
+                                 kept next to it)
+        @param sync_every        Number of appends between syncs
+        @param sync_interval     Maximum seconds between an append and its
+                                 sync
+        @param compact_threshold Delivered bytes that trigger compaction
+        """
+        self.path              = path
+        self.checkpoint_path   = path + '.offset'
+        self.sync_every        = sync_every
+        self.sync_interval     = sync_interval
+        self.compact_threshold = compact_threshold
+        self.generation        = 0
+        self.offset            = _SPOOL_HEADER.size
+        self.size              = _SPOOL_HEADER.size
+        self.base              = 0
+        self.appended          = 0
+        self.syncs             = 0
+        self.compactions       = 0
+        self._lock             = threading.Lock()
+        self._unsynced         = 0
+        self._synced_at        = time.monotonic()
+        self._descriptor       = None
+        self._open()
+
+
+    #=========================================================================
+    def __enter__( self ):
+        return self
+
+
+    #=========================================================================
+    def __exit__( self, exc_type, exc_value, traceback ):
+        self.close()
+
+
+    #=========================================================================
+    def close( self ):
+        """
+        Syncs and closes the journal.
+        """
+        with self._lock:
+            if self._descriptor is not None:
+                self._sync()
+                os.close( self._descriptor )
+                self._descriptor = None
+
+
+    #=========================================================================
+    def _open( self ):
+        """
+        Opens the journal, recovers its valid length, and its checkpoint.
+        """
+        descriptor = os.open(
+            self.path,
+            os.O_RDWR | os.O_CREAT | getattr( os, 'O_BINARY', 0 ),
+            0o644
+        )
+        try:
+            size = os.fstat( descriptor ).st_size
+
+            # Start a new journal (or replace one with a torn header).
+            header = os.read( descriptor, _SPOOL_HEADER.size )
+            if ( len( header ) < _SPOOL_HEADER.size ) or \
+                ( header[ : 8 ] != _SPOOL_MAGIC ):
+                if size > len( header ):
+                    raise ValueError( 'Not a spool: {}'.format( self.path ) )
+                os.ftruncate( descriptor, 0 )
+                os.lseek( descriptor, 0, os.SEEK_SET )
+                os.write( descriptor, _SPOOL_HEADER.pack( _SPOOL_MAGIC, 0 ) )
+                os.fsync( descriptor )
+                size = _SPOOL_HEADER.size
+            else:
+                self.generation = _SPOOL_HEADER.unpack( header )[ 1 ]
+
+            # Resume from the checkpoint (if it is for this journal).
+            self.offset = self._load_checkpoint()
+            if self.offset > size:
+                self.offset = _SPOOL_HEADER.size
+
+            # Cut off a torn record at the end.
+            end = self.offset
+            for end, _ in self._scan( descriptor, self.offset, size ):
+                pass
+            if end < size:
+                logging.warning( 'Discarding {} torn bytes from {}.'.format(
+                    size - end,
+                    self.path
+                ) )
+                os.ftruncate( descriptor, end )
+                os.fsync( descriptor )
+            self.size = end
+            os.lseek( descriptor, end, os.SEEK_SET )
+        except:
+            os.close( descriptor )
+            raise
+        self._descriptor = descriptor
+
+
+    #=========================================================================
+    def _load_checkpoint( self ):
+        """
+        Reads the checkpointed offset.
+
+        @return The offset just past the last delivered record
+        """
+        try:
+            with open( self.checkpoint_path, 'rb' ) as handle:
+                data = handle.read()
+        except OSError:
+            return _SPOOL_HEADER.size
+        if len( data ) != _SPOOL_CHECKPOINT.size:
+            return _SPOOL_HEADER.size
+        generation, offset, crc = _SPOOL_CHECKPOINT.unpack( data )
+        body = data[ : -4 ]
+        if ( zlib.crc32( body ) != crc ) or ( generation != self.generation ):
+            return _SPOOL_HEADER.size
+        return offset
+
+
+    #=========================================================================
+    def _store_checkpoint( self, offset ):
+        """
+        Replaces the checkpoint (atomically).
+
+        @param offset The offset just past the last delivered record
+        """
+        body = _SPOOL_CHECKPOINT.pack( self.generation, offset, 0 )[ : -4 ]
+        data = body + struct.pack( '<I', zlib.crc32( body ) )
+        temporary = self.checkpoint_path + '.tmp'
+        with open( temporary, 'wb' ) as handle:
+            handle.write( data )
+            handle.flush()
+            os.fsync( handle.fileno() )
+        os.replace( temporary, self.checkpoint_path )
+
+
+    #=========================================================================
+    @staticmethod
+    def encode( message, title = 'Bugme!', flags = NIIF_USER ):
+        """
+        Encodes a notification as a journal record.
+
+        @param message The message contents to display
+        @param title   The title of the message to display
+        @param flags   The NIIF_* flags for the balloon
+        @return        The record (header and payload)
+        """
+        title   = title.encode( 'utf-8' )
+        payload = _SPOOL_PAYLOAD.pack( flags, len( title ) ) + title + \
+            message.encode( 'utf-8' )
+        return _SPOOL_RECORD.pack(
+            len( payload ),
+            zlib.crc32( payload )
+        ) + payload
+
+
+    #=========================================================================
+    @staticmethod
+    def decode( data, offset, end ):
+        """
+        Decodes the journal record at an offset.
+
+        @param data   The journal contents (bytes or an mmap)
+        @param offset The offset of the record
+        @param end    The end of the valid data
+        @return       A `( next_offset, ( message, title, flags ) )` tuple,
+                      or None if the record is incomplete or corrupt
+        """
+        start = offset + _SPOOL_RECORD.size
+        if start > end:
+            return None
+        length, crc = _SPOOL_RECORD.unpack_from( data, offset )
+        stop = start + length
+        if ( length < _SPOOL_PAYLOAD.size ) or \
+            ( length > SPOOL_MAX_RECORD ) or ( stop > end ):
+            return None
+        payload = data[ start : stop ]
+        if zlib.crc32( payload ) != crc:
+            return None
+        flags, title_length = _SPOOL_PAYLOAD.unpack_from( payload, 0 )
+        title_end = _SPOOL_PAYLOAD.size + title_length
+        if title_end > length:
+            return None
+        return ( stop, (
+            payload[ title_end : ].decode( 'utf-8', 'replace' ),
+            payload[ _SPOOL_PAYLOAD.size : title_end ].decode(
+                'utf-8', 'replace'
+            ),
+            flags
+        ) )
+
+
+    #=========================================================================
+    def _scan( self, descriptor, offset, size ):
+        """
+        Reads valid records through a memory map.
+
+        @param descriptor The journal's file descriptor
+        @param offset     The offset of the first record
+        @param size       The size of the journal
+        @return           An iterator of `( next_offset, record )` tuples
+        """
+        if size <= offset:
+            return
+        with mmap.mmap( descriptor, size, access = mmap.ACCESS_READ ) as data:
+            decoded = Spool.decode( data, offset, size )
+            while decoded is not None:
+                yield decoded
+                decoded = Spool.decode( data, decoded[ 0 ], size )
+
+
+    #=========================================================================
+    def append( self, message, title = 'Bugme!', flags = NIIF_USER ):
+        """
+        Appends a notification to the journal (from any thread).
+
+        @param message The message contents to display
+        @param title   The title of the message to display
+        @param flags   The NIIF_* flags for the balloon
+        """
+        record = self.encode( message, title, flags )
+        with self._lock:
+            os.write( self._descriptor, record )
+            self.size      += len( record )
+            self.appended  += 1
+            self._unsynced += 1
+            if ( self._unsynced >= self.sync_every ) or \
+                ( ( time.monotonic() - self._synced_at ) >=
+                    self.sync_interval ):
+                self._sync()
+
+
+    #=========================================================================
+    def flush( self ):
+        """
+        Syncs appended records to disk.
+        """
+        with self._lock:
+            self._sync()
+
+
+    #=========================================================================
+    def _sync( self ):
+        """
+        Syncs appended records to disk (with the lock held).
+        """
+        if self._unsynced > 0:
+            os.fsync( self._descriptor )
+            self._unsynced = 0
+            self.syncs    += 1
+        self._synced_at = time.monotonic()
+
+
+    #=========================================================================
+    def read( self ):
+        """
+        Reads the undelivered records (as of the call).
+
+        Offsets are logical: they stay valid for `commit()` across
+        compactions (which move the records within the journal).
+
+        @return A list of `( next_offset, ( message, title, flags ) )`
+                tuples
+        """
+        with self._lock:
+            base = self.base
+            return [
+                ( end + base, record ) for end, record in
+                self._scan( self._descriptor, self.offset, self.size )
+            ]
+
+
+    #=========================================================================
+    def commit( self, offset ):
+        """
+        Checkpoints delivery up to an offset, compacting when due.
+
+        @param offset The (logical) offset just past the last delivered
+                      record
+        """
+        with self._lock:
+            offset -= self.base
+            if offset <= self.offset:
+                return
+            self.offset = offset
+            self._store_checkpoint( offset )
+            if ( offset - _SPOOL_HEADER.size ) >= self.compact_threshold:
+                self._compact()
+
+
+    #=========================================================================
+    def _compact( self ):
+        """
+        Replaces the journal with its undelivered records (with the lock
+        held).
+        """
+        generation = self.generation + 1
+        temporary  = self.path + '.tmp'
+
+        # Copy the undelivered records to a new journal.
+        os.lseek( self._descriptor, self.offset, os.SEEK_SET )
+        remaining = os.read( self._descriptor, self.size - self.offset )
+        with open( temporary, 'wb' ) as handle:
+            handle.write( _SPOOL_HEADER.pack( _SPOOL_MAGIC, generation ) )
+            handle.write( remaining )
+            handle.flush()
+            os.fsync( handle.fileno() )
+
+        # Replace the journal.  A crash before the new checkpoint is stored
+        # leaves a checkpoint for the old generation, which is ignored.
+        os.close( self._descriptor )
+        self._descriptor = None
+        os.replace( temporary, self.path )
+        self._descriptor = os.open(
+            self.path,
+            os.O_RDWR | getattr( os, 'O_BINARY', 0 )
+        )
+        os.lseek( self._descriptor, 0, os.SEEK_END )
+        self.generation   = generation
+        self.base        += self.offset - _SPOOL_HEADER.size
+        self.offset       = _SPOOL_HEADER.size
+        self.size         = _SPOOL_HEADER.size + len( remaining )
+        self.compactions += 1
+        self._store_checkpoint( self.offset )
+
+
+    #=========================================================================
+    def deliver( self, pump = None, backend = None, capacity = 64,
+        checkpoint_every = 64 ):
+        """
+        Displays the undelivered records, checkpointing as they complete.
+
+        @param pump             The pump that displays the balloons
+                                (defaults to a pump started for delivery)
+        @param backend          The backend for a pump started for delivery
+        @param capacity         Maximum number of records in flight
+        @param checkpoint_every Number of records between checkpoints
+        @return                 A Counter of outcomes (see
+                                `notify_records()`)
+        """
+        records   = self.read()
+        ends      = [ end for end, _ in records ]
+        done      = set()
+        delivered = [ self.offset + self.base, 0 ]
+
+        # Only advance past the contiguous prefix of displayed records
+        # (records complete out of order, and records that were not
+        # displayed complete with None).
+        def completed( index, outcome ):
+            if outcome is None:
+                return
+            done.add( ends[ index ] )
+            while ( delivered[ 1 ] < len( ends ) ) and \
+                ( ends[ delivered[ 1 ] ] in done ):
+                done.discard( ends[ delivered[ 1 ] ] )
+                delivered[ 0 ]  = ends[ delivered[ 1 ] ]
+                delivered[ 1 ] += 1
+
+        # Checkpoint from this thread while records are being submitted.
+        def display():
+            for index, ( _, record ) in enumerate( records ):
+                if ( index > 0 ) and ( ( index % checkpoint_every ) == 0 ):
+                    self.commit( delivered[ 0 ] )
+                yield record
+
+        try:
+            outcomes = notify_records(
+                display(),
+                capacity,
+                pump,
+                backend,
+                completed
+            )
+        finally:
+            self.commit( delivered[ 0 ] )
+        return outcomes
+
+
+#-----------------------------------------------------------------------------
+# Shared-Memory Ring Buffer
+#-----------------------------------------------------------------------------
+
+# Ring header: magic, lane count, slots per lane, and slot size
+_RING_HEADER = struct.Struct( '<8sIII4x' )
+_RING_MAGIC  = b'BUGMERNG'
+
+# Ring lane header: the next ticket of the lane's producer
+_RING_LANE = struct.Struct( '<Q' )
+
+# Ring slot: sequence, NIIF_* flags, and the title and message encoded as
+# UTF-16 to fit NOTIFYICONDATAW's szInfoTitle and szInfo fields (padded to 8
+# bytes)
+_RING_SLOT = struct.Struct( '<QI{}s{}s'.format(
+    NOTIFYICONDATAW.szInfoTitle.size,
+    NOTIFYICONDATAW.szInfo.size
+) )
+_RING_SLOT_SIZE = ( _RING_SLOT.size + 7 ) & ~7
+
+# Ring lock files opened by this process, mapping their paths to
+# `[ descriptor, set of locked offsets ]` (POSIX drops every lock a process
+# holds on a file when any of its descriptors for the file is closed, so
+# each lock file is opened once per process)
+_ring_locks      = {}
+_ring_locks_lock = threading.Lock()
+
+
+#=============================================================================
+class _FileLock( object ):
+    """
+    Exclusive lock on a file, shared by every process that opens it.
+    """
+
+
+    #=========================================================================
+    def __init__( self, path ):
+        self.handle = open( path, 'a+b' )
+        if sys.platform == 'win32':
+            import msvcrt
+            self._lock   = lambda: msvcrt.locking(
+                self.handle.fileno(), msvcrt.LK_LOCK, 1 )
+            self._unlock = lambda: msvcrt.locking(
+                self.handle.fileno(), msvcrt.LK_UNLCK, 1 )
+        else:
+            import fcntl
+            self._lock   = lambda: fcntl.flock(
+                self.handle.fileno(), fcntl.LOCK_EX )
+            self._unlock = lambda: fcntl.flock(
+                self.handle.fileno(), fcntl.LOCK_UN )
+
+
+    #=========================================================================
+    def __enter__( self ):
+        self._lock()
+        return self
+
+
+    #=========================================================================
+    def __exit__( self, exc_type, exc_value, traceback ):
+        self._unlock()
+
+
+    #=========================================================================
+    def close( self ):
+        self.handle.close()
+
+
+#=============================================================================
+def _lock_ring( path, offset ):
+    """
+    Locks one byte of a ring's lock file, without waiting.
+
+    The operating system releases a process's locks when the process exits,
+    however it exits, so a lock never outlives its owner.
+
+    @param path   The path to the lock file
+    @param offset The offset of the byte
+    @return       True if the byte was locked, False if it is held (by
+                  another process, or another ring in this one)
+    """
+    with _ring_locks_lock:
+        entry = _ring_locks.get( path )
+        if entry is None:
+            entry = [
+                os.open( path, os.O_RDWR | os.O_CREAT, 0o600 ),
+                set()
+            ]
+        elif offset in entry[ 1 ]:
+            return False
+        try:
+            if sys.platform == 'win32':
+                import msvcrt
+                os.lseek( entry[ 0 ], offset, os.SEEK_SET )
+                msvcrt.locking( entry[ 0 ], msvcrt.LK_NBLCK, 1 )
+            else:
+                import fcntl
+                fcntl.lockf( entry[ 0 ], fcntl.LOCK_EX | fcntl.LOCK_NB, 1,
+                    offset )
+        except OSError:
+            if len( entry[ 1 ] ) == 0:
+                os.close( entry[ 0 ] )
+            return False
+        entry[ 1 ].add( offset )
+        _ring_locks[ path ] = entry
+    return True
+
+
+#=============================================================================
+def _unlock_ring( path, offset ):
+    """
+    Unlocks one byte of a ring's lock file (closing the file once this
+    process holds no more locks on it).
+
+    @param path   The path to the lock file
+    @param offset The offset of the byte
+    """
+    with _ring_locks_lock:
+        entry = _ring_locks[ path ]
+        if sys.platform == 'win32':
+            import msvcrt
+            os.lseek( entry[ 0 ], offset, os.SEEK_SET )
+            msvcrt.locking( entry[ 0 ], msvcrt.LK_UNLCK, 1 )
+        else:
+            import fcntl
+            fcntl.lockf( entry[ 0 ], fcntl.LOCK_UN, 1, offset )
+        entry[ 1 ].discard( offset )
+        if len( entry[ 1 ] ) == 0:
+            os.close( entry[ 0 ] )
+            del _ring_locks[ path ]
+
+
+#=============================================================================
+class _RingSignal( object ):
+    """
+    Cross-process wakeup for a ring's consumer.
+
+    On Windows, this is a named auto-reset event.  Elsewhere, it is a FIFO
+    created by the consumer: producers write a byte to it, and the consumer
+    waits for the FIFO to become readable (then drains it).  A wakeup that
+    arrives before the consumer waits is kept, so none are lost.
+    """
+
+
+    #=========================================================================
+    def __init__( self, path, name, create = False ):
+        """
+        Creates or opens a ring's wakeup.
+
+        @param path   The path to the FIFO (not used on Windows)
+        @param name   The ring's name
+        @param create Set to create the wakeup (the consumer's role)
+        """
+        self.path   = path
+        self.create = create
+        self.handle = None
+        self.reader = None
+        self.writer = None
+        if sys.platform == 'win32':
+            self.handle = win32.CreateEventW(
+                None,
+                False,
+                False,
+                'Local\\bugme-ring-' + name
+            )
+            if not self.handle:
+                raise Win32Error(
+                    'Unable to create the ring\'s wakeup event.',
+                    'CreateEventW',
+                    ctypes.get_last_error()
+                )
+        elif create == True:
+
+            # Keep a writer open, so the FIFO never reads as closed.
+            os.mkfifo( path, 0o600 )
+            self.reader = os.open( path, os.O_RDONLY | os.O_NONBLOCK )
+            self.writer = os.open( path, os.O_WRONLY | os.O_NONBLOCK )
+        else:
+
+            # Without a consumer, there is no one to wake.
+            try:
+                self.writer = os.open( path, os.O_WRONLY | os.O_NONBLOCK )
+            except OSError:
+                pass
+
+
+    #=========================================================================
+    def notify( self ):
+        """
+        Wakes the consumer (producer side).
+        """
+        if self.handle is not None:
+            win32.SetEvent( self.handle )
+        elif self.writer is not None:
+
+            # A full FIFO already holds a wakeup.
+            try:
+                os.write( self.writer, b'\0' )
+            except ( BlockingIOError, BrokenPipeError ):
+                pass
+
+
+    #=========================================================================
+    def wait( self, timeout ):
+        """
+        Waits for a producer to notify (consumer side).
+
+        @param timeout Maximum seconds to wait
+        """
+        if self.handle is not None:
+            win32.WaitForSingleObject( self.handle, int( timeout * 1000 ) )
+            return
+        import select
+        readable, _, _ = select.select( [ self.reader ], [], [], timeout )
+        if len( readable ) > 0:
+            try:
+                while len( os.read( self.reader, 4096 ) ) == 4096:
+                    pass
+            except BlockingIOError:
+                pass
+
+
+    #=========================================================================
+    def close( self ):
+        """
+        Closes the wakeup (and removes the FIFO, for its creator).
+        """
+        if self.handle is not None:
+            win32.CloseHandle( self.handle )
+            self.handle = None
+        for descriptor in ( self.reader, self.writer ):
+            if descriptor is not None:
+                os.close( descriptor )
+        self.reader = None
+        self.writer = None
+        if ( self.create == True ) and ( sys.platform != 'win32' ):
+            try:
+                os.remove( self.path )
+            except FileNotFoundError:
+                pass
+
+
+#=============================================================================
+class SharedRing( object ):
+    """
+    Fixed-slot ring buffer in shared memory, for many producer processes
+    and one consumer.
+
+    The ring is a memory-mapped file (in /dev/shm, where it exists) divided
+    into lanes of slots.  Each producer owns a lane while it is attached, so
+    every lane has a single producer and a single consumer, and no slot is
+    ever claimed by two processes: CPython has no atomic operations on
+    shared memory, and the lanes make them unnecessary.  A producer copies
+    its notification into the next slot of its lane, publishes it by storing
+    the slot's sequence, and then wakes the consumer (see `_RingSignal`).
+    The consumer takes published slots from the lanes in turn, and frees
+    them by storing the sequence for the slot's next ticket.  (Sequences are
+    published after the data they cover, which relies on the platform not
+    reordering stores; this holds on x86.)
+
+    Lanes are owned by locking a byte of the ring's lock file, which the
+    operating system releases when a producer exits, however it exits.  A
+    producer that dies part way through a notification never publishes it,
+    so the consumer is not held up; the next producer to take the lane
+    reuses the slot.  Notifications are taken in order for each producer
+    (not across producers).
+
+    Each slot holds a sequence number, the balloon flags, and the title and
+    message encoded as UTF-16 to fit NOTIFYICONDATAW's szInfoTitle and
+    szInfo fields.
+
+        # consumer
+        with SharedRing( 'bugme', create = True ) as ring:
+            notify_records( ring.records() )
+
+        # producers
+        with SharedRing( 'bugme' ) as ring:
+            ring.put( 'Build failed.' )
+    """
+
+
+    #=========================================================================
+    def __init__( self, name, slots = 64, lanes = 16, create = False ):
+        """
+        Creates or attaches to a ring.
+
+        @param name   The name of the ring (its files' base name)
+        @param slots  The number of slots in each lane (when creating the
+                      ring)
+        @param lanes  The number of lanes, which limits the producers
+                      attached at once (when creating the ring)
+        @param create Set to create the ring (the consumer's role)
+        """
+        import tempfile
+
+        # The ring's files are removed by its creator when it closes.
+        directory   = '/dev/shm'
+        if os.path.isdir( directory ) == False:
+            directory = tempfile.gettempdir()
+        base        = os.path.join( directory, name )
+        self.name   = name
+        self.create = create
+        self.path   = base + '.ring'
+        self.locks  = base + '.lanes'
+        self.lane   = None
+        self.head   = 0
+        self.tails  = None
+        self.signal = None
+        self.map    = None
+        self._next  = 0
+        self._lock  = threading.Lock()
+        flags       = os.O_RDWR | getattr( os, 'O_BINARY', 0 )
+        try:
+            if create == True:
+
+                # Take the consumer's lock, replace a stale ring, and create
+                # the wakeup before the ring can be attached.
+                if _lock_ring( self.locks, 0 ) == False:
+                    self.create = False
+                    raise FileExistsError(
+                        'Ring {} already has a consumer.'.format( name ) )
+                for path in ( self.path, base + '.wake' ):
+                    try:
+                        os.remove( path )
+                    except FileNotFoundError:
+                        pass
+                self.signal = _RingSignal( base + '.wake', name, True )
+                size        = _RING_HEADER.size + ( lanes * (
+                    _RING_LANE.size + ( slots * _RING_SLOT_SIZE ) ) )
+                descriptor  = os.open( self.path,
+                    flags | os.O_CREAT | os.O_EXCL, 0o600 )
+                try:
+                    os.ftruncate( descriptor, size )
+                    self.map = mmap.mmap( descriptor, size )
+                finally:
+                    os.close( descriptor )
+
+                # Free every slot for its first ticket, then mark the ring
+                # ready.
+                self.lanes = lanes
+                self.slots = slots
+                for lane in range( lanes ):
+                    for ticket in range( slots ):
+                        struct.pack_into( '<Q', self.map,
+                            self._offset( lane, ticket ), ticket )
+                _RING_HEADER.pack_into( self.map, 0, _RING_MAGIC, lanes,
+                    slots, _RING_SLOT_SIZE )
+                self.tails = [ 0 ] * lanes
+                return
+
+            # Attach to the ring, and check that it is ready.
+            descriptor = os.open( self.path, flags )
+            try:
+                self.map = mmap.mmap( descriptor, 0 )
+            finally:
+                os.close( descriptor )
+            magic, lanes, slots, slot_size = _RING_HEADER.unpack_from(
+                self.map, 0 )
+            if ( magic != _RING_MAGIC ) or ( slot_size != _RING_SLOT_SIZE ):
+                raise ValueError( 'Not a bugme ring: {}'.format( name ) )
+            self.lanes  = lanes
+            self.slots  = slots
+            self.signal = _RingSignal( base + '.wake', name )
+
+            # Take a free lane.
+            for lane in range( lanes ):
+                if _lock_ring( self.locks, lane + 1 ) == True:
+                    self.lane = lane
+                    break
+            else:
+                raise RuntimeError(
+                    'Every lane of ring {} is taken.'.format( name ) )
+
+            # A producer that died between publishing a slot and advancing
+            # the lane left the slot's ticket used.
+            head     = _RING_LANE.unpack_from( self.map,
+                self._lane_offset( lane ) )[ 0 ]
+            sequence = struct.unpack_from( '<Q', self.map,
+                self._offset( lane, head ) )[ 0 ]
+            if sequence in ( head + 1, head + slots ):
+                head += 1
+            self.head = head
+        except:
+            self.close()
+            raise
+
+
+    #=========================================================================
+    def __enter__( self ):
+        return self
+
+
+    #=========================================================================
+    def __exit__( self, exc_type, exc_value, traceback ):
+        self.close()
+
+
+    #=========================================================================
+    def close( self ):
+        """
+        Detaches from the ring (and removes it, for its creator).
+        """
+        if self.lane is not None:
+            _unlock_ring( self.locks, self.lane + 1 )
+            self.lane = None
+        if self.signal is not None:
+            self.signal.close()
+            self.signal = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.create == True:
+
+            # The lock file is removed while it is still locked (where the
+            # platform allows it), so no other consumer can take it first.
+            for path in ( self.path, self.locks ):
+                try:
+                    os.remove( path )
+                except OSError:
+                    pass
+            _unlock_ring( self.locks, 0 )
+            try:
+                os.remove( self.locks )
+            except OSError:
+                pass
+            self.create = False
+
+
+    #=========================================================================
+    def _lane_offset( self, lane ):
+        """
+        Locates a lane.
+
+        @param lane The lane
+        @return     The offset of the lane's header
+        """
+        return _RING_HEADER.size + ( lane * (
+            _RING_LANE.size + ( self.slots * _RING_SLOT_SIZE ) ) )
+
+
+    #=========================================================================
+    def _offset( self, lane, ticket ):
+        """
+        Locates the slot for a ticket.
+
+        @param lane   The lane
+        @param ticket The ticket
+        @return       The offset of the slot
+        """
+        return self._lane_offset( lane ) + _RING_LANE.size + (
+            ( ticket % self.slots ) * _RING_SLOT_SIZE )
+
+
+    #=========================================================================
+    def put( self, message, title = 'Bugme!', flags = NIIF_USER,
+        timeout = None ):
+        """
+        Copies a notification into the ring (producer side).
+
+        @param message The message contents to display
+        @param title   The title of the message to display
+        @param flags   The NIIF_* flags for the balloon
+        @param timeout Seconds to wait for a free slot (None waits
+                       indefinitely, 0 does not wait)
+        @return        True if the notification was queued, False if the
+                       producer's lane stayed full
+        """
+        title    = encode_wide( title, NOTIFYICONDATAW.szInfoTitle.size // 2 )
+        message  = encode_wide( message, NOTIFYICONDATAW.szInfo.size // 2 )
+        buffer   = self.map
+        deadline = None
+        delay    = 0.0001
+        with self._lock:
+
+            # Wait for the consumer to free the slot.
+            ticket = self.head
+            offset = self._offset( self.lane, ticket )
+            while struct.unpack_from( '<Q', buffer, offset )[ 0 ] != ticket:
+                if timeout is not None:
+                    now = time.monotonic()
+                    if deadline is None:
+                        deadline = now + timeout
+                    if now >= deadline:
+                        return False
+                time.sleep( delay )
+                delay = min( delay * 2, 0.01 )
+
+            # Fill the slot, publish it, and then advance the lane.
+            _RING_SLOT.pack_into( buffer, offset, ticket, flags, title,
+                message )
+            struct.pack_into( '<Q', buffer, offset, ticket + 1 )
+            self.head = ticket + 1
+            _RING_LANE.pack_into( buffer, self._lane_offset( self.lane ),
+                self.head )
+        self.signal.notify()
+        return True
+
+
+    #=========================================================================
+    def get( self ):
+        """
+        Takes the next published notification (consumer side).
+
+        The lanes are visited in turn, so a busy producer does not hold up
+        the others.
+
+        @return A `( message, title, flags )` tuple, or None if no slot has
+                been published
+        """
+        for step in range( self.lanes ):
+            lane   = ( self._next + step ) % self.lanes
+            ticket = self.tails[ lane ]
+            offset = self._offset( lane, ticket )
+            sequence, flags, title, message = _RING_SLOT.unpack_from(
+                self.map,
+                offset
+            )
+            if sequence != ( ticket + 1 ):
+                continue
+
+            # Free the slot for the ticket that next uses it.
+            struct.pack_into( '<Q', self.map, offset, ticket + self.slots )
+            self.tails[ lane ] = ticket + 1
+            self._next         = lane + 1
+            return (
+                message.decode( 'utf-16-le', 'replace' ).split( '\0', 1 )[ 0 ],
+                title.decode( 'utf-16-le', 'replace' ).split( '\0', 1 )[ 0 ],
+                flags
+            )
+        return None
+
+
+    #=========================================================================
+    def records( self, interval = 0.05, stop = None ):
+        """
+        Takes notifications as they are published (consumer side).
+
+        While the ring is empty, the consumer sleeps until a producer wakes
+        it (or `interval` seconds pass, to check `stop`).
+
+        @param interval Maximum seconds between checks of `stop`
+        @param stop     A threading.Event that ends the iteration
+        @return         An iterator of `( message, title, flags )` tuples
+        """
+        while ( stop is None ) or ( stop.is_set() == False ):
+            record = self.get()
+            if record is not None:
+                yield record
+                continue
+            self.signal.wait( interval )
+
+
+#-----------------------------------------------------------------------------
+# Log File Following
+#-----------------------------------------------------------------------------
+
+#=============================================================================
+def compile_rules( rules ):
+    """
+    Compiles line-matching rules into a single combined pattern.
+
+    The rules become non-capturing alternatives, so one search finds a line
+    that matches any rule.  (Capturing groups would keep the regular
+    expression engine from skipping ahead to possible first characters,
+    which makes the search many times slower.)  The pattern matches bytes,
+    and `^` and `$` match at line boundaries.
+
+    @param rules A sequence of regular expressions (strings)
+    @return      The compiled pattern
+    """
+    if len( rules ) == 0:
+        raise ValueError( 'At least one rule is required.' )
+    alternatives = [ '(?:{})'.format( rule ) for rule in rules ]
+    return re.compile(
+        '|'.join( alternatives ).encode( 'utf-8' ),
+        re.MULTILINE
     )
 
-    # Register the window class.
-    class_atom = ctypes.windll.user32.RegisterClassExA(
-        ctypes.byref( window_class )
-    )
 
-    # Check class registration.
-    if class_atom == 0:
-        raise RuntimeError( 'Unable to register window class.' )
-
-    logging.debug( 'Window class registered.' )
-
-    # Set the window style flags.
-    WS_OVERLAPPED = 0x00000000
-    WS_SYSMENU    = 0x00080000
-    style = WS_OVERLAPPED | WS_SYSMENU
-
-    # Create the window that owns the notification.
-    window_handle = ctypes.windll.user32.CreateWindowExA(
-        0,                              # DWORD     dwExStyle
-        strarg( WINDOW_CLASS_NAME ),    # LPCTSTR   lpClassName
-        strarg( APPLICATION_NAME ),     # LPCTSTR   lpWindowName
-        style,                          # DWORD     dwStyle
-        0,                              # int       x
-        0,                              # int       y
-        CW_USEDEFAULT,                  # int       nWidth
-        CW_USEDEFAULT,                  # int       nHeight
-        0,                              # HWND      hWndParent
-        0,                              # HMENU     hMenu
-        module_handle,                  # HINSTANCE hInstance
-        None                            # LPVOID    lpParam
-    )
+#=============================================================================
+def scan_lines( pattern, data, start, end ):
+    """
+    Finds the lines of a buffer that match a combined pattern.
+
+    The buffer is searched as a whole, so lines without a match cost no
+    more than the pattern's scan over them.
+
+    @param pattern The combined pattern (see `compile_rules()`)
+    @param data    The buffer (bytes or an mmap)
+    @param start   The offset of the first line
+    @param end     The offset just past the last line's line ending
+    @return        An iterator of `( line_start, line_end )` tuples
+    """
+    search = pattern.search
+    match  = search( data, start, end )
+    while match is not None:
+
+        # Find the line containing the start of the match.
+        line_start = data.rfind( b'\n', start, match.start() ) + 1
+        if line_start == 0:
+            line_start = start
+        line_end = data.find( b'\n', match.start(), end )
+        if line_end < 0:
+            line_end = end
+
+        # Check the match against the line alone (rules cannot span lines).
+        if match.end() > line_end:
+            match = search( data, line_start, line_end )
+        if match is not None:
+            yield ( line_start, line_end )
+
+        match = search( data, line_end + 1, end )
+
+
+#=============================================================================
+class _FollowedFile( object ):
+    """
+    Read position in a followed log file.
+    """
+    __slots__ = ( 'path', 'title', 'handle', 'identity', 'offset' )
+
+
+    #=========================================================================
+    def __init__( self, path ):
+        self.path     = path
+        self.title    = os.path.basename( path )
+        self.handle   = None
+        self.identity = None
+        self.offset   = 0
+
+
+#=============================================================================
+class LogFollower( object ):
+    """
+    Follows log files, and turns lines that match rules into notifications.
+
+    Only bytes appended since the previous poll are read: small reads go
+    through the file object, and reads of at least `mmap_threshold` bytes
+    are scanned in place through a memory map.  Only complete lines are
+    consumed; a partial last line is read again once it is finished.
+
+    Replaced (rotated) files are read to their end, and then followed from
+    the start of the new file.  Files that shrink (are truncated) are
+    followed from their start.
+
+        with LogFollower( [ 'build.log' ], [ r'FAILED', r'error:' ] ) as f:
+            notify_records( f.follow() )
+    """
+
+    # Minimum number of new bytes that are scanned through a memory map
+    MMAP_THRESHOLD = 1024 * 1024
+
+
+    #=========================================================================
+    def __init__( self, paths, rules, flags = NIIF_USER,
+        from_start = False, mmap_threshold = MMAP_THRESHOLD ):
+        """
+        Initializes a log follower.
+
+        @param paths          The paths of the log files to follow
+        @param rules          Regular expressions for lines to notify about
+        @param flags          The NIIF_* flags for the notifications
+        @param from_start     Set to read existing lines (instead of only
+                              lines appended after the files are opened)
+        @param mmap_threshold Minimum number of bytes scanned through a
+                              memory map
+        """
+        self.pattern        = compile_rules( rules )
+        self.rules          = list( rules )
+        self.flags          = flags
+        self.mmap_threshold = mmap_threshold
+        self.files          = [ _FollowedFile( path ) for path in paths ]
+        self.bytes_read     = 0
+        self.lines_matched  = 0
+        for followed in self.files:
+            self._open( followed, from_start )
+
+
+    #=========================================================================
+    def __enter__( self ):
+        return self
+
+
+    #=========================================================================
+    def __exit__( self, exc_type, exc_value, traceback ):
+        self.close()
+
+
+    #=========================================================================
+    def close( self ):
+        """
+        Closes the followed files.
+        """
+        for followed in self.files:
+            if followed.handle is not None:
+                followed.handle.close()
+                followed.handle = None
+
 
-    # Check window creation.
-    if bool( window_handle ) == False:
-        raise RuntimeError( 'Unable to create window.' )
-    logging.debug( 'Window created.' )
+    #=========================================================================
+    def offsets( self ):
+        """
+        Reports the read position in each followed file.
 
-    # Load the icon into an icon instance.
-    try:
-        IMAGE_ICON      = 1
-        LR_LOADFROMFILE = 0x00000010
-        LR_DEFAULTSIZE  = 0x00000040
-        icon_handle     = ctypes.windll.user32.LoadImageA(
-            module_handle,
-            strarg( ICON_PATH ),
-            IMAGE_ICON,
-            0,
-            0,
-            ( LR_LOADFROMFILE | LR_DEFAULTSIZE )
-        )
-    except:
-        IDI_INFORMATION = 32516
-        icon_handle     = ctypes.windll.user32.LoadIconA( 0, IDI_INFORMATION )
-
-    # Check icon instance.
-    if bool( icon_handle ) == False:
-        raise RuntimeError( 'Unable to load icon.' )
-    logging.debug( 'Icon loaded.' )
-
-    # Set notification data field flags.
-    nid_flags = NIF_ICON | NIF_MESSAGE | NIF_TIP
-
-    # Define the notification data for the notification icon.
-    notify_data = NOTIFYICONDATA(
-        cbSize           = ctypes.sizeof( NOTIFYICONDATA ),
-        hWnd             = window_handle,
-        uFlags           = nid_flags,
-        uCallbackMessage = APPLICATION_MESSAGE_ID,
-        hIcon            = icon_handle,
-        szTip            = bytes( APPLICATION_NAME, 'ascii' )
-    )
+        @return A dictionary of offsets keyed by path
+        """
+        return { followed.path : followed.offset for followed in self.files }
 
-    # Add the notification item to the tray.
-    result = ctypes.windll.shell32.Shell_NotifyIconA(
-        NIM_ADD,
-        ctypes.byref( notify_data )
-    )
 
-    # Check notification item.
-    if bool( result ) == False:
-        raise RuntimeError( 'Unable to add notification icon.' )
-    logging.debug( 'Notification item added.' )
-
-    # Define the notification data to display a balloon message.
-    notify_data = NOTIFYICONDATA(
-        cbSize      = ctypes.sizeof( NOTIFYICONDATA ),
-        hWnd        = window_handle,
-        uFlags      = NIF_INFO,
-        hIcon       = icon_handle,
-        szInfo      = bytes( message, 'ascii' ),
-        szInfoTitle = bytes( title, 'ascii' ),
-        dwInfoFlags = NIIF_USER
-    )
+    #=========================================================================
+    def poll( self ):
+        """
+        Reads the lines appended to each file since the previous poll.
 
-    # Display the notification message for the tray item.
-    result = ctypes.windll.shell32.Shell_NotifyIconA(
-        NIM_MODIFY,
-        ctypes.byref( notify_data )
-    )
+        @return A list of `( message, title, flags )` tuples for the lines
+                that match a rule
+        """
+        records = []
+        for followed in self.files:
+            self._poll( followed, records )
+        return records
 
-    # Check notification message.
-    if bool( result ) == False:
-        raise RuntimeError( 'Unable to post notification message.' )
-    logging.debug( 'Notification message posted.' )
-
-    # Prepare for event-handling.
-    window_message         = ctypes.wintypes.MSG()
-    window_message_pointer = ctypes.pointer( window_message )
-    result = ctypes.windll.user32.GetMessageA(
-        window_message_pointer,
-        window_handle,
-        0,
-        0
-    )
 
-    # Enter event-handling loop.
-    while( result == True ):
-        ctypes.windll.user32.DispatchMessageA(
-            ctypes.byref( window_message )
+    #=========================================================================
+    def follow( self, interval = 0.5, stop = None ):
+        """
+        Polls the files until stopped.
+
+        @param interval Seconds to wait after a poll that found no lines
+        @param stop     A threading.Event that ends the iteration
+        @return         An iterator of `( message, title, flags )` tuples
+        """
+        while ( stop is None ) or ( stop.is_set() == False ):
+            records = self.poll()
+            if len( records ) == 0:
+                if stop is None:
+                    time.sleep( interval )
+                else:
+                    stop.wait( interval )
+            yield from records
+
+
+    #=========================================================================
+    def _open( self, followed, from_start ):
+        """
+        Opens a followed file (if it exists).
+
+        @param followed   The followed file
+        @param from_start Set to start at the beginning of the file
+        """
+        try:
+            handle = open( followed.path, 'rb' )
+        except OSError:
+            return
+        status            = os.fstat( handle.fileno() )
+        followed.handle   = handle
+        followed.identity = ( status.st_dev, status.st_ino )
+        followed.offset   = 0 if from_start == True else status.st_size
+
+
+    #=========================================================================
+    def _poll( self, followed, records ):
+        """
+        Reads the lines appended to a file.
+
+        @param followed The followed file
+        @param records  The list of notifications to extend
+        """
+
+        # Open files that did not exist yet.
+        if followed.handle is None:
+            self._open( followed, True )
+            if followed.handle is None:
+                return
+
+        # Check whether the path now names a different (rotated) file.
+        try:
+            status   = os.stat( followed.path )
+            identity = ( status.st_dev, status.st_ino )
+        except OSError:
+            identity = followed.identity
+        if identity != followed.identity:
+            self._read( followed, records, True )
+            followed.handle.close()
+            followed.handle = None
+            self._open( followed, True )
+            if followed.handle is None:
+                return
+
+        self._read( followed, records, False )
+
+
+    #=========================================================================
+    def _read( self, followed, records, final ):
+        """
+        Reads and scans the complete lines appended to an open file.
+
+        @param followed The followed file
+        @param records  The list of notifications to extend
+        @param final    Set to also consume a partial last line
+        """
+        size = os.fstat( followed.handle.fileno() ).st_size
+
+        # Start over when the file was truncated.
+        if size < followed.offset:
+            logging.debug( 'Log truncated: {}'.format( followed.path ) )
+            followed.offset = 0
+        length = size - followed.offset
+        if length <= 0:
+            return
+
+        # Scan large reads in place, and read small ones into memory.
+        if length >= self.mmap_threshold:
+            with mmap.mmap(
+                followed.handle.fileno(),
+                size,
+                access = mmap.ACCESS_READ
+            ) as data:
+                self._scan( followed, records, data, followed.offset, size,
+                    final )
+        else:
+            followed.handle.seek( followed.offset )
+            data = followed.handle.read( length )
+            self._scan( followed, records, data, 0, len( data ), final,
+                followed.offset )
+
+
+    #=========================================================================
+    def _scan( self, followed, records, data, start, end, final,
+        base = 0 ):
+        """
+        Scans the complete lines of a buffer, and advances the file offset.
+
+        @param followed The followed file
+        @param records  The list of notifications to extend
+        @param data     The buffer
+        @param start    The buffer offset of the first unread byte
+        @param end      The buffer offset just past the last read byte
+        @param final    Set to also consume a partial last line
+        @param base     The file offset of the start of the buffer
+        """
+
+        # Only consume complete lines (unless the file is finished).
+        if final == False:
+            end = data.rfind( b'\n', start, end ) + 1
+            if end <= start:
+                return
+
+        # Turn matching lines into notifications.
+        for line_start, line_end in scan_lines(
+            self.pattern, data, start, end ):
+            line = data[ line_start : line_end ].rstrip( b'\r' )
+            records.append( (
+                line.decode( 'utf-8', 'replace' ),
+                followed.title,
+                self.flags
+            ) )
+            self.lines_matched += 1
+
+        self.bytes_read += end - start
+        followed.offset  = base + end
+
+
+#-----------------------------------------------------------------------------
+# Logging Handler
+#-----------------------------------------------------------------------------
+
+# Queue overflow policies
+DROP_OLDEST = 'oldest'
+DROP_NEWEST = 'newest'
+
+
+#=============================================================================
+def level_flags( levelno ):
+    """
+    Maps a logging level to balloon icon flags.
+
+    @param levelno The logging level number
+    @return        The NIIF_* flags for the level
+    """
+    if levelno >= logging.ERROR:
+        return NIIF_ERROR
+    if levelno >= logging.WARNING:
+        return NIIF_WARNING
+    return NIIF_INFO
+
+
+#=============================================================================
+class BugmeHandler( logging.Handler ):
+    """
+    Logging handler that displays log records as notification balloons.
+
+    `emit()` only appends the record to a bounded queue, so logging never
+    waits on the shell or a message loop.  A worker thread owns a single
+    notifier (and tray icon), formats each record, and displays it.  When
+    the queue is full, either the oldest queued record or the new record is
+    dropped (see `policy`).  Closing the handler ends the balloon being
+    displayed, and drops the records still queued.
+
+    Records emitted on the worker thread (e.g. the notifier's own debug
+    logging) are ignored, so displaying a record never queues another.
+
+        logger.addHandler( BugmeHandler( level = logging.WARNING ) )
+    """
+
+
+    #=========================================================================
+    def __init__( self, level = logging.NOTSET, capacity = 64,
+        policy = DROP_OLDEST, title = None, backend = None,
+        icon_path = None ):
+        """
+        Initializes the handler, and starts its worker thread.
+
+        @param level     The handler's minimum logging level
+        @param capacity  Maximum number of queued records
+        @param policy    DROP_OLDEST or DROP_NEWEST
+        @param title     The balloon title (defaults to the record's level
+                         name)
+        @param backend   The shell/user32 backend (defaults to Win32)
+        @param icon_path The icon displayed in the tray
+        """
+        super().__init__( level )
+        if policy not in ( DROP_OLDEST, DROP_NEWEST ):
+            raise ValueError( 'Unknown policy: {}'.format( policy ) )
+        self.capacity  = capacity
+        self.policy    = policy
+        self.title     = title
+        self.backend   = default_backend() if backend is None else backend
+        self.icon_path = icon_path
+        self.delivered = 0
+        self.dropped   = 0
+        maxlen         = capacity if policy == DROP_OLDEST else None
+        self._queue    = collections.deque( maxlen = maxlen )
+        self._wake     = threading.Event()
+        self._stopping = False
+        self._window   = None
+        self._closing  = threading.Lock()
+        self._thread   = threading.Thread(
+            target = self._run,
+            name   = 'bugme-logging',
+            daemon = True
         )
-        result = ctypes.windll.user32.GetMessageA(
-            window_message_pointer,
-            window_handle,
-            0,
-            0
+        self._thread.start()
+
+
+    #=========================================================================
+    def emit( self, record ):
+        """
+        Queues a log record for display.
+
+        @param record The log record
+        """
+        if threading.get_ident() == self._thread.ident:
+            return
+        queue = self._queue
+        if len( queue ) >= self.capacity:
+            self.dropped += 1
+            if self.policy == DROP_NEWEST:
+                return
+        queue.append( record )
+        self._wake.set()
+
+
+    #=========================================================================
+    def close( self ):
+        """
+        Stops the worker thread, and removes its tray icon.
+
+        A balloon being displayed is abandoned (its wait is ended with
+        WM_QUIT) rather than waited for.
+        """
+        if self._stopping == False:
+            with self._closing:
+                self._stopping = True
+                if self._window is not None:
+                    self.backend.post_message( self._window, WM_QUIT )
+            self._wake.set()
+            self._thread.join()
+            self.dropped += len( self._queue )
+            self._queue.clear()
+        super().close()
+
+
+    #=========================================================================
+    def _run( self ):
+        """
+        Worker thread entry point.
+        """
+
+        # The notifier's window belongs to this thread.
+        try:
+            notifier = Notifier( self.backend, self.icon_path )
+            notifier.open()
+        except Exception:
+            logging.getLogger( __name__ ).exception(
+                'Unable to open logging notifier.'
+            )
+            return
+        with self._closing:
+            self._window = notifier.window_handle
+
+        # Display queued records until stopped.
+        queue = self._queue
+        try:
+            while self._stopping == False:
+                self._wake.wait()
+                self._wake.clear()
+                while ( len( queue ) > 0 ) and ( self._stopping == False ):
+                    self._display( notifier, queue.popleft() )
+        finally:
+            with self._closing:
+                self._window = None
+            notifier.close()
+
+
+    #=========================================================================
+    def _display( self, notifier, record ):
+        """
+        Displays a log record (on the worker thread).
+
+        @param notifier The worker's notifier
+        @param record   The log record
+        """
+        try:
+            title = record.levelname if self.title is None else self.title
+            notifier.notify(
+                self.format( record ),
+                title,
+                level_flags( record.levelno )
+            )
+            self.delivered += 1
+        except Exception:
+            self.handleError( record )
+
+
+#-----------------------------------------------------------------------------
+# Ingestion Server
+#-----------------------------------------------------------------------------
+
+# Syslog severities (0-7) mapped to balloon icon flags
+SYSLOG_FLAGS = ( NIIF_ERROR, ) * 4 + ( NIIF_WARNING, ) + ( NIIF_INFO, ) * 3
+
+# Default port for `--serve` (the unprivileged syslog alternative)
+SERVE_PORT = 5514
+
+
+#=============================================================================
+def parse_syslog( line, title = 'Bugme!' ):
+    """
+    Parses a syslog message into a notification.
+
+    RFC 5424 messages (`<PRI>1 TIMESTAMP HOST APP PROCID MSGID SD MSG`) are
+    split into their fields; the title is the APP-NAME (or HOSTNAME).  Other
+    messages that start with a priority (e.g. RFC 3164) keep the rest of the
+    line as the message.  The severity in the priority selects the icon.
+
+    @param line  The message (without its line ending)
+    @param title The title for messages that do not name an application
+    @return      A `( message, title, flags )` tuple, or None if the line
+                 is not a syslog message (or has no message)
+    """
+    end = line.find( '>', 1, 5 )
+    if ( end < 2 ) or ( line[ 0 ] != '<' ) or \
+        ( line[ 1 : end ].isdigit() == False ):
+        return None
+    flags = SYSLOG_FLAGS[ int( line[ 1 : end ] ) & 0x07 ]
+    rest  = line[ end + 1 : ]
+
+    # Split off the RFC 5424 header fields.
+    if rest.startswith( '1 ' ) == False:
+        return ( rest.strip(), title, flags )
+    fields = rest.split( ' ', 6 )
+    if len( fields ) < 7:
+        return ( rest.strip(), title, flags )
+    _, _, host, application, _, _, rest = fields
+    if application != '-':
+        title = application
+    elif host != '-':
+        title = host
+
+    # Skip the structured data ("-" or bracketed elements).
+    if rest.startswith( '-' ):
+        message = rest[ 2 : ]
+    else:
+        index   = 0
+        escaped = False
+        depth   = 0
+        for index, character in enumerate( rest ):
+            if escaped == True:
+                escaped = False
+            elif character == '\\':
+                escaped = True
+            elif character == '[':
+                depth += 1
+            elif character == ']':
+                depth -= 1
+            elif ( character == ' ' ) and ( depth == 0 ):
+                break
+        else:
+            index = len( rest )
+        message = rest[ index + 1 : ]
+    message = message.lstrip( '\ufeff' ).strip()
+    if len( message ) == 0:
+        return None
+    return ( message, title, flags )
+
+
+#=============================================================================
+def parse_message( line, title = 'Bugme!', flags = NIIF_USER ):
+    """
+    Parses a received line (syslog, or the stream line protocol).
+
+    @param line  The received line
+    @param title The title for messages that do not specify one
+    @param flags The NIIF_* flags for messages that do not specify them
+    @return      A `( message, title, flags )` tuple, or None for blank
+                 lines (and syslog messages without a message)
+    """
+    if line.startswith( '<' ):
+        end = line.find( '>', 1, 5 )
+        if ( end > 1 ) and line[ 1 : end ].isdigit():
+            return parse_syslog( line.rstrip( '\r\n' ), title )
+    return parse_record( line, title, flags )
+
+
+#=============================================================================
+class IngestServer( object ):
+    """
+    Local UDP and TCP server that turns received messages into
+    notifications.
+
+    Each UDP datagram, and each line received over TCP, is a syslog message
+    or a line of the stream protocol (see `parse_message()`).  Received
+    lines are parsed in batches (once per event loop iteration), limited
+    per source address by a token bucket, and displayed through a single
+    pump (and tray icon).  When `capacity` notifications are in flight,
+    UDP messages are dropped, and TCP connections stop being read.  With an
+    `Admission` controller, repeats received while notifications are in
+    flight are folded or suppressed, and titles can be rate limited.
+
+        server = IngestServer()
+        asyncio.run( server.serve() )
+    """
+
+
+    #=========================================================================
+    def __init__( self, host = '127.0.0.1', port = SERVE_PORT, rate = 1.0,
+        burst = 10, capacity = 256, title = 'Bugme!', pump = None,
+        backend = None, admission = None ):
+        """
+        Initializes a server (without starting it).
+
+        @param host      The address to listen on
+        @param port      The UDP and TCP port (0 picks free ports)
+        @param rate      Notifications per second allowed from each source
+        @param burst     Notifications allowed from a source at once
+        @param capacity  Maximum number of notifications in flight
+        @param title     The title for messages that do not specify one
+        @param pump      The pump that displays the balloons (defaults to a
+                         pump started with the server)
+        @param backend   The backend for a pump started with the server
+        @param admission Optional `Admission` controller for the accepted
+                         messages
+        """
+        self.host       = host
+        self.port       = port
+        self.rate       = rate
+        self.burst      = burst
+        self.capacity   = capacity
+        self.title      = title
+        self.pump       = pump
+        self.backend    = backend
+        self.admission  = admission
+        self.addresses  = {}
+        self.received   = 0
+        self.accepted   = 0
+        self.limited    = 0
+        self.dropped    = 0
+        self.completed  = 0
+        self._own_pump  = pump is None
+        self._buckets   = collections.OrderedDict()
+        self._batch     = []
+        self._flushing  = False
+        self._in_flight = 0
+        self._paused    = set()
+        self._loop      = None
+        self._servers   = []
+
+
+    #=========================================================================
+    async def start( self ):
+        """
+        Starts listening (and the pump, if the server owns it).
+        """
+        import asyncio
+        self._loop = asyncio.get_running_loop()
+        if self._own_pump == True:
+            self.pump = Pump( self.backend )
+            self.pump.start()
+        server = self
+
+        # Datagrams are single messages.
+        class Datagrams( asyncio.DatagramProtocol ):
+            def datagram_received( self, data, address ):
+                server.receive( data, address[ 0 ], True )
+
+        # Stream connections carry newline-delimited messages.
+        class Stream( asyncio.Protocol ):
+            def connection_made( self, transport ):
+                self.transport = transport
+                self.source    = transport.get_extra_info( 'peername' )[ 0 ]
+                self.partial   = b''
+            def data_received( self, data ):
+                data = self.partial + data
+                end  = data.rfind( b'\n' ) + 1
+                self.partial = data[ end : ]
+                for line in data[ : end ].splitlines():
+                    server.receive( line, self.source, False )
+                server.throttle( self.transport )
+            def eof_received( self ):
+                if len( self.partial ) > 0:
+                    server.receive( self.partial, self.source, False )
+                    self.partial = b''
+            def connection_lost( self, exc ):
+                server._paused.discard( self.transport )
+
+        transport, _ = await self._loop.create_datagram_endpoint(
+            Datagrams,
+            local_addr = ( self.host, self.port )
         )
+        self._servers.append( transport )
+        self.addresses[ 'udp' ] = transport.get_extra_info( 'sockname' )
+
+        # Let the socket absorb bursts between batches.
+        import socket
+        try:
+            transport.get_extra_info( 'socket' ).setsockopt(
+                socket.SOL_SOCKET,
+                socket.SO_RCVBUF,
+                4 * 1024 * 1024
+            )
+        except OSError:
+            pass
+        stream = await self._loop.create_server(
+            Stream,
+            self.host,
+            self.port
+        )
+        self._servers.append( stream )
+        self.addresses[ 'tcp' ] = stream.sockets[ 0 ].getsockname()
+
+
+    #=========================================================================
+    async def stop( self ):
+        """
+        Stops listening (and the pump, if the server owns it).
+        """
+        for server in self._servers:
+            server.close()
+        self._servers = []
+        if ( self._own_pump == True ) and ( self.pump is not None ):
+            self.pump.stop()
+            self.pump = None
+
+
+    #=========================================================================
+    async def serve( self ):
+        """
+        Runs the server until cancelled.
+        """
+        import asyncio
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+
+    #=========================================================================
+    def receive( self, data, source, datagram ):
+        """
+        Collects a received message for the next batch.
+
+        @param data     The message (bytes)
+        @param source   The sender's address
+        @param datagram Set for messages that may be dropped when busy
+        """
+        self.received += 1
+        if datagram and ( self._in_flight >= self.capacity ):
+            self.dropped += 1
+            return
+        self._batch.append( ( data, source ) )
+        if self._flushing == False:
+            self._flushing = True
+            self._loop.call_soon( self._flush )
+
+
+    #=========================================================================
+    def throttle( self, transport ):
+        """
+        Stops reading from a stream while too many notifications are in
+        flight.
+
+        @param transport The stream's transport
+        """
+        if self._in_flight >= self.capacity:
+            transport.pause_reading()
+            self._paused.add( transport )
+
+
+    #=========================================================================
+    def _flush( self ):
+        """
+        Parses and admits the batch of received messages.
+        """
+        batch, self._batch = self._batch, []
+        self._flushing     = False
+        title              = self.title
+        for data, source in batch:
+            record = parse_message( data.decode( 'utf-8', 'replace' ), title )
+            if record is None:
+                continue
+            if self._bucket( source ).take() == False:
+                self.limited += 1
+                continue
+            if self.admission is None:
+                self.accepted   += 1
+                self._in_flight += 1
+                self.pump.submit( *record, callback = self._completed )
+            elif self.admission.submit( *record ) == True:
+                self.accepted += 1
+        self._dispatch()
+
+
+    #=========================================================================
+    def _dispatch( self ):
+        """
+        Submits admitted notifications while there is room in flight.
+        """
+        if self.admission is None:
+            return
+        while self._in_flight < self.capacity:
+            record = self.admission.pop()
+            if record is None:
+                break
+            self._in_flight += 1
+            self.pump.submit( *record, callback = self._completed )
+
+
+    #=========================================================================
+    def _bucket( self, source ):
+        """
+        Finds the rate limiter for a source (remembering a bounded number of
+        sources).
+
+        @param source The sender's address
+        @return       The source's TokenBucket
+        """
+        bucket = self._buckets.get( source )
+        if bucket is None:
+            bucket = TokenBucket( self.rate, self.burst )
+            self._buckets[ source ] = bucket
+            if len( self._buckets ) > 4096:
+                self._buckets.popitem( last = False )
+        return bucket
+
+
+    #=========================================================================
+    def _completed( self, outcome ):
+        """
+        Notes a completed notification (on the pump thread).
+
+        @param outcome The notification's outcome
+        """
+        self._loop.call_soon_threadsafe( self._release )
+
+
+    #=========================================================================
+    def _release( self ):
+        """
+        Frees an in-flight slot, resuming paused streams.
+        """
+        self._in_flight -= 1
+        self.completed  += 1
+        self._dispatch()
+        if ( len( self._paused ) > 0 ) and \
+            ( self._in_flight < self.capacity ):
+            for transport in self._paused:
+                transport.resume_reading()
+            self._paused.clear()
 
-    logging.debug( 'Notification procedure complete.' )
 
-    # Return exit status.
-    return int( window_message.wParam )
+    #=========================================================================
+    def stats( self ):
+        """
+        Takes a snapshot of the server's counters.
+
+        @return A dictionary of counters
+        """
+        stats = {
+            'received'  : self.received,
+            'accepted'  : self.accepted,
+            'limited'   : self.limited,
+            'dropped'   : self.dropped,
+            'completed' : self.completed,
+            'in_flight' : self._in_flight
+        }
+        if self.admission is not None:
+            stats[ 'admission' ] = self.admission.stats()
+        return stats
 
 
 #=============================================================================
@@ -792,7 +8225,7 @@ def hello():
     MB_OK              = 0x00000000
     MB_ICONINFORMATION = 0x00000040
     IDOK               = 1
-    result = ctypes.windll.User32.MessageBoxW(
+    result = win32.MessageBoxW(
         None,
         'Hello World!',
         'Greetings',
@@ -841,6 +8274,128 @@ def main( argv ):
         help    = 'Test Win32 API linkage.',
         action  = 'store_true'
     )
+    parser.add_argument(
+        '-p',
+        '--profile',
+        default = False,
+        help    = 'Print per-phase timings and API errors when done.',
+        action  = 'store_true'
+    )
+    parser.add_argument(
+        '-m',
+        '--metrics',
+        default = None,
+        metavar = 'PATH',
+        help    = 'Write per-phase timings and API errors to a file (in the '
+                  'Prometheus text format) when done.'
+    )
+    parser.add_argument(
+        '-s',
+        '--stream',
+        default = False,
+        help    = 'Display a notification for each line of standard input '
+                  '(plain text, or JSON records with "message", "title", '
+                  'and "severity").',
+        action  = 'store_true'
+    )
+    parser.add_argument(
+        '-f',
+        '--follow',
+        default = None,
+        nargs   = '+',
+        metavar = 'PATH',
+        help    = 'Follow log files, and display a notification for each '
+                  'new line that matches a rule.'
+    )
+    parser.add_argument(
+        '-r',
+        '--rule',
+        default = [],
+        metavar = 'REGEX',
+        help    = 'A regular expression for log lines to notify about (may '
+                  'be repeated).',
+        action  = 'append'
+    )
+    parser.add_argument(
+        '--serve',
+        default = False,
+        help    = 'Display notifications for syslog and line protocol '
+                  'messages received on a local UDP and TCP port until '
+                  'interrupted.',
+        action  = 'store_true'
+    )
+    parser.add_argument(
+        '--port',
+        default = SERVE_PORT,
+        type    = int,
+        help    = 'The UDP and TCP port for --serve.'
+    )
+    parser.add_argument(
+        '--ring',
+        default = None,
+        metavar = 'NAME',
+        help    = 'Hand the notification to the process serving a shared '
+                  'memory ring (falls back to displaying it directly).'
+    )
+    parser.add_argument(
+        '--ring-serve',
+        default = None,
+        metavar = 'NAME',
+        help    = 'Create a shared memory ring, and display the '
+                  'notifications handed to it until interrupted.'
+    )
+    parser.add_argument(
+        '-a',
+        '--action',
+        default = None,
+        metavar = 'TARGET',
+        help    = 'A command line or URL to run or open when the '
+                  'notification is clicked.'
+    )
+    parser.add_argument(
+        '--digest',
+        default = None,
+        type    = float,
+        metavar = 'SECONDS',
+        help    = 'Summarize the notifications of --stream, --follow, and '
+                  '--ring-serve in one balloon (totals and the most '
+                  'frequent titles) per window of this many seconds.'
+    )
+    parser.add_argument(
+        '--dedupe',
+        default = None,
+        type    = float,
+        metavar = 'SECONDS',
+        help    = 'Fold repeated notifications of --stream, --follow, '
+                  '--serve, and --ring-serve into one balloon while it is '
+                  'pending, and suppress repeats for this many seconds '
+                  'after it is displayed.'
+    )
+    parser.add_argument(
+        '--title-rate',
+        default = None,
+        type    = float,
+        metavar = 'RATE',
+        help    = 'Drop the notifications of a title beyond this many per '
+                  'second (after a burst of 5) in --stream, --follow, '
+                  '--serve, and --ring-serve.'
+    )
+    parser.add_argument(
+        '--history',
+        default = False,
+        help    = 'Summarize the notification history (unacknowledged '
+                  'errors in the last hour, and click-through rates by '
+                  'title) and exit.',
+        action  = 'store_true'
+    )
+    parser.add_argument(
+        '--history-file',
+        default = os.environ.get( 'BUGME_HISTORY' ),
+        metavar = 'PATH',
+        help    = 'The notification history file, to which displayed '
+                  'notifications are added (defaults to the BUGME_HISTORY '
+                  'environment variable).'
+    )
     parser.add_argument(
         'message',
         nargs   = '?',
@@ -851,28 +8406,119 @@ def main( argv ):
         'title',
         nargs   = '?',
         default = 'Bugme!',
-        help    = 'The notification title to display.'
+        help    = 'The notification title to display (the default title '
+                  'in stream mode).'
     )
 
     # parse the arguments
     args = parser.parse_args( argv[ 1 : ] )
 
+    # set logging level
+    logging.basicConfig( level = logging.WARN )
+
+    # collect metrics for profiling
+    if ( args.profile == True ) or ( args.metrics is not None ):
+        metrics.enabled = True
+
+    # fold, suppress, and rate limit repeated notifications
+    admission = None
+    if ( args.dedupe is not None ) or ( args.title_rate is not None ):
+        admission = Admission(
+            window = 0.0 if args.dedupe is None else args.dedupe,
+            rate   = args.title_rate
+        )
+
+    # summarize record streams in windows (after admission)
+    if args.digest is not None:
+        summarize = Digest( args.digest ).records
+    else:
+        summarize = lambda records: records
+    if admission is not None:
+        digest = lambda records: summarize( admission.records( records ) )
+    else:
+        digest = summarize
+
     # check for API linkage test
     if args.win32 == True:
         hello()
         result = 0
 
+    # summarize the notification history
+    elif args.history == True:
+        if args.history_file is None:
+            parser.error( '--history requires --history-file (or '
+                'BUGME_HISTORY)' )
+        try:
+            print( format_history( History.load( args.history_file ) ) )
+        except FileNotFoundError:
+            print( format_history( History() ) )
+        result = 0
+
+    # display notifications for standard input until it ends
+    elif args.stream == True:
+        notify_records( digest( read_records( sys.stdin, args.title ) ) )
+        result = 0
+
+    # follow log files until interrupted
+    elif args.follow is not None:
+        if len( args.rule ) == 0:
+            parser.error( '--follow requires at least one --rule' )
+        with LogFollower( args.follow, args.rule ) as follower:
+            try:
+                notify_records( digest( follower.follow() ) )
+            except KeyboardInterrupt:
+                pass
+        result = 0
+
+    # serve local network messages until interrupted
+    elif args.serve == True:
+        import asyncio
+        server = IngestServer(
+            port      = args.port,
+            title     = args.title,
+            admission = admission
+        )
+        try:
+            asyncio.run( server.serve() )
+        except KeyboardInterrupt:
+            pass
+        result = 0
+
+    # serve a shared memory ring until interrupted
+    elif args.ring_serve is not None:
+        with SharedRing( args.ring_serve, create = True ) as ring:
+            try:
+                notify_records( digest( ring.records() ) )
+            except KeyboardInterrupt:
+                pass
+        result = 0
+
+    # hand the notification to a ring's server (if it is running)
+    elif args.ring is not None:
+        try:
+            with SharedRing( args.ring ) as ring:
+                queued = ring.put( args.message, args.title, timeout = 1.0 )
+        except ( FileNotFoundError, RuntimeError ):
+            queued = False
+        result = 0 if queued == True else notify( args.message, args.title )
+
     # run the notification function
     else:
-        result = notify( args.message, args.title )
-
-    #subject = '9B96F0A9-51AD-4031-9306-DEAA0272603F'
-    #tuid = uuid.UUID( subject )
-    #guid = GUID( subject )
-    #print( 's:', subject )
-    #print( 'e:', str( tuid ).upper() )
-    #print( 'a:', str( guid ) )
-    #print( 'self test:', guid._self_test() )
+        action = None if args.action is None else Action( args.action )
+        result = notify( args.message, args.title, action = action )
+
+    # let click actions finish
+    action_pool.shutdown()
+
+    # add the displayed notifications to the history file
+    if ( args.history_file is not None ) and ( len( notify_history ) > 0 ):
+        save_history( args.history_file )
+
+    # report the collected metrics
+    if args.profile == True:
+        print( metrics.format(), file = sys.stderr )
+    if args.metrics is not None:
+        metrics.write_prometheus( args.metrics )
 
     # return exit status
     return result
@@ -0,0 +1,15 @@
+#=============================================================================
+#
+# Bugme Tests
+#
+#=============================================================================
+
+"""
+Bugme Tests
+===========
+
+Regression tests for `misc/bugme.py` that run anywhere (using the in-memory
+backend in place of the Win32 API):
+
+    python -m pytest -q
+"""
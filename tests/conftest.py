@@ -0,0 +1,74 @@
+#=============================================================================
+#
+# Bugme Test Configuration
+#
+#=============================================================================
+
+"""
+Makes `misc/bugme.py` importable, and provides the shared fixtures.
+"""
+
+
+import os
+import sys
+
+import pytest
+
+
+# Directory containing the module under test
+script_dir = os.path.join(
+    os.path.dirname( os.path.dirname( os.path.realpath( __file__ ) ) ),
+    'misc'
+)
+if script_dir not in sys.path:
+    sys.path.insert( 0, script_dir )
+
+
+#=============================================================================
+class FakeClock( object ):
+    """
+    Time source that only moves when told to.
+    """
+
+
+    #=========================================================================
+    def __init__( self, now = 1000.0 ):
+        """
+        Initializes the clock.
+
+        @param now The initial time (seconds)
+        """
+        self.now = now
+
+
+    #=========================================================================
+    def __call__( self ):
+        return self.now
+
+
+    #=========================================================================
+    def advance( self, seconds ):
+        """
+        Moves the clock forward.
+
+        @param seconds The number of seconds to move
+        """
+        self.now += seconds
+
+
+#=============================================================================
+@pytest.fixture
+def clock():
+    """
+    Provides a fake clock (starting at 1000 seconds).
+    """
+    return FakeClock()
+
+
+#=============================================================================
+@pytest.fixture
+def memory_backend( monkeypatch ):
+    """
+    Selects the in-memory backend for the command-line interface.
+    """
+    monkeypatch.setenv( 'BUGME_BACKEND', 'memory' )
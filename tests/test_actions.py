@@ -0,0 +1,166 @@
+#=============================================================================
+#
+# Click Action Tests
+#
+#=============================================================================
+
+"""
+Tests of click actions, run when balloons on the in-memory backend are
+clicked.
+"""
+
+
+import sys
+import threading
+import time
+
+import bugme
+
+
+#=============================================================================
+def click( *actions, outcome = bugme.NIN_BALLOONUSERCLICK ):
+    """
+    Displays a balloon for each action, ending every balloon with the same
+    event, and waits for the actions that run.
+
+    @param actions The Actions of the balloons
+    @param outcome The balloon event that ends every balloon
+    @return        The ActionPool's results, in the order of `actions`
+    """
+    pool = bugme.ActionPool()
+    with bugme.Notifier( bugme.MemoryBackend( outcome = outcome ),
+        actions = pool ) as notifier:
+        for action in actions:
+            notifier.notify( 'Build failed.', action = action )
+    pool.shutdown()
+    return sorted( pool.results,
+        key = lambda result: actions.index( result.action ) )
+
+
+#=============================================================================
+def test_clicked_balloon_runs_its_action():
+    """
+    Clicking a balloon runs its action, and keeps the callable's result.
+    """
+    action     = bugme.Action( lambda: 'ok' )
+    [ result ] = click( action )
+    assert result.action is action
+    assert result.status == bugme.ACTION_DONE
+    assert result.value == 'ok'
+    assert result.error is None
+
+
+#=============================================================================
+def test_unclicked_balloon_runs_nothing():
+    """
+    Balloons that time out (or are hidden) do not run their actions.
+    """
+    called = []
+    action = bugme.Action( lambda: called.append( True ) )
+    assert click( action, outcome = bugme.NIN_BALLOONTIMEOUT ) == []
+    assert click( action, outcome = bugme.NIN_BALLOONHIDE ) == []
+    assert called == []
+
+
+#=============================================================================
+def test_command_output_is_captured():
+    """
+    A command's output is captured, and an error status fails the action.
+    """
+    done, failed = click(
+        bugme.Action( [ sys.executable, '-c', 'print( 42 )' ], 10.0 ),
+        bugme.Action( [ sys.executable, '-c', 'raise SystemExit( 3 )' ],
+            10.0 )
+    )
+    assert done.status == bugme.ACTION_DONE
+    assert done.value.stdout.strip() == b'42'
+    assert failed.status == bugme.ACTION_FAILED
+    assert failed.value.returncode == 3
+
+
+#=============================================================================
+def test_command_is_killed_at_its_timeout():
+    """
+    A command that overruns its timeout is killed.
+    """
+    [ result ] = click( bugme.Action(
+        [ sys.executable, '-c', 'import time; time.sleep( 30 )' ], 0.2 ) )
+    assert result.status == bugme.ACTION_TIMEOUT
+    assert isinstance( result.error, TimeoutError )
+    assert result.elapsed < 10.0
+
+
+#=============================================================================
+def test_url_is_abandoned_at_its_timeout( monkeypatch ):
+    """
+    A URL whose browser does not return within the timeout is reported as
+    timed out, without holding the worker.
+    """
+    import webbrowser
+    released = threading.Event()
+    def slow_open( url ):
+        return released.wait( 30.0 )
+    monkeypatch.setattr( webbrowser, 'open', slow_open )
+    [ result ] = click( bugme.Action( 'https://example.com/build', 0.2 ) )
+    released.set()
+    assert result.status == bugme.ACTION_TIMEOUT
+    assert isinstance( result.error, TimeoutError )
+    assert result.elapsed < 10.0
+
+
+#=============================================================================
+def test_callable_failures_and_overruns_are_reported():
+    """
+    A callable's exception fails the action, and a callable that overruns
+    its timeout is reported as timed out once it returns.
+    """
+    failed, late = click(
+        bugme.Action( lambda: 1 / 0 ),
+        bugme.Action( lambda: time.sleep( 0.3 ) or 'late', 0.1 )
+    )
+    assert failed.status == bugme.ACTION_FAILED
+    assert isinstance( failed.error, ZeroDivisionError )
+    assert late.status == bugme.ACTION_TIMEOUT
+    assert late.value == 'late'
+    assert late.elapsed >= 0.3
+
+
+#=============================================================================
+def test_slow_actions_do_not_stall_the_pump():
+    """
+    Clicked balloons are displayed without waiting for their actions, and
+    every action's result is kept.
+    """
+    count   = 16
+    delay   = 0.1
+    pool    = bugme.ActionPool( 4, count )
+    action  = bugme.Action( lambda: time.sleep( delay ) or 'ok' )
+    backend = bugme.MemoryBackend( outcome = bugme.NIN_BALLOONUSERCLICK )
+    with bugme.Notifier( backend, actions = pool ) as notifier:
+        start = time.monotonic()
+        for _ in range( count ):
+            notifier.notify( 'Build failed.', action = action )
+        elapsed = time.monotonic() - start
+    pool.shutdown()
+    assert elapsed < ( count * delay )
+    assert len( pool.results ) == count
+    assert all(
+        ( result.status == bugme.ACTION_DONE ) and ( result.value == 'ok' )
+        for result in pool.results
+    )
+
+
+#=============================================================================
+def test_full_pool_drops_actions():
+    """
+    Actions submitted beyond the workers and backlog are dropped.
+    """
+    released = threading.Event()
+    pool     = bugme.ActionPool( 1, 1 )
+    action   = bugme.Action( lambda: released.wait( 10.0 ) )
+    futures  = [ pool.submit( action ) for _ in range( 3 ) ]
+    released.set()
+    pool.shutdown()
+    assert futures[ 2 ] is None
+    assert ( pool.submitted, pool.dropped ) == ( 2, 1 )
+    assert len( pool.results ) == 2
@@ -0,0 +1,177 @@
+#=============================================================================
+#
+# Admission Control Tests
+#
+#=============================================================================
+
+"""
+Tests of duplicate suppression and per-title rate limiting, on a fake clock.
+"""
+
+
+import threading
+import time
+
+import bugme
+
+
+#=============================================================================
+def test_pending_repeats_are_folded( clock ):
+    """
+    Repeats of a pending notification are folded into it, and counted in
+    its message.
+    """
+    admission = bugme.Admission( rate = None, clock = clock )
+    assert admission.submit( 'Disk full.', 'storage' ) == True
+    for _ in range( 4 ):
+        clock.advance( 60.0 )
+        assert admission.submit( 'Disk full.', 'storage' ) == False
+    assert list( admission.drain() ) == [
+        ( 'Disk full. (×5)', 'storage', bugme.NIIF_USER )
+    ]
+
+
+#=============================================================================
+def test_displayed_repeats_are_suppressed( clock ):
+    """
+    Repeats are suppressed for the window after a notification is popped,
+    and admitted again after it.
+    """
+    admission = bugme.Admission( window = 10.0, rate = None, clock = clock )
+    admission.submit( 'Disk full.', 'storage' )
+    clock.advance( 30.0 )
+    assert admission.pop() == ( 'Disk full.', 'storage', bugme.NIIF_USER )
+    clock.advance( 9.5 )
+    assert admission.submit( 'Disk full.', 'storage' ) == False
+    assert admission.pop() is None
+    clock.advance( 1.0 )
+    assert admission.submit( 'Disk full.', 'storage' ) == True
+    assert admission.stats() == {
+        'submitted'  : 3,
+        'admitted'   : 2,
+        'suppressed' : 1,
+        'dropped'    : 0,
+        'pending'    : 1
+    }
+
+
+#=============================================================================
+def test_titles_are_rate_limited( clock ):
+    """
+    Each title has its own token bucket, refilled by the clock.
+    """
+    admission = bugme.Admission( rate = 1.0, burst = 2,
+        rates = { 'noisy' : ( 0.5, 1 ) }, clock = clock )
+    admitted  = [
+        admission.submit( 'Message {}'.format( index ), title )
+        for title in ( 'quiet', 'noisy' )
+        for index in range( 3 )
+    ]
+    assert admitted == [ True, True, False, True, False, False ]
+    clock.advance( 1.0 )
+    assert admission.submit( 'Message 3', 'quiet' ) == True
+    assert admission.submit( 'Message 3', 'noisy' ) == False
+    clock.advance( 1.0 )
+    assert admission.submit( 'Message 4', 'noisy' ) == True
+    assert admission.dropped == 4
+
+
+#=============================================================================
+def test_pending_entries_are_pinned( clock ):
+    """
+    Pending notifications are not evicted by the LRU cache, so a key is
+    never queued twice.
+    """
+    admission = bugme.Admission( capacity = 2, rate = None, clock = clock )
+    for index in range( 5 ):
+        admission.submit( 'Message {}'.format( index ) )
+    assert admission.submit( 'Message 0' ) == False
+    records = list( admission.drain() )
+    assert [ record[ 0 ] for record in records ] == [
+        'Message 0 (×2)', 'Message 1', 'Message 2', 'Message 3', 'Message 4'
+    ]
+
+    # Only the displayed notifications are evicted.
+    assert admission.submit( 'Message 4' ) == False
+    assert admission.submit( 'Message 0' ) == True
+
+
+#=============================================================================
+def test_concurrent_submits( clock ):
+    """
+    Threads submitting the same notifications queue each one once, and
+    count every submission.
+    """
+    admission = bugme.Admission( rate = None, clock = clock )
+    def submit():
+        for index in range( 2000 ):
+            admission.submit( 'Message {}'.format( index % 50 ) )
+    threads = [ threading.Thread( target = submit ) for _ in range( 8 ) ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    records = list( admission.drain() )
+    assert len( records ) == 50
+    assert sorted( record[ 0 ] for record in records ) == sorted(
+        'Message {} (×320)'.format( index ) for index in range( 50 )
+    )
+    stats = admission.stats()
+    assert stats[ 'submitted' ] == 16000
+    assert stats[ 'admitted' ] + stats[ 'suppressed' ] == 16000
+
+
+#=============================================================================
+def test_records_folds_behind_a_slow_consumer( clock ):
+    """
+    A stream of records is admitted in the background, folding repeats
+    while the consumer is behind.
+    """
+    admission = bugme.Admission( window = 0.0, rate = None, clock = clock )
+    source    = [ ( 'Disk full.', 'storage', bugme.NIIF_WARNING ) ] * 100
+    source   += [ ( 'Done.', 'storage', bugme.NIIF_INFO ) ]
+    resumed   = threading.Event()
+    def records():
+        yield source[ 0 ]
+        resumed.wait()
+        yield from source[ 1 : ]
+    stream = admission.records( records() )
+    first  = next( stream )
+    resumed.set()
+    while admission.stats()[ 'submitted' ] < len( source ):
+        time.sleep( 0.001 )
+    assert [ first ] + list( stream ) == [
+        ( 'Disk full.', 'storage', bugme.NIIF_WARNING ),
+        ( 'Disk full. (×99)', 'storage', bugme.NIIF_WARNING ),
+        ( 'Done.', 'storage', bugme.NIIF_INFO )
+    ]
+
+
+#=============================================================================
+def test_server_folds_repeats():
+    """
+    The ingest server folds repeats received while a notification is in
+    flight.
+    """
+    import asyncio
+    import socket
+    admission = bugme.Admission( rate = None )
+    server    = bugme.IngestServer( port = 0, rate = 1000.0, burst = 1000,
+        capacity = 1, backend = bugme.MemoryBackend( latency = 0.05 ),
+        admission = admission )
+    async def run():
+        await server.start()
+        try:
+            connection = socket.create_connection( server.addresses[ 'tcp' ] )
+            connection.sendall( b'Disk full.\n' * 20 )
+            connection.close()
+            while ( server.received < 20 ) or ( server._in_flight > 0 ):
+                await asyncio.sleep( 0.01 )
+        finally:
+            await server.stop()
+    asyncio.run( run() )
+    stats = server.stats()
+    assert stats[ 'received' ] == 20
+    assert stats[ 'completed' ] < 20
+    assert stats[ 'admission' ][ 'suppressed' ] == 20 - stats[ 'accepted' ]
+    assert stats[ 'completed' ] == stats[ 'accepted' ]
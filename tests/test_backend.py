@@ -0,0 +1,205 @@
+#=============================================================================
+#
+# Backend and Notifier Tests
+#
+#=============================================================================
+
+"""
+Tests of the in-memory backend's balloon lifecycle, and of the notification
+paths that run on it.
+"""
+
+
+import io
+import os
+import time
+
+import bugme
+
+
+#=============================================================================
+def test_notifier_releases_everything():
+    """
+    A notifier's window, class, icon, and tray item are released on close.
+    """
+    backend = bugme.MemoryBackend()
+    with bugme.Notifier( backend ) as notifier:
+        event = notifier.notify( 'Build failed.' )
+        assert len( backend.items ) == 1
+    assert event == bugme.NIN_BALLOONTIMEOUT
+    assert backend.items == {}
+    assert backend.windows == {}
+    assert backend.classes == {}
+    assert backend.icons == set()
+    assert backend.calls[ 'CreateWindowEx' ] == 1
+
+
+#=============================================================================
+def test_notifier_reuses_its_window():
+    """
+    A notifier sets up once, and only modifies its tray item per balloon.
+    """
+    backend = bugme.MemoryBackend()
+    with bugme.Notifier( backend ) as notifier:
+        for index in range( 10 ):
+            notifier.notify( 'Message {}'.format( index ) )
+    assert backend.calls[ 'CreateWindowEx' ] == 1
+    assert backend.calls[ 'RegisterClassEx' ] == 1
+    assert backend.calls[ 'LoadImage' ] == 1
+
+
+#=============================================================================
+def test_injected_outcome():
+    """
+    Every balloon ends with the backend's injected outcome.
+    """
+    backend  = bugme.MemoryBackend( outcome = bugme.NIN_BALLOONUSERCLICK )
+    outcomes = bugme.notify_many(
+        [ 'One', ( 'Two', 'Title' ), ( 'Three', 'Title', bugme.NIIF_ERROR ) ],
+        backend = backend
+    )
+    assert outcomes == [ bugme.OUTCOME_CLICKED ] * 3
+
+
+#=============================================================================
+def test_injected_latency():
+    """
+    A balloon stays displayed for the backend's injected latency.
+    """
+    backend = bugme.MemoryBackend( latency = 0.05 )
+    with bugme.Notifier( backend ) as notifier:
+        start = time.monotonic()
+        event = notifier.notify( 'Build failed.' )
+    assert event == bugme.NIN_BALLOONTIMEOUT
+    assert time.monotonic() - start >= 0.05
+
+
+#=============================================================================
+def test_replaced_balloon_is_hidden():
+    """
+    Replacing a displayed balloon hides it, and only the replacement's
+    outcome is reported.
+    """
+    backend = bugme.MemoryBackend( latency = 0.02 )
+    with bugme.Notifier( backend ) as notifier:
+        notifier.show( 'First' )
+        notifier.item.replace( 'Second' )
+        event = notifier.wait()
+    assert event == bugme.NIN_BALLOONTIMEOUT
+    assert notifier.item is None
+
+
+#=============================================================================
+def test_notify_one_shot():
+    """
+    A one-shot notification sets up and tears down everything.
+    """
+    backend = bugme.MemoryBackend()
+    assert bugme.notify( 'Build failed.', backend = backend ) == 0
+    assert backend.items == {}
+    assert backend.calls[ 'DestroyWindow' ] == 1
+
+
+#=============================================================================
+def test_main( memory_backend ):
+    """
+    The command-line interface runs on the in-memory backend.
+    """
+    assert bugme.main( [ 'bugme', 'Build failed.', 'Builds' ] ) == 0
+
+
+#=============================================================================
+def test_notify_stream():
+    """
+    Every record of stream input (plain text or JSON) is displayed.
+    """
+    lines = []
+    for index in range( 500 ):
+        if ( index % 2 ) == 0:
+            lines.append( 'Build {} finished.\n'.format( index ) )
+        else:
+            lines.append( '{{"message": "Build {} failed.", "severity": '
+                '"error"}}\n'.format( index ) )
+    outcomes = bugme.notify_stream(
+        io.StringIO( ''.join( lines ) ),
+        capacity = 8,
+        backend  = bugme.MemoryBackend()
+    )
+    assert outcomes == { bugme.OUTCOME_TIMEOUT : 500 }
+
+
+#=============================================================================
+def test_combined_rules_match_like_separate_rules():
+    """
+    The combined rule pattern matches the same lines as the rules do one at
+    a time.
+    """
+    import re
+    rules   = [ r'status E{:04d}$'.format( index ) for index in range( 40 ) ]
+    lines   = [
+        'request {} finished with status E{:04d}'.format( index, index % 97 )
+        for index in range( 2000 )
+    ]
+    data    = ( '\n'.join( lines ) + '\n' ).encode( 'utf-8' )
+    pattern = bugme.compile_rules( rules )
+    found   = sum( 1 for _ in bugme.scan_lines( pattern, data, 0,
+        len( data ) ) )
+    assert found == sum(
+        1 for line in lines
+        if any( re.search( rule, line ) for rule in rules )
+    )
+
+
+#=============================================================================
+def test_follow_reads_new_lines( tmp_path ):
+    """
+    A followed log is read incrementally, through buffered and mapped
+    reads.
+    """
+    path = os.path.join( str( tmp_path ), 'build.log' )
+    open( path, 'wb' ).close()
+    for threshold in ( 1 << 30, 1 ):
+        follower = bugme.LogFollower( [ path ], [ r'failed' ],
+            mmap_threshold = threshold )
+        with open( path, 'ab', buffering = 0 ) as log:
+            log.write( b'build 1 failed\nbuild 2 passed\n' )
+            first = follower.poll()
+            log.write( b'build 3 failed\n' )
+            second = follower.poll()
+        follower.close()
+        assert [ record[ 0 ] for record in first ] == [ 'build 1 failed' ]
+        assert [ record[ 0 ] for record in second ] == [ 'build 3 failed' ]
+        open( path, 'wb' ).close()
+
+
+#=============================================================================
+def test_pump_items_from_many_threads():
+    """
+    Producer threads sharing one pump each get every outcome for their own
+    tray item.
+    """
+    import threading
+    outcomes = []
+    lock     = threading.Lock()
+    def callback( outcome ):
+        with lock:
+            outcomes.append( outcome )
+    with bugme.Pump( bugme.MemoryBackend() ) as pump:
+        for uid in range( 1, 4 ):
+            pump.add_item( uid )
+        def produce( uid ):
+            for index in range( 100 ):
+                pump.submit( 'Message {}'.format( index ), callback = callback,
+                    uid = uid )
+        threads = [
+            threading.Thread( target = produce, args = ( uid, ) )
+            for uid in range( 4 )
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        deadline = time.monotonic() + 10.0
+        while ( len( outcomes ) < 400 ) and ( time.monotonic() < deadline ):
+            time.sleep( 0.01 )
+    assert outcomes == [ bugme.OUTCOME_TIMEOUT ] * 400
@@ -0,0 +1,157 @@
+#=============================================================================
+#
+# Digest Mode Tests
+#
+#=============================================================================
+
+"""
+Tests of the windowed digest and its count-min sketch and distinct-count
+estimator.
+"""
+
+
+import collections
+import random
+
+import bugme
+
+
+#=============================================================================
+def heavy_stream( distinct = 20000, heavy = 8, seed = 2024 ):
+    """
+    Builds a stream of distinct titles with a few heavy hitters mixed in.
+
+    @param distinct The number of titles seen only once
+    @param heavy    The number of heavy hitters (the i-th seen 60 * (i + 1)
+                    times)
+    @param seed     The seed of the shuffle
+    @return         A list of titles
+    """
+    generator = random.Random( seed )
+    titles    = [ 'host-{}'.format( index ) for index in range( distinct ) ]
+    for index in range( heavy ):
+        titles.extend( [ 'db-{:02}'.format( index ) ] * 60 * ( index + 1 ) )
+    generator.shuffle( titles )
+    return titles
+
+
+#=============================================================================
+def test_estimates_never_fall_below_the_true_counts():
+    """
+    Every count-min estimate is at least the key's true count, even in a
+    sketch too narrow for its keys.
+    """
+    generator = random.Random( 7 )
+    sketch    = bugme.CountMinSketch( width = 64, depth = 3 )
+    exact     = collections.Counter()
+    for _ in range( 5000 ):
+        key    = 'key-{}'.format( int( generator.paretovariate( 1.0 ) ) )
+        count  = generator.randint( 1, 3 )
+        exact[ key ] += count
+        assert sketch.add( key, count ) >= exact[ key ]
+    assert sketch.total == sum( exact.values() )
+    assert all( sketch.estimate( key ) >= exact[ key ] for key in exact )
+    sketch.clear()
+    assert ( sketch.total, sketch.estimate( 'key-1' ) ) == ( 0, 0 )
+
+
+#=============================================================================
+def test_distinct_keys_are_estimated():
+    """
+    The distinct-count estimate is near the true count, whether the keys
+    fill a few registers or all of them, and repeats do not change it.
+    """
+    estimator = bugme.HyperLogLog()
+    assert len( estimator ) == 0
+    for index in range( 100 ):
+        estimator.add( 'host-{}'.format( index ) )
+        estimator.add( 'host-{}'.format( index ) )
+    assert 85 <= len( estimator ) <= 115
+    for index in range( 100, 20000 ):
+        estimator.add( 'host-{}'.format( index ) )
+    assert 16000 <= len( estimator ) <= 24000
+    estimator.clear()
+    assert len( estimator ) == 0
+
+
+#=============================================================================
+def test_heavy_hitters_survive_many_distinct_titles():
+    """
+    Among 20,000 titles seen once, the titles seen hundreds of times are
+    the ones tracked and listed (most frequent first), with counts no
+    lower than their true counts.
+    """
+    titles = heavy_stream()
+    exact  = collections.Counter( titles )
+    heavy  = [ 'db-{:02}'.format( index ) for index in range( 7, -1, -1 ) ]
+    digest = bugme.Digest( top = 8 )
+    for title in titles:
+        digest.add( 'Disk full.', title, bugme.NIIF_WARNING )
+    assert set( digest._counts ) == set( heavy )
+    message, title, flags = digest.flush()
+    lines = message.splitlines()
+    assert [ line.split()[ 1 ] for line in lines[ 1 : 9 ] ] == heavy
+    assert all(
+        int( line.split()[ 0 ] ) >= exact[ line.split()[ 1 ] ]
+        for line in lines[ 1 : 9 ]
+    )
+    assert lines[ -1 ].startswith( '+' ) and lines[ -1 ].endswith( ' more' )
+
+
+#=============================================================================
+def test_totals_by_severity():
+    """
+    The first line totals the messages, errors, and warnings (ignoring the
+    modifier flags), and the balloon takes the most severe icon seen.
+    """
+    digest = bugme.Digest()
+    for flags, count in (
+        ( bugme.NIIF_ERROR, 2 ),
+        ( bugme.NIIF_ERROR | bugme.NIIF_NOSOUND, 1 ),
+        ( bugme.NIIF_WARNING, 1 ),
+        ( bugme.NIIF_INFO, 4 ),
+        ( bugme.NIIF_NONE, 1 )
+    ):
+        for _ in range( count ):
+            digest.add( 'Build failed.', 'Build', flags )
+    message, title, flags = digest.flush()
+    assert message.splitlines()[ 0 ] == '9 messages: 3 errors, 1 warning'
+    assert flags == bugme.NIIF_ERROR
+
+    digest.add( 'Tests passed.', 'Tests', bugme.NIIF_INFO )
+    message, title, flags = digest.flush()
+    assert message.splitlines() == [ '1 message', '1  Tests' ]
+    assert flags == bugme.NIIF_INFO
+
+
+#=============================================================================
+def test_window_flushes_to_one_summary( clock ):
+    """
+    A window of many notifications is flushed to one summary that fits the
+    balloon, titled with the window's length, and the next window starts
+    empty.
+    """
+    digest = bugme.Digest( window = 60.0, top = 32, clock = clock )
+    for index in range( 5000 ):
+        digest.add( 'Disk full.', 'web-{:03}-{}'.format( index % 400,
+            'x' * 40 ), bugme.NIIF_WARNING )
+    clock.advance( 60.0 )
+    message, title, flags = digest.flush()
+    assert len( message ) < bugme.NOTIFYICONDATAW.INFO_SIZE
+    assert len( title ) < bugme.NOTIFYICONDATAW.TITLE_SIZE
+    assert title == 'Digest (60s)'
+    assert flags == bugme.NIIF_WARNING
+    assert ( len( digest ), digest.windows ) == ( 0, 1 )
+    assert digest.flush() is None
+    assert digest.windows == 1
+
+    # A stream that ends within its first window is summarized once.
+    records   = [
+        ( 'Disk full.', 'db-{:02}'.format( index % 50 ), bugme.NIIF_ERROR )
+        for index in range( 1000 )
+    ]
+    summaries = list( digest.records( records ) )
+    assert len( summaries ) == 1
+    assert summaries[ 0 ][ 0 ].startswith( '1000 messages: 1000 errors\n' )
+    assert len( summaries[ 0 ][ 0 ] ) < bugme.NOTIFYICONDATAW.INFO_SIZE
+    assert digest.windows == 2
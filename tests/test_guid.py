@@ -0,0 +1,112 @@
+#=============================================================================
+#
+# GUID Tests
+#
+#=============================================================================
+
+"""
+Property tests of GUID conversions against the `uuid` module.
+"""
+
+
+import random
+import uuid
+
+import pytest
+
+import bugme
+
+
+# Random UUIDs (reproducible) pushed through every conversion
+generator = random.Random( 7 )
+values    = [
+    uuid.UUID( int = generator.getrandbits( 128 ) ) for _ in range( 500 )
+] + [ uuid.UUID( int = 0 ), uuid.UUID( int = ( 1 << 128 ) - 1 ) ]
+
+
+#=============================================================================
+@pytest.mark.parametrize( 'form', [
+    lambda value: str( value ).upper(),
+    lambda value: str( value ),
+    lambda value: value.hex,
+    lambda value: value.urn,
+    lambda value: '{' + str( value ).upper() + '}'
+], ids = [ 'upper', 'lower', 'hex', 'urn', 'braces' ] )
+def test_parse( form ):
+    """
+    Every accepted string form parses to the UUID's in-memory bytes, and
+    formats back to the canonical string.
+    """
+    for value in values:
+        string = form( value )
+        assert bugme.GUID.parse( string ) == value.bytes_le
+        for guid in ( bugme.GUID( string ), bugme.GUID.from_string( string ) ):
+            assert str( guid ) == str( value ).upper()
+            assert guid.to_uuid() == value
+
+
+#=============================================================================
+def test_bytes_le_round_trip():
+    """
+    The in-memory and string-order bytes round-trip, and match the fields.
+    """
+    for value in values:
+        guid = bugme.GUID.from_bytes_le( value.bytes_le )
+        assert guid.to_bytes_le() == value.bytes_le
+        assert guid.to_bytes() == value.bytes
+        assert ( guid.Data1, guid.Data2, guid.Data3 ) == value.fields[ : 3 ]
+        assert bytes( guid.Data4 ) == value.bytes[ 8 : ]
+
+
+#=============================================================================
+def test_uuid_round_trip():
+    """
+    UUIDs convert to GUIDs and back unchanged.
+    """
+    for value in values:
+        guid = bugme.GUID.from_uuid( value )
+        assert guid.to_uuid() == value
+        assert bugme.GUID( str( guid ) ).to_bytes_le() == value.bytes_le
+
+
+#=============================================================================
+def test_load_from_string():
+    """
+    Loading a string overwrites an existing GUID.
+    """
+    guid = bugme.GUID( str( values[ 0 ] ) )
+    guid.load_from_string( str( values[ 1 ] ) )
+    assert guid.to_uuid() == values[ 1 ]
+
+
+#=============================================================================
+def test_guid_array():
+    """
+    Many strings convert into an array in one move, and a short array is
+    refused.
+    """
+    array = bugme.guid_array( str( value ) for value in values )
+    assert [ guid.to_uuid() for guid in array ] == values
+    with pytest.raises( ValueError ):
+        bugme.guid_array(
+            [ str( value ) for value in values ],
+            ( bugme.GUID * 2 )()
+        )
+
+
+#=============================================================================
+@pytest.mark.parametrize( 'string', [
+    '',
+    '9B96F0A9-51AD-4031-9306-DEAA0272603',
+    '9B96F0A9-51AD-4031-9306-DEAA0272603F0',
+    '{9B96F0A9-51AD-4031-9306-DEAA0272603}',
+    '9B96F0A9-51AD-4031-9306-DEAA0272603G'
+] )
+def test_bad_strings( string ):
+    """
+    Malformed strings are refused like `uuid.UUID()` refuses them.
+    """
+    with pytest.raises( ValueError ):
+        uuid.UUID( string )
+    with pytest.raises( ValueError ):
+        bugme.GUID.parse( string )
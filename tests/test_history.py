@@ -0,0 +1,217 @@
+#=============================================================================
+#
+# Notification History Tests
+#
+#=============================================================================
+
+"""
+Tests of the notification history, its queries, and its file.
+"""
+
+
+import os
+
+import pytest
+
+import bugme
+
+
+#=============================================================================
+def test_titles_with_nuls_round_trip( tmp_path ):
+    """
+    Titles may contain any character (including NULs) without corrupting
+    the titles stored after them.
+    """
+    path    = os.fspath( tmp_path / 'history' )
+    history = bugme.History( 8 )
+    titles  = [ 'Build\0failed', '', 'Tests ✓', 'Deploy\0\0' ]
+    for index, title in enumerate( titles ):
+        history.record( title, bugme.NIIF_ERROR, when = float( index ) )
+    history.save( path )
+    loaded  = bugme.History.load( path )
+    assert [ record.title for record in loaded.records() ] == titles
+    assert [ record.time for record in loaded.records() ] == [
+        0.0, 1.0, 2.0, 3.0
+    ]
+    assert loaded.record( 'Tests ✓', bugme.NIIF_INFO ) == 4
+    assert len( loaded._titles ) == len( titles )
+
+
+#=============================================================================
+def test_saving_again_adds_only_new_balloons( tmp_path ):
+    """
+    Each save adds only the balloons recorded since the last one.
+    """
+    path    = os.fspath( tmp_path / 'history' )
+    history = bugme.History( 8 )
+    history.record( 'First', when = 1.0 )
+    history.record( 'Second', when = 2.0 )
+    bugme.save_history( path, history )
+    bugme.save_history( path, history )
+    assert [ record.title for record in bugme.History.load( path ).records()
+        ] == [ 'First', 'Second' ]
+    history.record( 'Third', when = 3.0 )
+    bugme.save_history( path, history )
+    bugme.save_history( path, history )
+    assert [ record.title for record in bugme.History.load( path ).records()
+        ] == [ 'First', 'Second', 'Third' ]
+    assert history.saved == 3
+
+
+#=============================================================================
+def test_files_in_the_old_format_are_rejected( tmp_path ):
+    """
+    History files whose titles were joined with NULs are not misread.
+    """
+    path = tmp_path / 'history'
+    path.write_bytes( bugme._HISTORY_HEADER.pack( b'BUGMEHST', 8, 0, 0 ) )
+    with pytest.raises( ValueError ):
+        bugme.History.load( os.fspath( path ) )
+
+
+#=============================================================================
+def test_histories_sharing_a_file_are_merged_by_time( tmp_path ):
+    """
+    Balloons saved by histories whose times interleave are stored in time
+    order, so queries for recent balloons find all of them.
+    """
+    path  = os.fspath( tmp_path / 'history' )
+    later = bugme.History( 8 )
+    later.record( 'Deploy failed', bugme.NIIF_ERROR, when = 200.0 )
+    bugme.save_history( path, later )
+    early = bugme.History( 8 )
+    for when in ( 100.0, 110.0, 120.0, 130.0 ):
+        early.record( 'Build', bugme.NIIF_INFO, when = when )
+    early.record( 'Tests failed', bugme.NIIF_ERROR, when = 210.0 )
+    bugme.save_history( path, early )
+    stored = bugme.History.load( path )
+    assert [ record.time for record in stored.records() ] == [
+        100.0, 110.0, 120.0, 130.0, 200.0, 210.0
+    ]
+    assert [ record.title for record in stored.records( since = 150.0 )
+        ] == [ 'Deploy failed', 'Tests failed' ]
+    assert [ record.title for record in stored.unacknowledged(
+        100.0, now = 250.0 ) ] == [ 'Tests failed', 'Deploy failed' ]
+
+
+#=============================================================================
+def sample_history():
+    """
+    Builds a history of build and deploy balloons, one per minute from
+    t=0, some of them clicked.
+
+    @return The History
+    """
+    history = bugme.History( 16 )
+    for when, title, flags, outcome in (
+        ( 0.0, 'Build', bugme.NIIF_ERROR, bugme.OUTCOME_CLICKED ),
+        ( 60.0, 'Build', bugme.NIIF_ERROR, bugme.OUTCOME_TIMEOUT ),
+        ( 120.0, 'Deploy', bugme.NIIF_WARNING, bugme.OUTCOME_TIMEOUT ),
+        ( 180.0, 'Build', bugme.NIIF_ERROR, bugme.OUTCOME_HIDDEN ),
+        ( 240.0, 'Deploy', bugme.NIIF_ERROR, bugme.OUTCOME_CLICKED ),
+        ( 300.0, 'Build', bugme.NIIF_ERROR, None )
+    ):
+        history.record( title, flags, outcome, when )
+    return history
+
+
+#=============================================================================
+def test_unacknowledged_errors():
+    """
+    Errors in the window that were not clicked are found, newest first.
+    """
+    history = sample_history()
+    assert [ ( record.time, record.outcome ) for record in
+        history.unacknowledged( 600.0, now = 300.0 ) ] == [
+        ( 300.0, None ),
+        ( 180.0, bugme.OUTCOME_HIDDEN ),
+        ( 60.0, bugme.OUTCOME_TIMEOUT )
+    ]
+    assert [ record.time for record in
+        history.unacknowledged( 150.0, now = 300.0 ) ] == [ 300.0, 180.0 ]
+    assert [ record.title for record in history.unacknowledged( 600.0,
+        bugme.NIIF_WARNING, now = 300.0 ) ] == [ 'Deploy' ]
+
+
+#=============================================================================
+def test_click_through_rates():
+    """
+    Click-through is counted per title, most shown first (ties in display
+    order), and only within the window.
+    """
+    history = sample_history()
+    assert history.click_through() == [
+        ( 'Build', 4, 1, 0.25 ),
+        ( 'Deploy', 2, 1, 0.5 )
+    ]
+    assert history.click_through( 100.0, now = 300.0 ) == [
+        ( 'Deploy', 1, 1, 1.0 ),
+        ( 'Build', 1, 0, 0.0 )
+    ]
+
+
+#=============================================================================
+def test_format_history():
+    """
+    The summary counts the retained balloons, lists the unacknowledged
+    errors, and tabulates click-through.
+    """
+    lines = bugme.format_history( sample_history(), 150.0, now = 300.0
+        ).splitlines()
+    assert lines[ 0 ] == '6 notifications retained (capacity 16)'
+    assert lines[ 1 ] == 'Unacknowledged errors in the last 150 s: 2'
+    assert all( line.endswith( '  Build' ) for line in lines[ 2 : 4 ] )
+    assert lines[ 4 ] == 'Click-through by title:'
+    assert lines[ 6 : ] == [
+        '         4        1  25.0%  Build',
+        '         2        1  50.0%  Deploy'
+    ]
+
+
+#=============================================================================
+def test_main_summarizes_the_history_file( tmp_path, capsys ):
+    """
+    `--history` prints the summary of the history file.
+    """
+    import time
+    path    = os.fspath( tmp_path / 'history' )
+    history = bugme.History( 16 )
+    history.record( 'Build', bugme.NIIF_ERROR, when = time.time() - 60.0 )
+    history.save( path )
+    assert bugme.main( [ 'bugme', '--history', '--history-file', path ] ) \
+        == 0
+    output = capsys.readouterr().out.splitlines()
+    assert output[ 0 ] == '1 notifications retained (capacity 16)'
+    assert output[ 1 ] == 'Unacknowledged errors in the last 3600 s: 1'
+    assert output[ -1 ] == '         1        0   0.0%  Build'
+
+
+#=============================================================================
+def test_wrapped_ring_queries():
+    """
+    Once the ring has wrapped, the oldest balloons are overwritten, queries
+    find balloons in both segments (including a cutoff in the second), and
+    evicted balloons can not be completed.
+    """
+    history = bugme.History( 4 )
+    for when in range( 6 ):
+        history.record( 'Build {}'.format( when ), bugme.NIIF_ERROR,
+            when = float( when ) )
+    assert len( history ) == 4
+    assert [ record.sequence for record in history.records() ] == [
+        2, 3, 4, 5
+    ]
+    assert [ record.time for record in history.records( since = 3.5 )
+        ] == [ 4.0, 5.0 ]
+    assert [ record.time for record in history.records( since = 4.5 )
+        ] == [ 5.0 ]
+    assert [ record.time for record in history.unacknowledged(
+        0.5, now = 5.0 ) ] == [ 5.0 ]
+    assert history.complete( 1, bugme.OUTCOME_CLICKED ) == False
+    assert history.complete( 4, bugme.OUTCOME_CLICKED ) == True
+    assert [ record.time for record in history.unacknowledged(
+        10.0, now = 5.0 ) ] == [ 5.0, 3.0, 2.0 ]
+    assert history.click_through( 1.5, now = 5.0 ) == [
+        ( 'Build 4', 1, 1, 1.0 ),
+        ( 'Build 5', 1, 0, 0.0 )
+    ]
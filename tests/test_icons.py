@@ -0,0 +1,156 @@
+#=============================================================================
+#
+# Icon Cache Tests
+#
+#=============================================================================
+
+"""
+Tests of the icon cache, on a fake backend that counts loads and frees.
+"""
+
+
+import os
+
+import bugme
+
+
+#=============================================================================
+class CountingBackend( bugme.MemoryBackend ):
+    """
+    In-memory backend that records each icon load and free, and fails to
+    load icons whose path contains "missing".
+    """
+
+
+    #=========================================================================
+    def __init__( self ):
+        super().__init__()
+        self.loaded    = []
+        self.destroyed = []
+
+
+    #=========================================================================
+    def load_icon( self, path, size = 0,
+        flags = bugme.LR_LOADFROMFILE | bugme.LR_DEFAULTSIZE ):
+        self.loaded.append( ( path, size, flags ) )
+        if 'missing' in path:
+            self._call( 'LoadImage' )
+            return 0
+        return super().load_icon( path, size, flags )
+
+
+    #=========================================================================
+    def destroy_icon( self, icon_handle ):
+        self.destroyed.append( icon_handle )
+        return super().destroy_icon( icon_handle )
+
+
+#=============================================================================
+def write_ico( path, entries ):
+    """
+    Writes an ICO file directory (the images are left blank).
+
+    @param path    The path to the file
+    @param entries A list of `( width, bit_count )` tuples (a width of 256
+                   is stored as 0)
+    """
+    offset = bugme._ICONDIR.size + ( len( entries ) *
+        bugme._ICONDIRENTRY.size )
+    data   = bugme._ICONDIR.pack( 0, 1, len( entries ) )
+    for width, bit_count in entries:
+        stored  = width % 256
+        data   += bugme._ICONDIRENTRY.pack( stored, stored, 0, 0, 1,
+            bit_count, 16, offset )
+        offset += 16
+    with open( path, 'wb' ) as handle:
+        handle.write( data + bytes( 16 * len( entries ) ) )
+
+
+#=============================================================================
+def test_hit_returns_the_cached_handle():
+    """
+    A second request for an icon returns the same handle without loading
+    it again.
+    """
+    backend = CountingBackend()
+    icons   = bugme.IconCache( backend )
+    first   = icons.get( 'build.ico' )
+    assert icons.get( 'build.ico' ) == first
+    assert len( backend.loaded ) == 1
+    assert ( icons.hits, icons.loads ) == ( 1, 1 )
+
+
+#=============================================================================
+def test_least_recently_used_icon_is_destroyed():
+    """
+    Once the capacity is exceeded, exactly the least recently used icon is
+    destroyed.
+    """
+    backend = CountingBackend()
+    icons   = bugme.IconCache( backend, capacity = 2 )
+    first   = icons.get( 'first.ico' )
+    second  = icons.get( 'second.ico' )
+    icons.get( 'first.ico' )
+    icons.get( 'third.ico' )
+    assert backend.destroyed == [ second ]
+    assert ( len( icons ), icons.evictions ) == ( 2, 1 )
+    assert icons.get( 'first.ico' ) == first
+    assert len( backend.loaded ) == 3
+    icons.clear()
+    assert len( backend.destroyed ) == 3
+    assert backend.icons == set()
+
+
+#=============================================================================
+def test_stock_fallback_is_never_destroyed():
+    """
+    An icon that can not be loaded is replaced by the stock icon, which is
+    not destroyed when it is evicted (or the cache is cleared).
+    """
+    backend = CountingBackend()
+    icons   = bugme.IconCache( backend, capacity = 1 )
+    assert icons.get( 'missing.ico' ) == bugme.IDI_INFORMATION
+    loaded  = icons.get( 'build.ico' )
+    assert backend.destroyed == []
+    icons.get( 'missing-too.ico' )
+    icons.clear()
+    assert backend.destroyed == [ loaded ]
+
+
+#=============================================================================
+def test_named_icons_resolve_through_get():
+    """
+    Registered names load their icons through the cache.
+    """
+    backend = CountingBackend()
+    icons   = bugme.IconCache( backend )
+    icons.register( 'error', 'error.ico' )
+    handle  = icons.named( 'error' )
+    assert icons.get( 'error.ico' ) == handle
+    assert icons.named( 'error' ) == handle
+    assert len( backend.loaded ) == 1
+    assert icons.hits == 2
+
+
+#=============================================================================
+def test_best_fitting_ico_frame_is_loaded( tmp_path ):
+    """
+    The smallest frame at least as large as the desired size is loaded, or
+    else the largest frame.
+    """
+    path = os.fspath( tmp_path / 'build.ico' )
+    write_ico( path, [ ( 16, 32 ), ( 32, 8 ), ( 32, 32 ), ( 48, 32 ),
+        ( 256, 32 ) ] )
+    assert [ entry.width for entry in bugme.read_ico_directory( path ) ] \
+        == [ 16, 32, 32, 48, 256 ]
+    assert bugme.best_icon_size( path, 24 ) == 32
+    assert bugme.best_icon_size( path, 100 ) == 256
+
+    backend = CountingBackend()
+    icons   = bugme.IconCache( backend )
+    icons.get( path, 24 )
+    assert backend.loaded == [ ( path, 32, bugme.LR_LOADFROMFILE ) ]
+
+    small = os.fspath( tmp_path / 'small.ico' )
+    write_ico( small, [ ( 16, 32 ), ( 32, 4 ) ] )
+    assert bugme.best_icon_size( small, 64 ) == 32
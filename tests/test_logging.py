@@ -0,0 +1,77 @@
+#=============================================================================
+#
+# Logging Handler Tests
+#
+#=============================================================================
+
+"""
+Tests of the logging handler on the in-memory backend.
+"""
+
+
+import logging
+import time
+
+import bugme
+
+
+#=============================================================================
+def wait_for( condition, timeout = 5.0 ):
+    """
+    Waits for a condition to become true.
+
+    @param condition A function that checks the condition
+    @param timeout   Seconds to wait
+    @return          The condition's last result
+    """
+    deadline = time.monotonic() + timeout
+    while ( condition() == False ) and ( time.monotonic() < deadline ):
+        time.sleep( 0.01 )
+    return condition()
+
+
+#=============================================================================
+def test_worker_logging_is_not_displayed():
+    """
+    The notifier's own logging (on the worker thread) does not turn into
+    more balloons.
+    """
+    root    = logging.getLogger()
+    level   = root.level
+    handler = bugme.BugmeHandler( backend = bugme.MemoryBackend() )
+    root.addHandler( handler )
+    root.setLevel( logging.DEBUG )
+    try:
+        logging.getLogger( 'builds' ).warning( 'Build failed.' )
+        assert wait_for( lambda: handler.delivered == 1 )
+        time.sleep( 0.1 )
+        assert handler.delivered == 1
+        assert len( handler._queue ) == 0
+    finally:
+        root.removeHandler( handler )
+        root.setLevel( level )
+        handler.close()
+
+
+#=============================================================================
+def test_close_abandons_the_displayed_balloon():
+    """
+    Closing the handler does not wait for the displayed balloon to go away.
+    """
+    backend = bugme.MemoryBackend( latency = 60.0 )
+    handler = bugme.BugmeHandler( backend = backend )
+    logger  = logging.getLogger( 'builds.slow' )
+    logger.propagate = False
+    logger.addHandler( handler )
+    try:
+        logger.error( 'Build failed.' )
+        logger.error( 'Build failed again.' )
+        assert wait_for( lambda: len( backend._balloons ) == 1 )
+        start = time.monotonic()
+        handler.close()
+        assert time.monotonic() - start < 5.0
+    finally:
+        logger.removeHandler( handler )
+        logger.propagate = True
+    assert handler.dropped == 1
+    assert backend.items == {}
@@ -0,0 +1,220 @@
+#=============================================================================
+#
+# Pump Tests
+#
+#=============================================================================
+
+"""
+Tests of the message pump's lifecycle and display scheduling on the
+in-memory backend.
+"""
+
+
+import threading
+import time
+
+import pytest
+
+import bugme
+
+
+#=============================================================================
+def test_submit_racing_stop_completes():
+    """
+    Every notification submitted while the pump stops gets a callback,
+    whether or not it was posted before the pump thread exited.
+    """
+    for _ in range( 20 ):
+        called = []
+        lock   = threading.Lock()
+        def callback( outcome ):
+            with lock:
+                called.append( outcome )
+        pump = bugme.Pump( bugme.MemoryBackend() )
+        pump.start()
+        def produce():
+            for index in range( 200 ):
+                pump.submit( 'Message {}'.format( index ),
+                    callback = callback )
+        threads = [ threading.Thread( target = produce ) for _ in range( 4 ) ]
+        for thread in threads:
+            thread.start()
+        pump.stop()
+        for thread in threads:
+            thread.join()
+        assert len( called ) == 800
+
+
+#=============================================================================
+def test_submit_after_stop_completes_with_none():
+    """
+    A notification submitted to a stopped pump completes with None on the
+    submitting thread, and calls on it fail.
+    """
+    called = []
+    pump   = bugme.Pump( bugme.MemoryBackend() )
+    pump.start()
+    pump.stop()
+    pump.submit( 'Late.', callback = called.append )
+    assert called == [ None ]
+    with pytest.raises( RuntimeError ):
+        pump.add_item( 1 )
+
+
+#=============================================================================
+def run_pump( backend, submissions, timeout = 10.0 ):
+    """
+    Submits notifications to a pump, and waits for all of their outcomes.
+
+    @param backend     The pump's backend
+    @param submissions A list of `( delay, message, flags, deadline )`
+                       tuples (the delay is waited before submitting;
+                       a deadline is relative to the submission)
+    @param timeout     Seconds to wait for the outcomes
+    @return            A list of `( message, outcome )` tuples, in
+                       completion order
+    """
+    completed = []
+    done      = threading.Event()
+    def callback( message, outcome ):
+        completed.append( ( message, outcome ) )
+        if len( completed ) == len( submissions ):
+            done.set()
+    with bugme.Pump( backend ) as pump:
+        for delay, message, flags, deadline in submissions:
+            time.sleep( delay )
+            if deadline is not None:
+                deadline += time.monotonic()
+            pump.submit( message, 'Builds', flags, deadline = deadline,
+                callback = lambda outcome, message = message:
+                    callback( message, outcome ) )
+        assert done.wait( timeout )
+    return completed
+
+
+#=============================================================================
+def test_severe_notification_preempts():
+    """
+    A more severe notification replaces the displayed balloon (with
+    NIM_MODIFY), and the preempted notification is displayed again after
+    it, completing last.
+    """
+    backend   = bugme.MemoryBackend( latency = 0.2, keep_balloons = True )
+    completed = run_pump( backend, [
+        ( 0.0, 'Build slow.', bugme.NIIF_INFO, None ),
+        ( 0.05, 'Build failed.', bugme.NIIF_ERROR, None )
+    ] )
+    assert completed == [
+        ( 'Build failed.', bugme.OUTCOME_TIMEOUT ),
+        ( 'Build slow.', bugme.OUTCOME_TIMEOUT )
+    ]
+    assert [ balloon[ 0 ] for balloon in backend.balloons ] == [
+        'Build slow.', 'Build failed.', 'Build slow.'
+    ]
+
+
+#=============================================================================
+def test_expired_low_priority_notification_is_dropped():
+    """
+    A queued notification whose deadline passes behind a more severe one
+    completes as expired without being displayed.
+    """
+    backend   = bugme.MemoryBackend( latency = 0.3, keep_balloons = True )
+    completed = run_pump( backend, [
+        ( 0.0, 'Build failed.', bugme.NIIF_ERROR, None ),
+        ( 0.02, 'Build slow.', bugme.NIIF_INFO, 0.05 ),
+        ( 0.0, 'Build flaky.', bugme.NIIF_WARNING, None )
+    ] )
+    assert completed == [
+        ( 'Build slow.', bugme.OUTCOME_EXPIRED ),
+        ( 'Build failed.', bugme.OUTCOME_TIMEOUT ),
+        ( 'Build flaky.', bugme.OUTCOME_TIMEOUT )
+    ]
+    assert [ balloon[ 0 ] for balloon in backend.balloons ] == [
+        'Build failed.', 'Build flaky.'
+    ]
+
+
+#=============================================================================
+def test_balloon_flags_are_per_notification():
+    """
+    NIIF_NOSOUND and NIIF_RESPECT_QUIET_TIME apply only to the balloons
+    they were submitted with.
+    """
+    backend = bugme.MemoryBackend( keep_balloons = True )
+    quiet   = bugme.NIIF_INFO | bugme.NIIF_RESPECT_QUIET_TIME
+    silent  = bugme.NIIF_WARNING | bugme.NIIF_NOSOUND
+    run_pump( backend, [
+        ( 0.0, 'Quiet.', quiet, None ),
+        ( 0.0, 'Silent.', silent, None ),
+        ( 0.0, 'Plain.', bugme.NIIF_INFO, None )
+    ] )
+    assert sorted( backend.balloons ) == sorted( [
+        ( 'Quiet.', 'Builds', quiet ),
+        ( 'Silent.', 'Builds', silent ),
+        ( 'Plain.', 'Builds', bugme.NIIF_INFO )
+    ] )
+
+
+#=============================================================================
+def test_deadlines_use_the_wheel_clock( clock ):
+    """
+    Deadlines are measured on the wheel's clock: a notification due a
+    minute from now (on a fake clock) is displayed, and a queued one
+    expires once the fake clock passes its deadline.
+    """
+    wheel     = bugme.TimerWheel( 0.01, clock = clock )
+    backend   = bugme.MemoryBackend( latency = 0.3 )
+    completed = []
+    done      = threading.Event()
+    def callback( message, outcome ):
+        completed.append( ( message, outcome ) )
+        if len( completed ) == 2:
+            done.set()
+    with bugme.Pump( backend, wheel = wheel ) as pump:
+        for message, flags in (
+            ( 'Build failed.', bugme.NIIF_ERROR ),
+            ( 'Build flaky.', bugme.NIIF_ERROR )
+        ):
+            pump.submit( message, 'Builds', flags,
+                deadline = clock() + 60.0,
+                callback = lambda outcome, message = message:
+                    callback( message, outcome ) )
+        time.sleep( 0.1 )
+        clock.advance( 120.0 )
+        assert done.wait( 10.0 )
+    assert completed == [
+        ( 'Build flaky.', bugme.OUTCOME_EXPIRED ),
+        ( 'Build failed.', bugme.OUTCOME_TIMEOUT )
+    ]
+
+
+#=============================================================================
+def test_preempted_notification_expires_on_time( clock ):
+    """
+    A preempted notification whose deadline passes while the preempting
+    balloon is displayed expires then, rather than when it would next be
+    displayed.
+    """
+    wheel     = bugme.TimerWheel( 0.01, clock = clock )
+    backend   = bugme.MemoryBackend( latency = 0.3 )
+    completed = []
+    done      = threading.Event()
+    def callback( message, outcome ):
+        completed.append( ( message, outcome ) )
+        if len( completed ) == 2:
+            done.set()
+    with bugme.Pump( backend, wheel = wheel ) as pump:
+        pump.submit( 'Build slow.', 'Builds', bugme.NIIF_INFO,
+            deadline = clock() + 60.0,
+            callback = lambda outcome: callback( 'Build slow.', outcome ) )
+        time.sleep( 0.05 )
+        pump.submit( 'Build failed.', 'Builds', bugme.NIIF_ERROR,
+            callback = lambda outcome: callback( 'Build failed.', outcome ) )
+        time.sleep( 0.05 )
+        clock.advance( 120.0 )
+        assert done.wait( 10.0 )
+    assert completed == [
+        ( 'Build slow.', bugme.OUTCOME_EXPIRED ),
+        ( 'Build failed.', bugme.OUTCOME_TIMEOUT )
+    ]
@@ -0,0 +1,110 @@
+#=============================================================================
+#
+# Retry Policy Tests
+#
+#=============================================================================
+
+"""
+Tests of retrying transient shell failures (and only those).
+"""
+
+
+import ctypes
+import threading
+
+import bugme
+
+
+#=============================================================================
+def never_sleep( seconds ):
+    """
+    Sleep function for policies that must not wait.
+    """
+    raise AssertionError( 'Slept for {} seconds.'.format( seconds ) )
+
+
+#=============================================================================
+def test_transient_failures_are_retried( clock ):
+    """
+    Calls failing with ERROR_TIMEOUT are retried (with growing delays) until
+    they succeed.
+    """
+    results = [ False, False, True ]
+    slept   = []
+    policy  = bugme.RetryPolicy( jitter = 0.0, clock = clock,
+        sleep = slept.append )
+    assert policy.call( lambda: results.pop( 0 ),
+        error = lambda: bugme.ERROR_TIMEOUT )
+    assert slept == [ 0.05, 0.1 ]
+    assert policy.retries == 2
+
+
+#=============================================================================
+def test_permanent_failures_are_not_retried( clock ):
+    """
+    Adding an existing tray item fails once, without waiting.
+    """
+    backend     = bugme.MemoryBackend()
+    policy      = bugme.RetryPolicy( clock = clock, sleep = never_sleep )
+    backend.register_class( 'test', lambda *message: None )
+    notify_data = bugme.NOTIFYICONDATAW(
+        cbSize = ctypes.sizeof( bugme.NOTIFYICONDATAW ),
+        hWnd   = backend.create_window( 'test', 'test' )
+    )
+    for expected in ( True, False ):
+        assert policy.call(
+            backend.shell_notify_icon,
+            bugme.NIM_ADD,
+            notify_data,
+            error = backend.last_error
+        ) == expected
+    assert backend.calls[ 'Shell_NotifyIcon' ] == 2
+    assert policy.retries == 0
+
+
+#=============================================================================
+def test_pump_retries_on_its_timer_wheel():
+    """
+    A balloon that fails while the shell is busy is displayed once the
+    shell recovers, without the pump thread sleeping.
+    """
+    backend  = bugme.MemoryBackend( keep_balloons = True )
+    policy   = bugme.RetryPolicy( delay = 0.01, sleep = never_sleep )
+    outcomes = []
+    done     = threading.Event()
+    def callback( outcome ):
+        outcomes.append( outcome )
+        done.set()
+    with bugme.Pump( backend, retry = policy ) as pump:
+        backend.failures = 3
+        pump.submit( 'Build failed.', callback = callback )
+        assert done.wait( 5.0 )
+    assert outcomes == [ bugme.OUTCOME_TIMEOUT ]
+    assert policy.retries == 3
+    assert [ balloon[ 0 ] for balloon in backend.balloons ] == [
+        'Build failed.'
+    ]
+
+
+#=============================================================================
+def test_pump_gives_up_after_the_retries():
+    """
+    A balloon that keeps failing completes with None once the policy's
+    retries run out, and the next notification is still displayed.
+    """
+    backend  = bugme.MemoryBackend()
+    policy   = bugme.RetryPolicy( attempts = 3, delay = 0.01,
+        sleep = never_sleep )
+    outcomes = []
+    done     = threading.Event()
+    def callback( outcome ):
+        outcomes.append( outcome )
+        if len( outcomes ) == 2:
+            done.set()
+    with bugme.Pump( backend, retry = policy ) as pump:
+        backend.failures = 3
+        pump.submit( 'Build failed.', callback = callback )
+        pump.submit( 'Build fixed.', callback = callback )
+        assert done.wait( 5.0 )
+    assert outcomes == [ None, bugme.OUTCOME_TIMEOUT ]
+    assert policy.retries == 2
@@ -0,0 +1,162 @@
+#=============================================================================
+#
+# Shared-Memory Ring Tests
+#
+#=============================================================================
+
+"""
+Tests of the shared-memory ring's lanes, wakeup, and text encoding.
+"""
+
+
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+import bugme
+
+
+# Distinct ring names for the tests in this process
+_names = itertools.count()
+
+
+#=============================================================================
+@pytest.fixture
+def name():
+    """
+    Provides a ring name not used by any other test.
+    """
+    return 'bugme-test-{}-{}'.format( os.getpid(), next( _names ) )
+
+
+#=============================================================================
+def _die_while_putting( name ):
+    """
+    Producer process that dies after filling a slot, without publishing it.
+
+    @param name The ring's name
+    """
+    ring   = bugme.SharedRing( name )
+    offset = ring._offset( ring.lane, ring.head )
+    bugme._RING_SLOT.pack_into( ring.map, offset, ring.head,
+        bugme.NIIF_ERROR, b'', b'' )
+    os._exit( 0 )
+
+
+#=============================================================================
+def test_text_is_utf16_sized_to_the_balloon_fields( name ):
+    """
+    Titles and messages keep characters the ANSI code page can not encode,
+    and are truncated to the szInfoTitle and szInfo fields.
+    """
+    title   = 'Сборка 🚀'
+    message = 'ü' * 1000
+    with bugme.SharedRing( name, create = True ) as consumer:
+        with bugme.SharedRing( name ) as producer:
+            assert producer.put( message, title, bugme.NIIF_WARNING ) == True
+        assert consumer.get() == (
+            'ü' * ( bugme.NOTIFYICONDATAW.szInfo.size // 2 - 1 ),
+            title,
+            bugme.NIIF_WARNING
+        )
+
+
+#=============================================================================
+@pytest.mark.skipif(
+    'fork' not in multiprocessing.get_all_start_methods(),
+    reason = 'Needs forked producer processes.'
+)
+def test_dead_producer_does_not_block_the_consumer( name ):
+    """
+    A producer that dies part way through a notification frees its lane,
+    and the consumer takes the next producer's notifications.
+    """
+    context = multiprocessing.get_context( 'fork' )
+    with bugme.SharedRing( name, slots = 2, lanes = 1,
+        create = True ) as consumer:
+        process = context.Process( target = _die_while_putting,
+            args = ( name, ) )
+        process.start()
+        process.join()
+        assert consumer.get() is None
+        with bugme.SharedRing( name ) as producer:
+            for index in range( 3 ):
+                assert producer.put( 'Message {}'.format( index ) ) == True
+                assert consumer.get() == (
+                    'Message {}'.format( index ),
+                    'Bugme!',
+                    bugme.NIIF_USER
+                )
+
+
+#=============================================================================
+def test_each_producer_owns_a_lane( name ):
+    """
+    Producers take free lanes while they are attached, and notifications
+    are taken in order for each producer.
+    """
+    with bugme.SharedRing( name, lanes = 2, create = True ) as consumer:
+        first  = bugme.SharedRing( name )
+        second = bugme.SharedRing( name )
+        with pytest.raises( RuntimeError ):
+            bugme.SharedRing( name )
+        for index in range( 3 ):
+            first.put( 'First {}'.format( index ) )
+            second.put( 'Second {}'.format( index ) )
+        second.close()
+        with bugme.SharedRing( name ) as third:
+            third.put( 'Third 0' )
+        first.close()
+        messages = [ consumer.get()[ 0 ] for _ in range( 7 ) ]
+        assert consumer.get() is None
+    assert [ m for m in messages if m.startswith( 'First' ) ] == [
+        'First 0', 'First 1', 'First 2'
+    ]
+    assert [ m for m in messages if not m.startswith( 'First' ) ] == [
+        'Second 0', 'Second 1', 'Second 2', 'Third 0'
+    ]
+
+
+#=============================================================================
+def test_producer_wakes_the_consumer( name ):
+    """
+    A waiting consumer is woken by a put, rather than by its interval.
+    """
+    received = []
+    stop     = threading.Event()
+    with bugme.SharedRing( name, create = True ) as consumer:
+        def consume():
+            for record in consumer.records( interval = 30.0, stop = stop ):
+                received.append( ( record[ 0 ], time.monotonic() ) )
+                stop.set()
+        thread = threading.Thread( target = consume )
+        thread.start()
+        time.sleep( 0.1 )
+        with bugme.SharedRing( name ) as producer:
+            sent = time.monotonic()
+            producer.put( 'Wake up.' )
+        thread.join( 5.0 )
+        assert thread.is_alive() == False
+    assert received[ 0 ][ 0 ] == 'Wake up.'
+    assert received[ 0 ][ 1 ] - sent < 1.0
+
+
+#=============================================================================
+def test_creator_removes_the_ring_files( name ):
+    """
+    Only one consumer may create a ring, and its files are removed when it
+    closes.
+    """
+    ring  = bugme.SharedRing( name, create = True )
+    paths = [ ring.path, ring.locks, ring.signal.path ]
+    assert all( os.path.exists( path ) for path in paths )
+    with pytest.raises( FileExistsError ):
+        bugme.SharedRing( name, create = True )
+    ring.close()
+    assert not any( os.path.exists( path ) for path in paths )
+    with pytest.raises( FileNotFoundError ):
+        bugme.SharedRing( name )
@@ -0,0 +1,144 @@
+#=============================================================================
+#
+# Spool Tests
+#
+#=============================================================================
+
+"""
+Tests of the notification spool's recovery and delivery checkpoints.
+"""
+
+
+import os
+import random
+import threading
+
+import bugme
+
+
+# Records appended to the spools under test
+records = [
+    ( 'Build {} failed (exit status 2).'.format( index ), 'Build Failed',
+        bugme.NIIF_ERROR )
+    for index in range( 50 )
+]
+
+
+#=============================================================================
+class ReorderingPump( object ):
+    """
+    Stand-in pump that completes its notifications in a given order, with
+    given outcomes, once all of them have been submitted.
+    """
+
+
+    #=========================================================================
+    def __init__( self, order, outcomes ):
+        """
+        Initializes the pump.
+
+        @param order    The submission indexes, in completion order
+        @param outcomes The outcome of each submission (by index)
+        """
+        self.order     = order
+        self.outcomes  = outcomes
+        self.callbacks = []
+
+
+    #=========================================================================
+    def submit( self, *record, callback = None ):
+        self.callbacks.append( callback )
+        if len( self.callbacks ) == len( self.order ):
+            threading.Thread( target = self._complete ).start()
+
+
+    #=========================================================================
+    def _complete( self ):
+        for index in self.order:
+            self.callbacks[ index ]( self.outcomes[ index ] )
+
+
+#=============================================================================
+def test_torn_writes_recover_intact_records( tmp_path ):
+    """
+    A journal cut off (or scribbled over) at any point recovers exactly
+    its intact records, and takes appends after them.
+    """
+    path   = os.path.join( str( tmp_path ), 'torn.spool' )
+    intact = [ bugme.Spool.encode( *record ) for record in records ]
+    with bugme.Spool( path ) as spool:
+        pass
+    with open( path, 'rb' ) as handle:
+        header = handle.read()
+    whole  = header + b''.join( intact )
+    ends   = []
+    offset = len( header )
+    for record in intact:
+        offset += len( record )
+        ends.append( offset )
+    generator = random.Random( 1 )
+    for _ in range( 300 ):
+        cut  = generator.randrange( len( header ), len( whole ) + 1 )
+        data = whole[ : cut ]
+        if generator.random() < 0.5:
+            data += bytes(
+                generator.randrange( 256 )
+                for _ in range( generator.randrange( 64 ) )
+            )
+        expected = sum( 1 for end in ends if end <= cut )
+        with open( path, 'wb' ) as handle:
+            handle.write( data )
+        with bugme.Spool( path ) as spool:
+            recovered = [ record for _, record in spool.read() ]
+            spool.append( 'After recovery.' )
+        with bugme.Spool( path ) as spool:
+            reopened = [ record for _, record in spool.read() ]
+        assert recovered == records[ : expected ]
+        assert reopened[ : -1 ] == recovered
+        assert reopened[ -1 ][ 0 ] == 'After recovery.'
+        os.remove( path )
+        if os.path.exists( path + '.offset' ):
+            os.remove( path + '.offset' )
+
+
+#=============================================================================
+def test_out_of_order_completion_commits_the_delivered_prefix( tmp_path ):
+    """
+    Delivery checkpoints only the contiguous prefix of displayed records,
+    however they complete, and never credits a record that was not
+    displayed.
+    """
+    path = os.path.join( str( tmp_path ), 'deliver.spool' )
+    with bugme.Spool( path ) as spool:
+        for record in records[ : 6 ]:
+            spool.append( *record )
+        spool.flush()
+        outcomes = [ bugme.OUTCOME_TIMEOUT ] * 6
+        outcomes[ 3 ] = None
+        spool.deliver( pump = ReorderingPump( [ 5, 4, 3, 1, 0, 2 ],
+            outcomes ) )
+    with bugme.Spool( path ) as spool:
+        assert [ record for _, record in spool.read() ] == records[ 3 : 6 ]
+
+
+#=============================================================================
+def test_preempted_delivery_completes( tmp_path ):
+    """
+    Records reordered by severity on a real pump are all checkpointed once
+    they are displayed.
+    """
+    path = os.path.join( str( tmp_path ), 'severity.spool' )
+    with bugme.Spool( path ) as spool:
+        for index in range( 20 ):
+            flags = bugme.NIIF_ERROR if ( index % 3 ) == 0 else \
+                bugme.NIIF_INFO
+            spool.append( 'Message {}'.format( index ), 'Builds', flags )
+        spool.flush()
+        outcomes = spool.deliver(
+            backend  = bugme.MemoryBackend( latency = 0.002 ),
+            capacity = 20
+        )
+        assert sum( outcomes.values() ) == 20
+        assert None not in outcomes
+    with bugme.Spool( path ) as spool:
+        assert spool.read() == []
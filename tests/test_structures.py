@@ -0,0 +1,118 @@
+#=============================================================================
+#
+# Structure and Text Encoding Tests
+#
+#=============================================================================
+
+"""
+Tests of the NOTIFYICONDATA layouts, and of encoding text into their
+fixed-size character fields.
+"""
+
+
+import ctypes
+import random
+
+import pytest
+
+import bugme
+
+
+# Offsets of szTip, szInfo, szInfoTitle, and guidItem, and the size of
+# NOTIFYICONDATAW in the Windows headers (by pointer size)
+wide_layouts = {
+    8 : ( 40, 304, 820, 952, 976 ),
+    4 : ( 24, 288, 804, 936, 956 )
+}
+
+# Characters of every UTF-16 length (astral characters take two units)
+alphabet = 'abé中\U0001F600\U00010348'
+
+
+#=============================================================================
+def test_wide_layout():
+    """
+    NOTIFYICONDATAW matches the Windows headers for the pointer size.
+    """
+    structure = bugme.NOTIFYICONDATAW
+    layout    = (
+        structure.szTip.offset,
+        structure.szInfo.offset,
+        structure.szInfoTitle.offset,
+        structure.guidItem.offset,
+        ctypes.sizeof( structure )
+    )
+    assert layout == wide_layouts[ ctypes.sizeof( ctypes.c_void_p ) ]
+    assert structure.szInfo.size == structure.INFO_SIZE * 2
+    assert structure.szInfoTitle.size == structure.TITLE_SIZE * 2
+
+
+#=============================================================================
+@pytest.mark.parametrize( 'field', [ 'szTip', 'szInfo', 'szInfoTitle' ] )
+def test_wide_truncation_keeps_surrogate_pairs( field ):
+    """
+    Random text round-trips through a wide field up to its length, and
+    truncation never splits a surrogate pair.
+    """
+    generator   = random.Random( 3 )
+    size        = getattr( bugme.NOTIFYICONDATAW, field ).size
+    notify_data = bugme.NOTIFYICONDATAW()
+    for _ in range( 2000 ):
+        text = ''.join(
+            generator.choice( alphabet )
+            for _ in range( generator.randrange( size // 2 + 8 ) )
+        )
+        notify_data.set_text( field, text )
+        stored = notify_data.get_text( field )
+        units  = len( stored.encode( 'utf-16-le' ) ) // 2
+        assert text.startswith( stored )
+        assert units <= ( size // 2 ) - 1
+        if stored != text:
+            assert units >= ( size // 2 ) - 2
+
+
+#=============================================================================
+def test_encode_wide_at_the_boundary():
+    """
+    A surrogate pair that would straddle the terminator is dropped whole.
+    """
+    assert bugme.encode_wide( 'ab\U0001F600', 4 ) == \
+        'ab'.encode( 'utf-16-le' ) + b'\0\0'
+    assert bugme.encode_wide( 'a\U0001F600', 4 ) == \
+        'a\U0001F600'.encode( 'utf-16-le' ) + b'\0\0'
+    assert bugme.encode_wide( '\ud800x', 3 ) == \
+        '\ud800x'.encode( 'utf-16-le', 'surrogatepass' ) + b'\0\0'
+
+
+#=============================================================================
+@pytest.mark.parametrize( 'encoding', [ 'utf-8', 'cp932', 'cp1252' ] )
+def test_encode_text_on_character_boundaries( encoding ):
+    """
+    ANSI text is truncated on character boundaries, and characters the code
+    page can not represent are replaced.
+    """
+    generator = random.Random( 5 )
+    for _ in range( 2000 ):
+        text = ''.join(
+            generator.choice( alphabet )
+            for _ in range( generator.randrange( 40 ) )
+        )
+        size = generator.randrange( 1, 48 )
+        data = bugme.encode_text( text, size, encoding )
+        full = text.encode( encoding, 'replace' )
+        assert len( data ) <= size - 1
+        assert full.startswith( data )
+
+        # (Decoding fails if a multi-byte character was split.)
+        assert full.decode( encoding ).startswith( data.decode( encoding ) )
+
+
+#=============================================================================
+def test_strarg_encodes_like_the_fields():
+    """
+    String arguments for the ANSI interfaces accept any text.
+    """
+    assert bugme.strarg( 'Build failed.' ).value == b'Build failed.'
+    assert bugme.strarg( 'Café 中', 'utf-8' ).value == \
+        'Café 中'.encode( 'utf-8' )
+    assert bugme.strarg( 'Café 中', 'cp1252' ).value == b'Caf\xe9 ?'
@@ -0,0 +1,106 @@
+#=============================================================================
+#
+# Timer Wheel Tests
+#
+#=============================================================================
+
+"""
+Tests of the hierarchical timer wheel, on a fake clock.
+"""
+
+
+import bisect
+import random
+
+import pytest
+
+import bugme
+
+
+#=============================================================================
+@pytest.mark.parametrize( 'slots, levels', [ ( 64, 4 ), ( 8, 3 ) ] )
+def test_timers_fire_on_their_tick( clock, slots, levels ):
+    """
+    Of 100,000 timers (a third of them cancelled), each one fires on the
+    first advance that reaches its tick, and never before its deadline,
+    whether it waits in the first level, cascades down from the wider
+    levels, or is scheduled beyond the wheel's span.
+    """
+    generator  = random.Random( 2024 )
+    resolution = 0.01
+    count      = 100000
+    spans      = ( 1.0, 60.0, 600.0, 1800.0 )
+    wheel      = bugme.TimerWheel( resolution, slots, levels, clock = clock )
+    fired      = {}
+    def expire( index ):
+        fired[ index ] = clock.now
+    deadlines  = [
+        clock.now + generator.uniform( 0.0, generator.choice( spans ) )
+        for _ in range( count )
+    ]
+    timers     = [
+        wheel.schedule( deadline, expire, index )
+        for index, deadline in enumerate( deadlines )
+    ]
+    cancelled  = set( generator.sample( range( count ), count // 3 ) )
+    for index in cancelled:
+        assert wheel.cancel( timers[ index ] ) == True
+    assert len( wheel ) == count - len( cancelled )
+
+    # Advance in uneven steps, with the occasional long stall.
+    advances = []
+    while len( wheel ) > 0:
+        if generator.random() < 0.001:
+            clock.advance( generator.uniform( 1.0, 120.0 ) )
+        else:
+            clock.advance( generator.uniform( 0.001, 0.1 ) )
+        wheel.advance()
+        advances.append( clock.now )
+    assert wheel.fired == count - len( cancelled )
+
+    # The tick each advance reached, to find the first to reach a timer's.
+    reached = [ int( now // resolution ) for now in advances ]
+    for index, deadline in enumerate( deadlines ):
+        if index in cancelled:
+            assert index not in fired
+            assert timers[ index ].active == False
+            continue
+        tick     = -int( -deadline // resolution )
+        expected = advances[ bisect.bisect_left( reached, tick ) ]
+        assert fired[ index ] == expected
+        assert fired[ index ] >= deadline
+
+
+#=============================================================================
+def test_timers_fire_in_deadline_order_within_a_tick( clock ):
+    """
+    Timers expiring on the same advance are called in deadline order, and
+    a timer that raises does not stop the others.
+    """
+    wheel  = bugme.TimerWheel( 0.1, clock = clock )
+    called = []
+    def fail():
+        raise RuntimeError( 'Timer failed.' )
+    for offset in ( 0.35, 0.31, 0.33 ):
+        wheel.schedule( clock.now + offset, called.append, offset )
+    wheel.schedule( clock.now + 0.32, fail )
+    clock.advance( 0.2 )
+    assert wheel.advance() == 0
+    clock.advance( 0.3 )
+    assert wheel.advance() == 4
+    assert called == [ 0.31, 0.33, 0.35 ]
+    assert len( wheel ) == 0
+
+
+#=============================================================================
+def test_past_deadlines_fire_on_the_next_tick( clock ):
+    """
+    A timer scheduled in the past fires on the next tick, not the current
+    one, and a cancelled timer can not be cancelled again.
+    """
+    wheel = bugme.TimerWheel( 0.1, clock = clock )
+    timer = wheel.schedule( clock.now - 5.0, lambda: None )
+    assert wheel.advance() == 0
+    clock.advance( 0.1 )
+    assert wheel.advance() == 1
+    assert wheel.cancel( timer ) == False